@@ -0,0 +1,152 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''
+in-process API returning structured check results
+'''
+
+import argparse
+import collections
+import contextlib
+import os
+
+from lib import check
+from lib import ling
+from lib import tags
+
+file_types = frozenset({'po', 'pot', 'mo', 'gmo'})
+
+class Result(collections.namedtuple('Result', ['path', 'tag', 'severity', 'certainty', 'args'])):
+
+    '''
+    single problem found in a file:
+    tag is the tag name;
+    severity and certainty are members of tags.severities and tags.certainties;
+    args are the extra information (strings or bytes),
+    as in the command-line output
+    '''
+
+    __slots__ = ()
+
+    def format(self, *, color=False):
+        '''
+        format the result the same way as the command-line interface does
+        '''
+        tag = tags.get_tag(self.tag)
+        return tag.format(self.path, *self.args, color=color)
+
+    def __str__(self):
+        return self.format()
+
+class Checker(check.Checker):
+
+    def __init__(self, path, *, options, data=None, fake_path=None):
+        super().__init__(path, options=options, data=data)
+        if fake_path is not None:
+            self.fake_path = fake_path
+        self.results = []
+
+    def tag(self, tagname, *extra):
+        tag = tags.get_tag(tagname)
+        extra = tuple(
+            arg if isinstance(arg, (str, bytes)) else str(arg)
+            for arg in extra
+        )
+        self.results += [
+            Result(self.fake_path, tagname, tag.severity, tag.certainty, extra)
+        ]
+
+def _patch_environment():
+    with contextlib.suppress(check.EnvironmentAlreadyPatched):
+        check.Checker.patch_environment()
+
+def _get_options(*, language, file_type, jobs=1, stream=False):
+    if language is not None:
+        language = ling.parse_language(language)
+        language.fix_codes()
+        language.remove_encoding()
+        language.remove_nonlinguistic_modifier()
+    if file_type is not None and file_type not in file_types:
+        raise ValueError(f'unsupported file type: {file_type!r}')
+    return argparse.Namespace(
+        language=language,
+        file_type=file_type,
+        fake_root=None,
+        jobs=jobs,
+        stream=stream,
+    )
+
+def check_path(path, *, language=None, file_type=None, jobs=1, stream=False):
+    '''
+    check the file;
+    return list of Result objects
+
+    If language is not None, assume this language.
+    If file_type is not None, it overrides the file extension;
+    it must be one of: po, pot, mo, gmo.
+    Messages of huge files are split between at most jobs processes.
+    If stream is true, PO files are parsed incrementally,
+    so that memory usage doesn't depend on the number of messages.
+
+    Note that the first call installs extra encodings
+    process-wide, the same as the command-line interface does.
+    '''
+    options = _get_options(language=language, file_type=file_type, jobs=jobs, stream=stream)
+    _patch_environment()
+    checker = Checker(path, options=options)
+    checker.check()
+    return checker.results
+
+def check_bytes(data, file_type, *, name=None, language=None):
+    '''
+    check the file contents (bytes-like object);
+    return list of Result objects
+
+    The contents are parsed in memory, without creating any files.
+    file_type must be one of: po, pot, mo, gmo.
+    name is the (relative) pathname used in the results;
+    the language can be guessed from it, as for check_path().
+    '''
+    options = _get_options(language=language, file_type=file_type)
+    if file_type is None:
+        raise ValueError('file type is required')
+    if name is None:
+        name = 'messages.' + file_type
+    relpath = os.path.normpath(name)
+    if os.path.isabs(relpath) or relpath.split(os.sep)[0] == os.pardir:
+        raise ValueError(f'pathname must be relative: {name!r}')
+    _patch_environment()
+    # The file is not written anywhere,
+    # but the pathname is made absolute,
+    # so that all its directory components are considered
+    # when guessing the language:
+    path = os.path.join(os.sep, relpath)
+    checker = Checker(path, options=options, data=data, fake_path=name)
+    checker.check()
+    return checker.results
+
+__all__ = [
+    'Result',
+    'check_bytes',
+    'check_path',
+    'file_types',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,263 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''
+cache for check results
+'''
+
+import collections
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import unicodedata
+
+from lib import paths
+from lib import tags
+
+default_max_size = 64 << 20  # 64 MiB
+default_max_memory_entries = 1024
+
+def get_default_path():
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(xdg_cache_home, 'i18nspector', '')
+
+def hash_file(path):
+    '''
+    return SHA-256 digest of the file contents (as a hex string)
+    '''
+    h = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while True:
+            chunk = file.read(1 << 20)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def get_fingerprint():
+    '''
+    return a hash of everything (other than the checked file and the options)
+    that the check results may depend on:
+    code, data files, and versions of the underlying libraries
+    '''
+    import polib  # pylint: disable=import-outside-toplevel
+    h = hashlib.sha256()
+    h.update(json.dumps([
+        list(sys.version_info[:2]),
+        unicodedata.unidata_version,
+        polib.__version__,
+    ]).encode('ASCII'))
+    for subdir in 'lib', 'data':
+        root = os.path.join(paths.basedir, subdir)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith(('.pyc', '.pyo')):
+                    continue
+                path = os.path.join(dirpath, filename)
+                h.update(os.path.relpath(path, paths.basedir).encode('UTF-8', 'surrogateescape'))
+                h.update(b'\0')
+                h.update(hash_file(path).encode('ASCII'))
+    return h.hexdigest()
+
+def _encode_arg(arg):
+    if isinstance(arg, tags.safestr):
+        return ['safe', str(arg)]
+    if isinstance(arg, bytes):
+        return ['bytes', arg.decode('ISO-8859-1')]
+    return ['', str(arg)]
+
+def _decode_arg(arg):
+    (tp, s) = arg
+    if tp == 'safe':
+        return tags.safestr(s)
+    if tp == 'bytes':
+        return s.encode('ISO-8859-1')
+    if tp == '':
+        return s
+    raise ValueError(f'unknown argument type: {tp!r}')
+
+def encode_results(results):
+    return json.dumps([
+        [tagname, [_encode_arg(arg) for arg in extra]]
+        for tagname, extra in results
+    ])
+
+def decode_results(s):
+    return [
+        (tagname, tuple(_decode_arg(arg) for arg in extra))
+        for tagname, extra in json.loads(s)
+    ]
+
+class Cache:
+
+    '''
+    cache for check results;
+    recently used results are kept in memory;
+    if path is not None, all results are also stored on disk
+    '''
+
+    prune_interval = 60 * 60  # 1 hour
+
+    def __init__(self, path, *, max_size=default_max_size, max_memory_entries=default_max_memory_entries):
+        self.path = path
+        self.max_size = max_size
+        self.max_memory_entries = max_memory_entries
+        self._memory = collections.OrderedDict()
+
+    def _get_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _remember(self, key, results):
+        self._memory[key] = results
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        '''
+        return check results stored under the key, or None
+        '''
+        try:
+            results = self._memory[key]
+        except KeyError:
+            pass
+        else:
+            self._memory.move_to_end(key)
+            return results
+        if self.path is None:
+            return
+        path = self._get_path(key)
+        try:
+            with open(path, 'rt', encoding='UTF-8') as file:
+                s = file.read()
+        except OSError:
+            return
+        try:
+            results = decode_results(s)
+        except ValueError:
+            # corrupted cache entry
+            return
+        with contextlib.suppress(OSError):
+            # The modification time is used for LRU eviction.
+            os.utime(path)
+        self._remember(key, results)
+        return results
+
+    def put(self, key, results):
+        '''
+        store check results under the key;
+        errors are silently ignored
+        '''
+        self._remember(key, results)
+        if self.path is None:
+            return
+        s = encode_results(results)
+        path = self._get_path(key)
+        dirname = os.path.dirname(path)
+        try:
+            os.makedirs(dirname, exist_ok=True)
+            with tempfile.NamedTemporaryFile('wt', encoding='ASCII', dir=dirname, prefix='.tmp.', delete=False) as file:
+                try:
+                    file.write(s)
+                    file.close()
+                    os.replace(file.name, path)
+                except BaseException:
+                    os.unlink(file.name)
+                    raise
+        except OSError:
+            pass
+
+    def _prune_due(self):
+        '''
+        return true if the cache wasn't pruned in the last prune_interval seconds;
+        record the time of the pruning that is about to happen
+        '''
+        path = os.path.join(self.path, 'last-prune')
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        else:
+            if 0 <= time.time() - mtime < self.prune_interval:
+                return False
+        try:
+            with open(path, 'wb'):
+                pass
+        except OSError:
+            # The cache directory doesn't exist (so there's nothing to prune),
+            # or it's not writable (so there's no way to prune it).
+            return False
+        return True
+
+    def prune(self):
+        '''
+        remove least recently used entries,
+        so that the total cache size doesn't exceed max_size;
+        do nothing if the cache was already pruned in the last prune_interval seconds
+        '''
+        if self.path is None:
+            return
+        if not self._prune_due():
+            return
+        entries = []
+        total_size = 0
+        try:
+            subdirs = os.listdir(self.path)
+        except OSError:
+            return
+        for subdir in subdirs:
+            subdir = os.path.join(self.path, subdir)
+            try:
+                filenames = os.listdir(subdir)
+            except OSError:
+                continue
+            for filename in filenames:
+                path = os.path.join(subdir, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries += [(st.st_mtime, st.st_size, path)]
+                total_size += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+            total_size -= size
+
+__all__ = [
+    'Cache',
+    'get_default_path',
+    'get_fingerprint',
+    'hash_file',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -24,22 +24,27 @@ checks
 
 import abc
 import collections
+import concurrent.futures
 import difflib
 import email.utils
+import functools
+import hashlib
 import heapq
+import json
+import multiprocessing
 import os
 import re
+import sys
 import types
 import urllib.parse
 
-import polib
-
 from lib import domains
 from lib import encodings as encinfo
 from lib import gettext
 from lib import ling
 from lib import misc
-from lib import polib4us
+from lib import moparser
+from lib import poparser
 from lib import tags
 from lib import xml
 
@@ -66,6 +71,13 @@ find_unusual_characters = re.compile(
     r'|(?<=\w)\xBF'  # INVERTED QUESTION MARK but only directly after a letter
 ).findall
 
+_looks_like_language = re.compile(r'''
+\A [a-z]{2,}
+(?: [_-] [A-Z]{2,} )?
+(?: [.] [a-zA-Z0-9+-]+ )?
+(?: @ [a-z]+ )?
+\Z''', re.VERBOSE).match
+
 header_fields_with_dedicated_checks = set()
 
 def checks_header_fields(*fields):
@@ -78,18 +90,29 @@ class Checker(abc.ABC):
 
     _patched_environment = None
 
+    _message_format_checkers = {
+        'c': msgformat_c.Checker,
+        'perl-brace': msgformat_perlbrace.Checker,
+        'python': msgformat_python.Checker,
+        'python-brace': msgformat_pybrace.Checker,
+    }
+
     @classmethod
     def patch_environment(cls):
         if cls._patched_environment is not None:
             raise EnvironmentAlreadyPatched
         encinfo.install_extra_encodings()
-        polib4us.install_patches()
         cls._patched_environment = True
 
-    def __init__(self, path, *, options):
+    def __init__(self, path, *, options, data=None):
+        '''
+        If data is not None, it is the file contents (bytes-like object),
+        and path is used only for determining the file type and the language.
+        '''
         if self._patched_environment is not True:
             raise EnvironmentNotPatched
         self.path = path
+        self.data = data
         self.fake_path = path
         if options.fake_root is not None:
             (real_root, fake_root) = options.fake_root
@@ -100,12 +123,6 @@ class Checker(abc.ABC):
             if path.startswith(real_root):
                 self.fake_path = fake_root + path[len(real_root):]
         self.options = options
-        self._message_format_checkers = {
-            'c': msgformat_c.Checker(self),
-            'perl-brace': msgformat_perlbrace.Checker(self),
-            'python': msgformat_python.Checker(self),
-            'python-brace': msgformat_pybrace.Checker(self),
-        }
 
     @abc.abstractmethod
     def tag(self, tagname, *extra):
@@ -115,61 +132,78 @@ class Checker(abc.ABC):
         # If a file passed to polib doesn't exist, it will “helpfully” treat it
         # as PO/MO file _contents_. This is definitely not what we want. To
         # prevent such disaster, fail early if the file doesn't exit.
-        try:
-            os.stat(self.path)
-        except OSError as exc:
-            self.tag('os-error', tags.safestr(exc.strerror))
-            return
+        if self.data is None:
+            try:
+                os.stat(self.path)
+            except OSError as exc:
+                self.tag('os-error', tags.safestr(exc.strerror))
+                return
         if self.options.file_type is None:
             extension = os.path.splitext(self.path)[-1]
         else:
             extension = '.' + self.options.file_type
         is_template = False
         is_binary = False
-        if extension == '.po':
-            constructor = polib.pofile
-        elif extension == '.pot':
-            constructor = polib.pofile
-            is_template = True
+        streamed = False
+        if extension in {'.po', '.pot'}:
+            if self.options.stream and self.data is None:
+                constructor = poparser.StreamedFile
+                streamed = True
+            else:
+                constructor = parse_po_file
+            is_template = extension == '.pot'
         elif extension in {'.mo', '.gmo'}:
-            constructor = polib.mofile
+            constructor = parse_mo_file
             is_binary = True
         else:
             self.tag('unknown-file-type')
             return
+        if self.data is not None:
+            constructor = functools.partial(constructor, data=self.data)
+        def load(**kwargs):
+            ctx = types.SimpleNamespace()
+            ctx.file = constructor(self.path, **kwargs)
+            ctx.is_template = is_template
+            ctx.is_binary = is_binary
+            # In the streaming mode, the file is parsed only now:
+            self.scan_entries(ctx)
+            return ctx
         broken_encoding = False
+        def fall_back(exc):
+            nonlocal broken_encoding
+            broken_encoding = exc
+            return 'ISO-8859-1'
         try:
             try:
-                file = constructor(self.path)
+                if streamed:
+                    ctx = load()
+                else:
+                    # The parser switches to the fallback encoding itself,
+                    # without reading or parsing the file again:
+                    ctx = load(on_decode_error=fall_back)
             except UnicodeDecodeError as exc:
+                # In the streaming mode, the file is parsed again anyway:
                 broken_encoding = exc
-                file = constructor(self.path, encoding='ISO-8859-1')
-        except polib4us.moparser.SyntaxError as exc:
+                ctx = load(encoding='ISO-8859-1')
+        except moparser.SyntaxError as exc:
             self.tag('invalid-mo-file', tags.safestr(exc))
             return
+        except poparser.SyntaxError as exc:
+            lineno_part = f'line {exc.lineno}'
+            message = exc.message
+            if message is not None:
+                lineno_part += ':'
+                if re.fullmatch(r'[a-z]+( [a-z]+)*', message):
+                    message = tags.safestr(message)
+            message_parts = [tags.safestr(lineno_part)]
+            if message is not None:
+                message_parts += [message]
+            self.tag('syntax-error-in-po-file', *message_parts)
+            return
         except OSError as exc:
-            message = str(exc)
             if exc.errno is not None:
                 self.tag('os-error', tags.safestr(exc.strerror))
                 return
-            elif message.startswith('Syntax error in po file '):
-                message = message[24:]
-                message_parts = []
-                if message.startswith(self.path + ' '):
-                    message = message[len(self.path)+1:]
-                match = re.fullmatch(r'\(line ([0-9]+)\)(?:: (.+))?', message)
-                if match is not None:
-                    lineno_part = f'line {match.group(1)}'
-                    message = match.group(2)
-                    if message is not None:
-                        lineno_part += ':'
-                        if re.fullmatch(r'[a-z]+( [a-z]+)*', message):
-                            message = tags.safestr(message)
-                    message_parts += [tags.safestr(lineno_part)]
-                if message is not None:
-                    message_parts += [message]
-                self.tag('syntax-error-in-po-file', *message_parts)
-                return
             raise
         finally:
             if broken_encoding:
@@ -186,10 +220,7 @@ class Checker(abc.ABC):
                 )
                 # pylint: enable=no-member
                 broken_encoding = True
-        ctx = types.SimpleNamespace()
-        ctx.file = file
-        ctx.is_template = is_template
-        ctx.is_binary = is_binary
+        self.check_hash_table(ctx)
         self.check_comments(ctx)
         self.check_headers(ctx)
         self.check_language(ctx)
@@ -202,6 +233,42 @@ class Checker(abc.ABC):
         self.check_translator(ctx)
         self.check_messages(ctx)
 
+    def scan_entries(self, ctx):
+        '''
+        sort out the entries in a single pass,
+        so that the other checks don't have to walk the whole file again
+        '''
+        ctx.first_entry = None
+        ctx.header_entries = []  # only the first two are needed
+        # In the streaming mode, the messages are not kept in memory;
+        # check_messages() will iterate over the file again.
+        streamed = isinstance(ctx.file, poparser.StreamedFile)
+        ctx.messages = None if streamed else []
+        ctx.has_plurals = False  # messages with plural forms (translated or not)?
+        ctx.expected_nplurals = {}  # number of plurals in _translated_ messages
+        for entry in ctx.file:
+            if ctx.first_entry is None:
+                ctx.first_entry = entry
+            if entry.obsolete:
+                continue
+            if is_header_entry(entry):
+                if len(ctx.header_entries) < 2:
+                    ctx.header_entries += [entry]
+            elif ctx.messages is not None:
+                ctx.messages += [entry]
+            if entry.msgid_plural is not None:
+                ctx.has_plurals = True
+                # Two different numbers are enough to complain about.
+                if len(ctx.expected_nplurals) <= 1 and entry.translated():
+                    ctx.expected_nplurals[len(entry.msgstr_plural)] = entry
+
+    def check_hash_table(self, ctx):
+        if not ctx.is_binary:
+            return
+        error = ctx.file.hash_table_error
+        if error is not None:
+            self.tag('invalid-hash-table-in-mo-file', tags.safestr(error))
+
     def check_comments(self, ctx):
         regexs = {
             r'\bPACKAGE package\b',
@@ -244,41 +311,10 @@ class Checker(abc.ABC):
         language_source = 'command-line'
         language_source_quality = 1
         if language is None:
-            path_components = os.path.normpath(self.path).split('/')
-            try:
-                i = path_components.index('LC_MESSAGES')
-            except ValueError:
-                i = 0
-            if i > 0:
-                language = path_components[i - 1]
-                try:
-                    language = ling.parse_language(language)
-                    language.fix_codes()
-                    language.remove_encoding()
-                    language.remove_nonlinguistic_modifier()
-                except ling.LanguageError:
-                    # It's not our job to report possible errors in _pathnames_.
-                    language = None
-                else:
-                    language_source = 'pathname'
-            del path_components, i
-        if language is None and self.path.endswith('.po'):
-            language, ext = os.path.splitext(os.path.basename(self.path))
-            assert ext == '.po'
-            try:
-                language = ling.parse_language(language)
-                if language.encoding is not None:
-                    # It's very likely that something else has been confused
-                    # for the apparent encoding.
-                    raise ling.LanguageError
-                language.fix_codes()
-                language.remove_nonlinguistic_modifier()
-            except ling.LanguageError:
-                # It's not our job to report possible errors in _pathnames_.
-                language = None
-            else:
+            (language, quality) = self.guess_language_from_path()
+            if language is not None:
                 language_source = 'pathname'
-                language_source_quality = 0
+                language_source_quality = quality
         if meta_language:
             try:
                 meta_language = ling.parse_language(meta_language)
@@ -357,9 +393,70 @@ class Checker(abc.ABC):
             self.tag('no-language-header-field', tags.safestr('Language:'), language)
         ctx.language = language
 
+    def guess_language_from_path(self):
+        '''
+        return (language, quality) guessed from the pathname,
+        or (None, None)
+        '''
+        path_components = os.path.normpath(self.path).split('/')
+        try:
+            i = path_components.index('LC_MESSAGES')
+        except ValueError:
+            i = 0
+        if i > 0:
+            language = path_components[i - 1]
+            try:
+                language = ling.parse_language(language)
+                language.fix_codes()
+                language.remove_encoding()
+                language.remove_nonlinguistic_modifier()
+            except ling.LanguageError:
+                # It's not our job to report possible errors in _pathnames_.
+                pass
+            else:
+                return (language, 1)
+        if self.path.endswith('.po'):
+            language, ext = os.path.splitext(os.path.basename(self.path))
+            assert ext == '.po'
+            try:
+                language = ling.parse_language(language)
+                if language.encoding is not None:
+                    # It's very likely that something else has been confused
+                    # for the apparent encoding.
+                    raise ling.LanguageError
+                language.fix_codes()
+                language.remove_nonlinguistic_modifier()
+            except ling.LanguageError:
+                # It's not our job to report possible errors in _pathnames_.
+                pass
+            else:
+                return (language, 0)
+        return (None, None)
+
+    def get_pathname_hints(self):
+        '''
+        return (in a JSON-serializable form) everything that check results
+        depend on in the pathname, other than the file extension
+        '''
+        if self.options.language is not None:
+            return
+        (language, quality) = self.guess_language_from_path()
+        if language is None:
+            return
+        hints = [str(language), quality]
+        if quality <= 0:
+            # check_language() searches for the language in the directory
+            # names; see the LibreOffice comment there.
+            hints += [sorted({
+                s for s in self.path.split('/')[1:-1]
+                if _looks_like_language(s)
+            })]
+        return hints
+
     @checks_header_fields('Plural-Forms')
     def check_plurals(self, ctx):
         ctx.plural_preimage = None
+        ctx.plural_expression = None
         plural_forms = ctx.metadata['Plural-Forms']
         if len(plural_forms) > 1:
             self.tag('duplicate-header-field-plural-forms')
@@ -374,18 +471,8 @@ class Checker(abc.ABC):
         correct_plural_forms = None
         if ctx.language is not None:
             correct_plural_forms = ctx.language.get_plural_forms()
-        has_plurals = False  # messages with plural forms (translated or not)?
-        expected_nplurals = {}  # number of plurals in _translated_ messages
-        for message in ctx.file:
-            if message.obsolete:
-                continue
-            if message.msgid_plural is not None:
-                has_plurals = True
-                if not message.translated():
-                    continue
-                expected_nplurals[len(message.msgstr_plural)] = message
-                if len(expected_nplurals) > 1:
-                    break
+        has_plurals = ctx.has_plurals
+        expected_nplurals = ctx.expected_nplurals
         if len(expected_nplurals) > 1:
             args = []
             for n, message in sorted(expected_nplurals.items()):
@@ -409,18 +496,18 @@ class Checker(abc.ABC):
             return
         if ctx.is_template:
             return
-        try:
-            (n, expr, ljunk, rjunk) = gettext.parse_plural_forms(plural_forms, strict=False)
-        except gettext.PluralFormsSyntaxError:
+        analysis = analyze_plural_forms(plural_forms)
+        if analysis is None:
             if has_plurals:
                 self.tag('syntax-error-in-plural-forms', plural_forms, '=>', plural_forms_hint)
             else:
                 self.tag('syntax-error-in-unused-plural-forms', plural_forms, '=>', plural_forms_hint)
             return
-        if ljunk:
-            self.tag('leading-junk-in-plural-forms', ljunk)
-        if rjunk:
-            self.tag('trailing-junk-in-plural-forms', rjunk)
+        n = analysis.n
+        if analysis.ljunk:
+            self.tag('leading-junk-in-plural-forms', analysis.ljunk)
+        if analysis.rjunk:
+            self.tag('trailing-junk-in-plural-forms', analysis.rjunk)
         if len(expected_nplurals) == 1:
             [expected_nplurals] = expected_nplurals.keys()
             if n != expected_nplurals:
@@ -428,12 +515,12 @@ class Checker(abc.ABC):
                     n, tags.safestr('(Plural-Forms header field)'), '!=',
                     expected_nplurals, tags.safestr('(number of msgstr items)')
                 )
-        locally_correct_n = locally_correct_expr = None
+        locally_correct_values = None
         if correct_plural_forms is not None:
             locally_correct_plural_forms = [
-                (i, expression)
-                for i, expression in map(gettext.parse_plural_forms, correct_plural_forms)
-                if i == n
+                correct_analysis
+                for correct_analysis in map(analyze_plural_forms, correct_plural_forms)
+                if correct_analysis.n == n
             ]
             if not locally_correct_plural_forms:
                 if has_plurals:
@@ -441,42 +528,39 @@ class Checker(abc.ABC):
                 else:
                     self.tag('unusual-unused-plural-forms', plural_forms, '=>', plural_forms_hint)
             elif len(locally_correct_plural_forms) == 1:
-                [[locally_correct_n, locally_correct_expr]] = locally_correct_plural_forms
-        plural_preimage = collections.defaultdict(list)
-        unusual_plural_forms = False
-        codomain_limit = 200
-        try:
-            for i in range(codomain_limit):
-                fi = expr(i)
+                [correct_analysis] = locally_correct_plural_forms
+                locally_correct_values = correct_analysis.values
+        if locally_correct_values is not None:
+            for fi, correct_fi in zip(analysis.values, locally_correct_values):
                 if fi >= n:
-                    message = tags.safe_format(f'f({i}) = {fi} >= {n}')
-                    if has_plurals:
-                        self.tag('codomain-error-in-plural-forms', message)
-                    else:
-                        self.tag('codomain-error-in-unused-plural-forms', message)
                     break
-                plural_preimage[fi] += [i]
-                if (n == locally_correct_n) and (fi != locally_correct_expr(i)) and (not unusual_plural_forms):
+                if fi != correct_fi:
                     if has_plurals:
                         self.tag('unusual-plural-forms', plural_forms, '=>', plural_forms_hint)
                     else:
                         self.tag('unusual-unused-plural-forms', plural_forms, '=>', plural_forms_hint)
-                    unusual_plural_forms = True
-            else:
+                    break
+        plural_preimage = collections.defaultdict(list)
+        for i, fi in enumerate(analysis.values):
+            if fi >= n:
+                message = tags.safe_format(f'f({i}) = {fi} >= {n}')
+                if has_plurals:
+                    self.tag('codomain-error-in-plural-forms', message)
+                else:
+                    self.tag('codomain-error-in-unused-plural-forms', message)
+                break
+            plural_preimage[fi] += [i]
+        else:
+            if analysis.arithmetic_error is None:
                 ctx.plural_preimage = dict(plural_preimage)
-        except OverflowError:
-            message = tags.safe_format('f({}): integer overflow', i)
+                ctx.plural_expression = analysis.expr
+        if analysis.arithmetic_error is not None:
+            message = tags.safe_format('f({}): ' + analysis.arithmetic_error, len(analysis.values))
             if has_plurals:
                 self.tag('arithmetic-error-in-plural-forms', message)
             else:
                 self.tag('arithmetic-error-in-unused-plural-forms', message)
-        except ZeroDivisionError:
-            message = tags.safe_format('f({}): division by zero', i)
-            if has_plurals:
-                self.tag('arithmetic-error-in-plural-forms', message)
-            else:
-                self.tag('arithmetic-error-in-unused-plural-forms', message)
-        codomain = expr.codomain()
+        codomain = analysis.codomain
         if codomain is not None:
             (x, y) = codomain
             uncov_rngs = []
@@ -485,10 +569,10 @@ class Checker(abc.ABC):
             if y + 1 < n:
                 uncov_rngs += [range(y + 1, n)]
         if (not uncov_rngs) and (ctx.plural_preimage is not None):
-            period = expr.period()
+            period = analysis.period
             if period is None:
                 period = (0, 1e999)
-            if sum(period) < codomain_limit:
+            if sum(period) < plural_forms_codomain_limit:
                 for i in sorted(ctx.plural_preimage):
                     if (i > 0) and (i - 1 not in ctx.plural_preimage):
                         uncov_rngs += [range(i - 1, i)]
@@ -722,9 +806,7 @@ class Checker(abc.ABC):
         strays = []
         ctx.file.header_entry = None
         seen_header_entry = False
-        for entry in ctx.file:
-            if not is_header_entry(entry) or entry.obsolete:
-                continue
+        for entry in ctx.header_entries:
             if seen_header_entry:
                 self.tag('duplicate-header-entry')
                 break
@@ -755,7 +837,7 @@ class Checker(abc.ABC):
                     self.tag('unexpected-flag-for-header-entry', flag)
                 if n > 1:
                     self.tag('duplicate-flag-for-header-entry', flag)
-            if entry is not ctx.file[0]:
+            if entry is not ctx.first_entry:
                 self.tag('distant-header-entry')
             unusual_chars = set(find_unusual_characters(msgstr))
             if unusual_chars:
@@ -799,81 +881,50 @@ class Checker(abc.ABC):
         del ctx.file.metadata_is_fuzzy
 
     def check_messages(self, ctx):
+        messages = ctx.messages
+        if messages is None:
+            messages = iter_messages(ctx.file)
+            jobs = 1
+        else:
+            jobs = min(self.options.jobs, len(messages) // parallel_chunk_size)
+        if jobs > 1:
+            records = self._check_messages_in_parallel(ctx, messages, jobs=jobs)
+        else:
+            records = (self._check_message(ctx, message) for message in messages)
+        # Merge the per-message records.
+        # Duplicate messages and unusual characters are reported only once per
+        # file, so they are dealt with here, in the order of messages:
         found_unusual_characters = set()
         msgid_counter = collections.Counter()
-        for message in ctx.file:
-            if message.obsolete:
-                continue
-            if is_header_entry(message):
-                continue
-            flags = self._check_message_flags(message)
-            self._check_message_formats(ctx, message, flags)
-            msgid_counter[message.msgid, message.msgctxt] += 1
-            if msgid_counter[message.msgid, message.msgctxt] == 2:
-                self.tag('duplicate-message-definition', message_repr(message))
-            has_msgstr = bool(message.msgstr)
-            has_msgstr_plural = any(message.msgstr_plural.values())
-            if ctx.is_template:
-                if has_msgstr or has_msgstr_plural:
-                    self.tag('translation-in-template', message_repr(message))
-            leading_lf = message.msgid.startswith('\n')
-            trailing_lf = message.msgid.endswith('\n')
-            has_previous_msgid = any(s is not None for s in [
-                message.previous_msgctxt,
-                message.previous_msgid,
-                message.previous_msgid_plural,
-            ])
-            if has_previous_msgid and not flags.fuzzy:
-                self.tag('stray-previous-msgid', message_repr(message))
-            strings = []
-            if message.msgid_plural is not None:
-                strings += [message.msgid_plural]
-            if not flags.fuzzy:
-                if has_msgstr:
-                    strings += [message.msgstr]
-                if has_msgstr_plural:
-                    strings += message.msgstr_plural.values()  # the order doesn't matter here
-            for s in strings:
-                if s.startswith('\n') != leading_lf:
-                    self.tag('inconsistent-leading-newlines', message_repr(message))
-                    break
-            for s in strings:
-                if s.endswith('\n') != trailing_lf:
-                    self.tag('inconsistent-trailing-newlines', message_repr(message))
-                    break
-            strings = []
-            if has_msgstr:
-                strings += [message.msgstr]
-            if has_msgstr_plural:
-                strings += misc.sorted_vk(message.msgstr_plural)
-            if ctx.encoding is not None:
-                msgid_uc = (
-                    set(find_unusual_characters(message.msgid)) |
-                    set(find_unusual_characters(message.msgid_plural or ''))
-                )
-                for msgstr in strings:
-                    msgstr_uc = set(find_unusual_characters(msgstr))
-                    uc = msgstr_uc - msgid_uc - found_unusual_characters
-                    if not uc:
-                        continue
-                    names = str.join(', ', (
-                        f'U+{ord(ch):04X} {encinfo.get_character_name(ch)}'
-                        for ch in sorted(uc)
-                    ))
-                    self.tag('unusual-character-in-translation',
-                        message_repr(message, template='{}:'),
-                        tags.safestr(names)
-                    )
-                    found_unusual_characters |= uc
-            if not flags.fuzzy:
-                for msgstr in strings:
-                    conflict_marker = gettext.search_for_conflict_marker(msgstr)
-                    if conflict_marker is not None:
-                        conflict_marker = conflict_marker.group(0)
-                        self.tag('conflict-marker-in-translation', message_repr(message), conflict_marker)
-                        break
-                if has_msgstr_plural and not all(message.msgstr_plural.values()):
-                    self.tag('partially-translated-message', message_repr(message))
+        for record in records:
+            for event, args in record:
+                if event == 'tag':
+                    self.tag(*args)
+                elif event == 'message':
+                    counter_key = args
+                    if ctx.messages is None:
+                        # Keep only hashes of the keys in memory:
+                        counter_key = hash_message_key(args)
+                    msgid_counter[counter_key] += 1
+                    if msgid_counter[counter_key] == 2:
+                        self.tag('duplicate-message-definition', message_repr(_MessageKey(*args)))
+                elif event == 'unusual-characters':
+                    (key, ucs) = args
+                    for uc in ucs:
+                        uc -= found_unusual_characters
+                        if not uc:
+                            continue
+                        names = str.join(', ', (
+                            f'U+{ord(ch):04X} {encinfo.get_character_name(ch)}'
+                            for ch in sorted(uc)
+                        ))
+                        self.tag('unusual-character-in-translation',
+                            message_repr(_MessageKey(*key), template='{}:'),
+                            tags.safestr(names)
+                        )
+                        found_unusual_characters |= uc
+                else:
+                    assert False, event
         if len(msgid_counter) == 0:
             possible_hidden_strings = False
             if ctx.is_binary:
@@ -881,12 +932,102 @@ class Checker(abc.ABC):
             if not possible_hidden_strings:
                 self.tag('empty-file')
 
-    def _check_message_flags(self, message):
+    def _check_messages_in_parallel(self, ctx, messages, *, jobs):
+        # The worker processes are forked, so that they inherit the parsed
+        # file, rather than receive it pickled.
+        global _fork_state  # pylint: disable=global-statement
+        n = len(messages)
+        chunk_size = max(parallel_chunk_size, -(-n // (4 * jobs)))
+        starts = range(0, n, chunk_size)
+        stops = [min(start + chunk_size, n) for start in starts]
+        # Otherwise the children would flush the inherited buffers, too:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        mp_context = multiprocessing.get_context('fork')
+        _fork_state = (self, ctx, messages)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(jobs, mp_context=mp_context) as executor:
+                for records in executor.map(_check_message_chunk, starts, stops):
+                    yield from records
+        finally:
+            _fork_state = None
+
+    def _check_message(self, ctx, message):
+        '''
+        check the message;
+        return _MessageRecord for check_messages() to merge
+        '''
+        record = _MessageRecord()
+        flags = self._check_message_flags(message, record)
+        self._check_message_formats(ctx, message, flags, record)
+        key = (message.msgid, message.msgctxt)
+        record.append(('message', key))
+        has_msgstr = bool(message.msgstr)
+        has_msgstr_plural = any(message.msgstr_plural.values())
+        if ctx.is_template:
+            if has_msgstr or has_msgstr_plural:
+                record.tag('translation-in-template', message_repr(message))
+        leading_lf = message.msgid.startswith('\n')
+        trailing_lf = message.msgid.endswith('\n')
+        has_previous_msgid = any(s is not None for s in [
+            message.previous_msgctxt,
+            message.previous_msgid,
+            message.previous_msgid_plural,
+        ])
+        if has_previous_msgid and not flags.fuzzy:
+            record.tag('stray-previous-msgid', message_repr(message))
+        strings = []
+        if message.msgid_plural is not None:
+            strings += [message.msgid_plural]
+        if not flags.fuzzy:
+            if has_msgstr:
+                strings += [message.msgstr]
+            if has_msgstr_plural:
+                strings += message.msgstr_plural.values()  # the order doesn't matter here
+        for s in strings:
+            if s.startswith('\n') != leading_lf:
+                record.tag('inconsistent-leading-newlines', message_repr(message))
+                break
+        for s in strings:
+            if s.endswith('\n') != trailing_lf:
+                record.tag('inconsistent-trailing-newlines', message_repr(message))
+                break
+        strings = []
+        if has_msgstr:
+            strings += [message.msgstr]
+        if has_msgstr_plural:
+            strings += misc.sorted_vk(message.msgstr_plural)
+        if ctx.encoding is not None:
+            msgid_uc = (
+                set(find_unusual_characters(message.msgid)) |
+                set(find_unusual_characters(message.msgid_plural or ''))
+            )
+            ucs = [
+                set(find_unusual_characters(msgstr)) - msgid_uc
+                for msgstr in strings
+            ]
+            if any(ucs):
+                record.append(('unusual-characters', (key, ucs)))
+        if not flags.fuzzy:
+            for msgstr in strings:
+                conflict_marker = gettext.search_for_conflict_marker(msgstr)
+                if conflict_marker is not None:
+                    conflict_marker = conflict_marker.group(0)
+                    record.tag('conflict-marker-in-translation', message_repr(message), conflict_marker)
+                    break
+            if has_msgstr_plural and not all(message.msgstr_plural.values()):
+                record.tag('partially-translated-message', message_repr(message))
+        return record
+
+    def _check_message_flags(self, message, record):
         info = types.SimpleNamespace()
         info.fuzzy = False
         info.range_min = 0
         info.range_max = 1e999  # +inf
         info.formats = None
+        if not message.flags:
+            info.formats = frozenset()
+            return info
         flags = collections.Counter(message.flags)
         wrap = None
         format_flags = collections.defaultdict(dict)
@@ -900,7 +1041,7 @@ class Checker(abc.ABC):
             elif flag in {'wrap', 'no-wrap'}:
                 new_wrap = flag == 'wrap'
                 if wrap == (not new_wrap):
-                    self.tag('conflicting-message-flags',
+                    record.tag('conflicting-message-flags',
                         message_repr(message, template='{}:'),
                         'wrap', 'no-wrap'
                     )
@@ -908,7 +1049,7 @@ class Checker(abc.ABC):
                     wrap = new_wrap
             elif flag.startswith('range:'):
                 if message.msgid_plural is None:
-                    self.tag('range-flag-without-plural-string')
+                    record.tag('range-flag-without-plural-string')
                 match = re.match(r'\A([0-9]+)[.][.]([0-9]+)\Z', flag[6:].strip(' \t\r\f\v'))
                 if match is not None:
                     i, j = map(int, match.groups())
@@ -918,7 +1059,7 @@ class Checker(abc.ABC):
                     else:
                         match = None
                 if match is None:
-                    self.tag('invalid-range-flag',
+                    record.tag('invalid-range-flag',
                         message_repr(message, template='{}:'),
                         flag
                     )
@@ -946,18 +1087,18 @@ class Checker(abc.ABC):
             else:
                 known_flag = False
             if not known_flag:
-                self.tag('unknown-message-flag',
+                record.tag('unknown-message-flag',
                     message_repr(message, template='{}:'),
                     flag
                 )
             if n > 1 and flag:
-                self.tag('duplicate-message-flag',
+                record.tag('duplicate-message-flag',
                     message_repr(message, template='{}:'),
                     flag
                 )
         if len(range_flags) > 1:
             [range1, range2] = heapq.nsmallest(2, range_flags.keys())
-            self.tag('conflicting-message-flags',
+            record.tag('conflicting-message-flags',
                 message_repr(message, template='{}:'),
                 min(range_flags[range1].keys()),
                 min(range_flags[range2].keys()),
@@ -965,7 +1106,7 @@ class Checker(abc.ABC):
         elif len(range_flags) == 1:
             [range_flags] = range_flags.values()
             if sum(range_flags.values()) > 1:
-                self.tag('duplicate-message-flag',
+                record.tag('duplicate-message-flag',
                     message_repr(message, template='{}:'),
                     min(range_flags.keys())
                 )
@@ -980,7 +1121,7 @@ class Checker(abc.ABC):
                 if fmt_ex1 & fmt_ex2:
                     # the formats are, at least to some extent, compatible
                     continue
-                self.tag('conflicting-message-flags',
+                record.tag('conflicting-message-flags',
                     message_repr(message, template='{}:'),
                     flag1, flag2
                 )
@@ -989,7 +1130,7 @@ class Checker(abc.ABC):
             negative_format_flags = format_flags[negative_key]
             conflicting_formats = frozenset(positive_format_flags) & frozenset(negative_format_flags)
             for fmt in sorted(conflicting_formats):
-                self.tag('conflicting-message-flags',
+                record.tag('conflicting-message-flags',
                     message_repr(message, template='{}:'),
                     positive_format_flags[fmt],
                     negative_format_flags[fmt],
@@ -998,24 +1139,25 @@ class Checker(abc.ABC):
         possible_format_flags = format_flags['possible']
         redundant_formats = frozenset(positive_format_flags) & frozenset(possible_format_flags)
         for fmt in sorted(redundant_formats):
-            self.tag('redundant-message-flag',
+            record.tag('redundant-message-flag',
                 message_repr(message, template='{}:'),
                 possible_format_flags[fmt],
                 tags.safe_format(f'(implied by {positive_format_flags[fmt]})')
             )
         return info
 
-    def _check_message_formats(self, ctx, message, flags):
+    def _check_message_formats(self, ctx, message, flags, record):
         for fmt in sorted(flags.formats):
             try:
-                checker = self._message_format_checkers[fmt]
+                checker_cls = self._message_format_checkers[fmt]
             except KeyError:
                 continue
+            checker = checker_cls(record)
             checker.check_message(ctx, message, flags)
         if re.match(fr'\Atype: Content of: (<{xml.name_re}>)+\Z', message.comment or ''):
-            self._check_message_xml_format(ctx, message, flags)
+            self._check_message_xml_format(ctx, message, flags, record)
 
-    def _check_message_xml_format(self, ctx, message, flags):
+    def _check_message_xml_format(self, ctx, message, flags, record):
         if ctx.encoding is None:
             return
         prefix = message_repr(message, template='{}:')
@@ -1023,7 +1165,7 @@ class Checker(abc.ABC):
             xml.check_fragment(message.msgid)
         except xml.SyntaxError as exc:
             if ctx.is_template:
-                self.tag('malformed-xml', prefix, tags.safestr(exc))
+                record.tag('malformed-xml', prefix, tags.safestr(exc))
             return
         if flags.fuzzy:
             return
@@ -1032,14 +1174,101 @@ class Checker(abc.ABC):
         try:
             xml.check_fragment(message.msgstr)
         except xml.SyntaxError as exc:
-            self.tag('malformed-xml', prefix, tags.safestr(exc))
+            record.tag('malformed-xml', prefix, tags.safestr(exc))
 
 __all__ = ['Checker']
 
+def parse_po_file(path, *, encoding=None, data=None, on_decode_error=None):
+    if data is None:
+        parser = poparser.Parser(path, encoding=encoding, on_decode_error=on_decode_error)
+    else:
+        parser = poparser.Parser.from_buffer(data, path=path, encoding=encoding, on_decode_error=on_decode_error)
+    return parser.parse()
+
+def parse_mo_file(path, *, encoding=None, data=None, on_decode_error=None):
+    if data is None:
+        parser = moparser.Parser(path, encoding=encoding, on_decode_error=on_decode_error)
+    else:
+        parser = moparser.Parser.from_buffer(data, path=path, encoding=encoding, on_decode_error=on_decode_error)
+    return parser.parse()
+
+plural_forms_codomain_limit = 200
+
+_PluralFormsAnalysis = collections.namedtuple('_PluralFormsAnalysis', [
+    'n', 'expr', 'ljunk', 'rjunk',
+    'values',  # f(0), f(1), …, up to the first one that is out of range
+    'arithmetic_error',  # None, or the error that occurred for the next argument
+    'codomain', 'period',
+])
+
+@functools.lru_cache(maxsize=256)
+def analyze_plural_forms(plural_forms):
+    # Return _PluralFormsAnalysis of the Plural-Forms header field,
+    # or None if it cannot be parsed.
+    # The result depends only on the field,
+    # so it's shared between all the files that use the same one.
+    try:
+        (n, expr, ljunk, rjunk) = gettext.parse_plural_forms(plural_forms, strict=False)
+    except gettext.PluralFormsSyntaxError:
+        return
+    (values, exc) = expr.evaluate_many(range(plural_forms_codomain_limit))
+    arithmetic_error = None
+    for i, fi in enumerate(values):
+        if fi >= n:
+            del values[i + 1:]
+            break
+    else:
+        if isinstance(exc, OverflowError):
+            arithmetic_error = 'integer overflow'
+        elif isinstance(exc, ZeroDivisionError):
+            arithmetic_error = 'division by zero'
+    return _PluralFormsAnalysis(
+        n, expr, ljunk, rjunk,
+        tuple(values), arithmetic_error,
+        expr.codomain(), expr.period(),
+    )
+
 def is_header_entry(entry):
     return (
         entry.msgid == '' and
         entry.msgctxt is None
     )
 
+def iter_messages(file):
+    for entry in file:
+        if entry.obsolete:
+            continue
+        if is_header_entry(entry):
+            continue
+        yield entry
+
+def hash_message_key(key):
+    key = json.dumps(key).encode('ASCII')
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+# Minimum number of messages to be checked by a single worker process:
+parallel_chunk_size = 2000
+
+_MessageKey = collections.namedtuple('_MessageKey', ['msgid', 'msgctxt'])
+
+class _MessageRecord(list):
+
+    '''
+    (event, args) pairs produced by checking a single message
+    '''
+
+    __slots__ = ()
+
+    def tag(self, tagname, *extra):
+        self.append(('tag', (tagname, *extra)))
+
+_fork_state = None
+
+def _check_message_chunk(start, stop):
+    (checker, ctx, messages) = _fork_state
+    return [
+        checker._check_message(ctx, message)  # pylint: disable=protected-access
+        for message in messages[start:stop]
+    ]
+
 # vim:ts=4 sts=4 sw=4 et
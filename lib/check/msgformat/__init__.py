@@ -23,8 +23,15 @@ message format checks
 '''
 
 import abc
+import functools
 import types
 
+@functools.lru_cache(maxsize=1024)
+def _get_plural_preimage(expr, i, range_min, range_max):
+    # Return the first 3 numbers in the range that are mapped to i,
+    # or None if they couldn't be determined.
+    return expr.preimage(i, start=range_min, stop=range_max + 1, limit=3)
+
 class Checker(abc.ABC):
 
     def __init__(self, parent):
@@ -90,15 +97,21 @@ class Checker(abc.ABC):
                 d.dst_fmt = self.check_string(ctx, message, s)
                 if d.dst_fmt is None:
                     continue
-                try:
-                    preimage = ctx.plural_preimage[i]
-                except KeyError:
+                preimage = _get_plural_preimage(ctx.plural_expression, i, flags.range_min, flags.range_max)
+                if preimage is None:
+                    # Fall back to the numbers that check_plurals() sampled.
+                    try:
+                        preimage = ctx.plural_preimage[i]
+                    except KeyError:
+                        # broken plural forms
+                        continue
+                    preimage = [
+                        x for x in preimage
+                        if flags.range_min <= x <= flags.range_max
+                    ]
+                elif i not in ctx.plural_preimage and not _get_plural_preimage(ctx.plural_expression, i, 0, 1e999):
                     # broken plural forms
                     continue
-                preimage = [
-                    x for x in preimage
-                    if flags.range_min <= x <= flags.range_max
-                ]
                 # XXX In theory, the msgstr[] corresponding to n=1 should
                 # not have more arguments than msgid. In practice, it's not
                 # uncommon to see something like this:
@@ -119,7 +132,8 @@ class Checker(abc.ABC):
                 #
                 # See also: https://bugs.debian.org/753946
                 if preimage == [1]:
-                    # FIXME: “preimage” is not necessarily complete.
+                    # FIXME: If the exact preimage couldn't be determined,
+                    # then “preimage” is not necessarily complete.
                     # So it's theoretically possible that this msgstr[]
                     # corresponds to both n=1 and another n.
                     d.src_loc = 'msgid'
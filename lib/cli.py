@@ -25,13 +25,19 @@ command-line interface
 import argparse
 import concurrent.futures
 import functools
+import hashlib
 import io
+import json
 import os
 import subprocess as ipc
 import sys
 import tempfile
 
+import polib
+
+from lib import cache
 from lib import check
+from lib import daemon
 from lib import ling
 from lib import misc
 from lib import paths as pathmod
@@ -49,7 +55,12 @@ def initialize_terminal():
 
 class Checker(check.Checker):
 
+    def __init__(self, path, *, options):
+        super().__init__(path, options=options)
+        self.results = []
+
     def tag(self, tagname, *extra):
+        self.results += [(tagname, extra)]
         if tagname in self.options.ignore_tags:
             return
         try:
@@ -61,12 +72,64 @@ class Checker(check.Checker):
         s = tag.format(self.fake_path, *extra, color=True)
         print(s)
 
-def check_regular_file(filename, *, options):
+    def replay(self, results):
+        for tagname, extra in results:
+            self.tag(tagname, *extra)
+
+    def get_cache_key(self):
+        '''
+        return the key under which check results for the file are cached,
+        or None if the results shouldn't be cached
+        '''
+        if self.options.file_type is None:
+            extension = os.path.splitext(self.path)[-1]
+            if extension not in {'.po', '.pot', '.mo', '.gmo'}:
+                return
+        else:
+            extension = '.' + self.options.file_type
+        try:
+            file_hash = cache.hash_file(self.path)
+        except OSError:
+            return
+        language = self.options.language
+        if language is not None:
+            language = str(language)
+        key = [
+            __version__,
+            cache.get_fingerprint(),
+            file_hash,
+            extension,
+            language,
+            self.get_pathname_hints(),
+        ]
+        key = json.dumps(key).encode('UTF-8', 'surrogateescape')
+        return hashlib.sha256(key).hexdigest()
+
+# tags that depend on the current time:
+time_dependent_tags = frozenset({'date-from-future'})
+
+def check_regular_file(filename, *, options, cache_key=None):
     checker_instance = Checker(filename, options=options)
+    if cache_key is None:
+        cache_key = checker_instance.get_cache_key()
+    if cache_key is not None:
+        results = options.cache.get(cache_key)
+        if results is not None:
+            checker_instance.replay(results)
+            return results
     checker_instance.check()
+    results = checker_instance.results
+    if cache_key is not None:
+        if not any(tagname in time_dependent_tags for tagname, extra in results):
+            options.cache.put(cache_key, results)
+    return results
+
+def replay_results(path, results, *, options):
+    checker_instance = Checker(path, options=options)
+    checker_instance.replay(results)
 
 def copy_options(options, **update):
-    kwargs = vars(options)
+    kwargs = dict(vars(options))
     kwargs.update(update)
     return argparse.Namespace(**kwargs)
 
@@ -105,36 +168,162 @@ def check_deb(filename, *, options):
                 if os.path.isfile(path):
                     check_file(path, options=options)
 
-def check_file(path, *, options):
+def is_deb(path, *, options):
+    return options.unpack_deb and path.endswith(('.deb', '.dsc'))
+
+def check_file(path, *, options, cache_key=None):
+    '''
+    check the file;
+    return raw check results, or None if the file was a Debian package
+    '''
     if options.unpack_deb:
         try:
             return check_deb(path, options=options)
         except UnsupportedFileType:
             pass
-    return check_regular_file(path, options=options)
+    return check_regular_file(path, options=options, cache_key=cache_key)
 
-def check_file_s(path, *, options):
+def get_cache_key(path, *, options):
+    if is_deb(path, options=options):
+        return
+    checker_instance = Checker(path, options=options)
+    return checker_instance.get_cache_key()
+
+def check_file_s(path, cache_key, *, options):
     '''
-    check_file() with captured stdout
+    check_file() with captured stdout;
+    return (stdout, results)
     '''
     orig_stdout = sys.stdout
     sys.stdout = io_stdout = io.StringIO()
     try:
-        check_file(path, options=options)
+        results = check_file(path, options=options, cache_key=cache_key)
     finally:
         sys.stdout = orig_stdout
-    return io_stdout.getvalue()
+    return (io_stdout.getvalue(), results)
+
+def get_check_cost(path):
+    '''
+    estimate how expensive checking the file is
+    '''
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
 
 def check_all(paths, *, options):
     if (len(paths) <= 1) or (options.jobs <= 1):
         for path in paths:
             check_file(path, options=options)
     else:
-        Executor = concurrent.futures.ProcessPoolExecutor
-        with Executor(max_workers=options.jobs) as executor:
-            check_file_opt = functools.partial(check_file_s, options=options)
-            for s in executor.map(check_file_opt, paths):
-                sys.stdout.write(s)
+        check_all_in_parallel(paths, options=options)
+
+def check_all_in_parallel(paths, *, options):
+    if not options.ordered:
+        # Longest-processing-time-first scheduling: start with the largest
+        # files, so that no worker is still busy with a huge file while
+        # the others are already idle.
+        paths = sorted(paths, key=get_check_cost, reverse=True)
+    Executor = concurrent.futures.ProcessPoolExecutor
+    with Executor(max_workers=options.jobs) as executor:
+        # Each file is checked by a single process:
+        job_options = copy_options(options, jobs=1)
+        outputs = check_files_in_executor(executor, paths,
+            options=job_options,
+            window=4 * options.jobs,
+            ordered=options.ordered,
+        )
+        if options.ordered:
+            # At most <window> results are buffered:
+            buffer = {}
+            i = 0
+            for (j, s, results) in outputs:
+                buffer[j] = (s, results)
+                while i in buffer:
+                    (s, results) = buffer.pop(i)
+                    print_job_output(paths[i], s, results, options=options)
+                    i += 1
+        else:
+            for (i, s, results) in outputs:
+                print_job_output(paths[i], s, results, options=options)
+
+def check_files_in_executor(executor, paths, *, options, window, ordered=False):
+    '''
+    check the files using the executor,
+    keeping at most <window> files in flight;
+    if <ordered> is true, also don't start checking files
+    that are <window> or more positions ahead of the first file not yet yielded;
+    yield (index, stdout, results) in the completion order;
+    stdout is None for files identical to those checked earlier,
+    whose results should be replayed
+    '''
+    # Check identical files only once.
+    # Cache keys are computed by the workers.
+    # Files whose key is already being checked are held back
+    # until the results are available.
+    get_key = functools.partial(get_cache_key, options=options)
+    check_file_opt = functools.partial(check_file_s, options=options)
+    n_submitted = 0
+    n_yielded = 0
+    # the first index not yet yielded, and the yielded indices past it:
+    head = 0
+    yielded = set()
+    key_jobs = {}
+    check_jobs = {}
+    held_back = {}
+    key_results = {}
+    def submit_check(i, key):
+        check_jobs[executor.submit(check_file_opt, paths[i], key)] = (i, key)
+        if key is not None:
+            held_back[key] = []
+    def submit():
+        nonlocal n_submitted
+        while n_submitted < len(paths):
+            if n_submitted - (head if ordered else n_yielded) >= window:
+                break
+            key_jobs[executor.submit(get_key, paths[n_submitted])] = n_submitted
+            n_submitted += 1
+    submit()
+    while key_jobs or check_jobs:
+        (done, _) = concurrent.futures.wait(
+            [*key_jobs, *check_jobs],
+            return_when=concurrent.futures.FIRST_COMPLETED,
+        )
+        outputs = []
+        for future in done:
+            if future in key_jobs:
+                i = key_jobs.pop(future)
+                key = future.result()
+                if key is None:
+                    submit_check(i, None)
+                elif key in key_results:
+                    outputs += [(i, None, key_results[key])]
+                elif key in held_back:
+                    held_back[key] += [i]
+                else:
+                    submit_check(i, key)
+            else:
+                (i, key) = check_jobs.pop(future)
+                (s, results) = future.result()
+                outputs += [(i, s, results)]
+                if key is not None:
+                    key_results[key] = results
+                    outputs += [(j, None, results) for j in held_back.pop(key)]
+        for output in outputs:
+            yield output
+            n_yielded += 1
+            yielded.add(output[0])
+            while head in yielded:
+                yielded.remove(head)
+                head += 1
+        submit()
+
+def print_job_output(path, s, results, *, options):
+    if s is None:
+        replay_results(path, results, options=options)
+    else:
+        sys.stdout.write(s)
+    sys.stdout.flush()
 
 def get_cpu_count():
     try:
@@ -163,38 +352,19 @@ class VersionAction(argparse.Action):
             help='show version information and exit'
         )
 
-    @staticmethod
-    def _get_rply_version():
-        rply = check.gettext.intexpr.rply
-        try:
-            return rply.__version__
-        except AttributeError:
-            # __version__ is available only since rply 0.7.5:
-            # https://github.com/alex/rply/pull/58
-            pass
-        if sys.version_info >= (3, 8):
-            import importlib.metadata  # pylint: disable=import-outside-toplevel,import-error,no-name-in-module
-            return importlib.metadata.version('rply')  # pylint: disable=no-member
-        try:
-            import pkg_resources  # pylint: disable=import-outside-toplevel
-            [dist, *rest] = pkg_resources.require('rply')
-            del rest
-        except ImportError:
-            # oh well...
-            return
-        assert dist.project_name == 'rply'
-        return dist.version
-
     def __call__(self, parser, namespace, values, option_string=None):
         print(f'{parser.prog} {__version__}')
         print('+ Python {0}.{1}.{2}'.format(*sys.version_info))  # pylint: disable=consider-using-f-string
-        print(f'+ polib {check.polib.__version__}')
-        rply_version = self._get_rply_version()
-        if rply_version is not None:
-            print(f'+ rply {rply_version}')
+        print(f'+ polib {polib.__version__}')
         parser.exit()
 
-def main():
+def serve(path):
+    Checker.patch_environment()
+    # Warm up everything that is otherwise initialized lazily:
+    cache.get_fingerprint()
+    daemon.serve(path, functools.partial(main, daemon_child=True))
+
+def main(*, daemon_child=False):
     initialize_terminal()
     ap = argparse.ArgumentParser(description=__doc__)
     ap.color = False
@@ -202,13 +372,31 @@ def main():
     ap.add_argument('-l', '--language', metavar='LANG', help='assume this language')
     ap.add_argument('--unpack-deb', action='store_true', help='allow unpacking Debian packages')
     ap.add_argument('-j', '--jobs', type=parse_jobs, metavar='N', default=None, help='use N processes')
+    ap.add_argument('--ordered', action='store_true', help='with -j, print results in the order of input files')
+    ap.add_argument('--stream', action='store_true', help='parse PO files incrementally, to keep memory usage bounded')
+    ap.add_argument('--cache-dir', metavar='DIR', help='store cached results in DIR')
+    ap.add_argument('--no-cache', action='store_true', help="don't use cached results")
+    ap.add_argument('--daemon', metavar='SOCKET', help='run as a daemon listening on SOCKET')
     ap.add_argument('--parallel', type=int, metavar='N', default=None, help=argparse.SUPPRESS)  # renamed as -j/--jobs in 0.25
     ap.add_argument('--file-type', metavar='FILE-TYPE', help=argparse.SUPPRESS)
     ap.add_argument('--traceback', action='store_true', help=argparse.SUPPRESS)
-    ap.add_argument('files', metavar='FILE', nargs='+')
+    ap.add_argument('files', metavar='FILE', nargs='*')
     options = ap.parse_args()
     files = options.files
     del options.files
+    if options.daemon is not None:
+        if daemon_child:
+            ap.error('the daemon is already running')
+        if files:
+            ap.error('--daemon cannot be used together with FILE arguments')
+        try:
+            serve(options.daemon)
+        except OSError as exc:
+            ap.error(f'cannot listen on {options.daemon}: {exc.strerror}')
+        return
+    del options.daemon
+    if not files:
+        ap.error('the following arguments are required: FILE')
     pathmod.check()
     if options.language is not None:
         try:
@@ -229,8 +417,16 @@ def main():
     del options.parallel
     options.ignore_tags = set()
     options.fake_root = None
-    Checker.patch_environment()
+    if options.no_cache:
+        cache_dir = None
+    else:
+        cache_dir = options.cache_dir or cache.get_default_path()
+    options.cache = cache.Cache(cache_dir)
+    del options.cache_dir, options.no_cache
+    if not daemon_child:
+        Checker.patch_environment()
     check_all(files, options=options)
+    options.cache.prune()
 
 __all__ = ['main']
 
@@ -0,0 +1,225 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''
+daemon mode: checking files over a Unix socket
+'''
+
+# The client sends its command line, working directory and environment,
+# together with its stdout and stderr file descriptors.
+# The daemon forks, runs the command in the child on the client's behalf,
+# and sends back the exit status.
+# Only the user running the daemon is allowed to connect to it.
+#
+# This module must not import anything outside the standard library,
+# so that the client starts quickly.
+
+import array
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import traceback
+
+_fds = (1, 2)
+
+def _send_fds(sock, data, fds):
+    fds = array.array('i', fds)
+    n = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, fds.tobytes())])
+    if n < len(data):
+        sock.sendall(data[n:])
+
+def _recv_fds(sock, bufsize, nfds):
+    fds = array.array('i')
+    data, ancdata, flags, addr = sock.recvmsg(bufsize, socket.CMSG_SPACE(nfds * fds.itemsize))
+    del flags, addr
+    for level, tp, cdata in ancdata:
+        if level == socket.SOL_SOCKET and tp == socket.SCM_RIGHTS:
+            cdata = cdata[:len(cdata) - (len(cdata) % fds.itemsize)]
+            fds.frombytes(cdata)
+    return (data, list(fds))
+
+def _read_line(sock, data):
+    while not data.endswith(b'\n'):
+        chunk = sock.recv(1 << 16)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+def _exit_status(exc):
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        # This runs in a forked child.
+        sock = self.request
+        (data, fds) = _recv_fds(sock, 1 << 16, len(_fds))
+        data = _read_line(sock, data)
+        if len(fds) != len(_fds) or not data.endswith(b'\n'):
+            for fd in fds:
+                os.close(fd)
+            return
+        request = json.loads(data.decode('UTF-8'))
+        for fd, target_fd in zip(fds, _fds):
+            os.dup2(fd, target_fd)
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(request['environ'])
+        os.chdir(request['cwd'])
+        sys.argv = request['argv']
+        (sys.stdout, sys.stderr) = (
+            open(fd, 'wt', encoding=encoding, errors=errors, buffering=(1 if os.isatty(fd) else -1), closefd=False)  # pylint: disable=consider-using-with
+            for fd, (encoding, errors) in zip(_fds, request['streams'])
+        )
+        try:
+            self.server.handler()
+        except SystemExit as exc:
+            status = _exit_status(exc)
+        except BaseException:  # pylint: disable=broad-except
+            traceback.print_exc()
+            status = 1
+        else:
+            status = 0
+        for file in sys.stdout, sys.stderr:
+            try:
+                file.flush()
+            except OSError:
+                status = status or 1
+        reply = json.dumps(dict(status=status)) + '\n'
+        sock.sendall(reply.encode('ASCII'))
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+
+    '''
+    daemon listening on a Unix socket;
+    for each request, handler() is called in a forked child
+    '''
+
+    def __init__(self, path, handler):
+        self.handler = handler
+        _remove_stale_socket(path)
+        super().__init__(path, _RequestHandler)
+
+    def server_bind(self):
+        # Make the socket accessible only to the owner:
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+    def verify_request(self, request, client_address):
+        try:
+            so_peercred = socket.SO_PEERCRED
+        except AttributeError:  # no coverage
+            # not Linux; rely on the socket permissions
+            return True
+        ucred = struct.Struct('iII')  # pid, uid, gid
+        data = request.getsockopt(socket.SOL_SOCKET, so_peercred, ucred.size)
+        (pid, uid, gid) = ucred.unpack(data)
+        del pid, gid
+        return uid == os.getuid()
+
+def _remove_stale_socket(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def serve(path, handler):
+    '''
+    run the daemon until it's terminated
+    '''
+    server = Server(path, handler)
+    pid = os.getpid()
+    def terminate(signo, frame):
+        del signo, frame
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        with server:
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.getpid() == pid:
+            os.unlink(path)
+
+def run_client(path):
+    '''
+    ask the daemon listening on path to run the command on our behalf;
+    return the exit status, or None if the daemon is not running
+    '''
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError, PermissionError):
+            # not running, or owned by another user
+            return
+        streams = []
+        for file in sys.stdout, sys.stderr:
+            file.flush()
+            streams += [(file.encoding, file.errors)]
+        request = dict(
+            argv=sys.argv,
+            cwd=os.getcwd(),
+            environ=dict(os.environ),
+            streams=streams,
+        )
+        data = json.dumps(request) + '\n'
+        try:
+            _send_fds(sock, data.encode('UTF-8'), _fds)
+        except (BrokenPipeError, ConnectionResetError):
+            # The daemon might have replied already,
+            # so don't give up until the reply is read.
+            pass
+        try:
+            data = _read_line(sock, b'')
+        except ConnectionResetError:
+            data = b''
+    if not data.endswith(b'\n'):
+        prog = os.path.basename(sys.argv[0])
+        print(f'{prog}: error: connection to the daemon was lost', file=sys.stderr)
+        return 1
+    reply = json.loads(data.decode('UTF-8'))
+    return reply['status']
+
+__all__ = [
+    'run_client',
+    'serve',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -47,12 +47,6 @@ def _not_implemented(*args, **kwargs):  # no coverage
 
 def charmap_encoding(encoding):
 
-    def encode(input, errors='strict'):
-        return codecs.charmap_encode(input, errors, encoding_table)
-
-    def decode(input, errors='strict'):
-        return codecs.charmap_decode(input, errors, decoding_table)
-
     path = os.path.join(paths.datadir, 'charmaps', encoding.upper())
     try:
         file = open(path, 'rb')  # pylint: disable=consider-using-with
@@ -63,13 +57,37 @@ def charmap_encoding(encoding):
     decoding_table = decoding_table.decode('UTF-8')
     encoding_table = codecs.charmap_build(decoding_table)
 
+    # Single-byte encodings are stateless,
+    # so the incremental and stream codecs are as simple
+    # as those in the standard library:
+
+    class Codec(codecs.Codec):
+        def encode(self, input, errors='strict'):
+            return codecs.charmap_encode(input, errors, encoding_table)
+        def decode(self, input, errors='strict'):
+            return codecs.charmap_decode(input, errors, decoding_table)
+
+    class IncrementalEncoder(codecs.IncrementalEncoder):
+        def encode(self, input, final=False):
+            return codecs.charmap_encode(input, self.errors, encoding_table)[0]
+
+    class IncrementalDecoder(codecs.IncrementalDecoder):
+        def decode(self, input, final=False):
+            return codecs.charmap_decode(input, self.errors, decoding_table)[0]
+
+    class StreamWriter(Codec, codecs.StreamWriter):
+        pass
+
+    class StreamReader(Codec, codecs.StreamReader):
+        pass
+
     return codecs.CodecInfo(
-        encode=encode,
-        decode=decode,
-        streamreader=_not_implemented,
-        streamwriter=_not_implemented,
-        incrementalencoder=_not_implemented,
-        incrementaldecoder=_not_implemented,
+        encode=Codec().encode,
+        decode=Codec().decode,
+        streamreader=StreamReader,
+        streamwriter=StreamWriter,
+        incrementalencoder=IncrementalEncoder,
+        incrementaldecoder=IncrementalDecoder,
         name=encoding,
     )
 
@@ -86,10 +104,11 @@ def iconv_encoding(encoding):
     return codecs.CodecInfo(
         encode=encode,
         decode=decode,
+        # Stream codecs would have no way to flush the conversion state:
         streamreader=_not_implemented,
         streamwriter=_not_implemented,
-        incrementalencoder=_not_implemented,
-        incrementaldecoder=_not_implemented,
+        incrementalencoder=functools.partial(iconv.IncrementalEncoder, encoding=encoding),
+        incrementaldecoder=functools.partial(iconv.IncrementalDecoder, encoding=encoding),
         name=encoding,
     )
 
@@ -205,6 +224,13 @@ def is_ascii_compatible_encoding(encoding, *, missing_ok=True):
     else:
         raise EncodingLookupError(encoding)
 
+def is_iconv_encoding(encoding):
+    try:
+        decoder = codecs.lookup(encoding).incrementaldecoder
+    except LookupError:
+        return False
+    return isinstance(decoder, functools.partial) and decoder.func is iconv.IncrementalDecoder
+
 def _codec_search_function(encoding):
     encoding = _unmangle_encoding.get(encoding, encoding)
     if _portable_encodings.get(encoding, False) is None:
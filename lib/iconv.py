@@ -22,12 +22,14 @@
 string encoding and decoding using iconv(3), with a fallback to iconv(1)
 '''
 
+import codecs
 import ctypes
 import errno
 import os
 import re
 import subprocess as ipc
 import sys
+import threading
 
 default_encoding = sys.getdefaultencoding()
 
@@ -51,14 +53,115 @@ else:
     )
     _iconv.restype = ctypes.c_size_t
 
+# Conversion descriptors and output buffers are reused between calls.
+# They are per-thread, because descriptors have state,
+# which is reset before every conversion.
+_local = threading.local()
+
+# Larger buffers are not kept between calls:
+_max_buffer_size = 1 << 16
+
+def _open(tocode, fromcode):
+    cd = _iconv_open(bytes(tocode, 'ASCII'), bytes(fromcode, 'ASCII'))
+    assert isinstance(cd, int)
+    if cd == ctypes.c_void_p(-1).value:
+        rc = ctypes.get_errno()
+        raise OSError(rc, os.strerror(rc))
+    return cd
+
+def _get_descriptor(tocode, fromcode):
+    try:
+        descriptors = _local.descriptors
+    except AttributeError:
+        descriptors = _local.descriptors = {}
+    key = (tocode, fromcode)
+    try:
+        return descriptors[key]
+    except KeyError:
+        pass
+    cd = descriptors[key] = _open(tocode, fromcode)
+    return cd
+
+def _get_buffer(create_buffer, size):
+    # Return buffer created with create_buffer (ctypes.create_string_buffer or
+    # ctypes.create_unicode_buffer) that can hold at least size items.
+    if size > _max_buffer_size:
+        return create_buffer(size)
+    try:
+        buffers = _local.buffers
+    except AttributeError:
+        buffers = _local.buffers = {}
+    buffer = buffers.get(create_buffer)
+    if buffer is None or len(buffer) < size:
+        if buffer is not None:
+            size = min(max(size, 2 * len(buffer)), _max_buffer_size)
+        buffer = buffers[create_buffer] = create_buffer(size)
+    return buffer
+
 def _popen(*args):
-    def set_lc_all_c():
-        os.environ['LC_ALL'] = 'C'  # no coverage
     return ipc.Popen(args,  # pylint: disable=consider-using-with
         stdin=ipc.PIPE, stdout=ipc.PIPE, stderr=ipc.PIPE,
-        preexec_fn=set_lc_all_c,  # FIXME: not thread-safe
+        env=dict(os.environ, LC_ALL='C'),
     )
 
+def _run_iconv(input: bytes, *, fromcode, tocode):
+    # Convert the input with iconv(1);
+    # return (output, error message), where the message is empty on success.
+    child = _popen('iconv', '-f', fromcode, '-t', tocode)
+    (stdout, stderr) = child.communicate(input)
+    stderr = stderr.decode('ASCII', 'replace')
+    stderr = _boring_iconv_stderr.sub('', stderr)
+    return (stdout, stderr.strip())
+
+# Strings converted in a single iconv(1) process are separated with one of
+# these characters. They are encoded as the same single bytes in every
+# ASCII-compatible stateless encoding, which is checked using the probe string.
+_cli_separators = b'\n\0\x1F\x1E\x1D\x1C'
+_cli_probe = b'iconv'
+
+def _run_iconv_many(inputs, *, fromcode, tocode):
+    # Convert the byte strings with iconv(1),
+    # spawning as few processes as possible;
+    # return list of (output, error message) pairs.
+    try:
+        sep = next(
+            bytes([c]) for c in _cli_separators
+            if not any(bytes([c]) in input for input in inputs)
+        )
+    except StopIteration:
+        sep = None
+    results = []
+    i = 0
+    while i < len(inputs):
+        if sep is None or i == len(inputs) - 1:
+            results += [_run_iconv(inputs[i], fromcode=fromcode, tocode=tocode)]
+            i += 1
+            continue
+        batch = inputs[i:]
+        head = sep + _cli_probe + sep
+        (stdout, stderr) = _run_iconv(head + sep.join(batch) + sep, fromcode=fromcode, tocode=tocode)
+        if stdout.startswith(head):
+            outputs = stdout[len(head):].split(sep)
+            if not stderr and len(outputs) == len(batch) + 1 and outputs[-1] == b'':
+                results += [(output, '') for output in outputs[:-1]]
+                break
+            if stderr and len(outputs) <= len(batch):
+                # iconv(1) stops at the first error,
+                # but the output converted so far has already been written,
+                # so the separators in it tell which string is to blame.
+                j = len(outputs) - 1
+                results += [(output, '') for output in outputs[:j]]
+                i += j
+                (output, error) = _run_iconv(inputs[i], fromcode=fromcode, tocode=tocode)
+                results += [(output, error)]
+                i += 1
+                if error:
+                    continue
+        # The encoding is not suitable for batching,
+        # or the error was blamed on the wrong string.
+        sep = None
+    return results
+
 def encode(input: str, encoding=default_encoding, errors='strict'):
     if not isinstance(input, str):
         raise TypeError(f'input must be str, not {type(input).__name__}')
@@ -77,75 +180,99 @@ def _encode_dl(input: str, *, encoding):
     uwidth = 4
     binput = bytes(input, encoding=uencoding)
     assert len(binput) == len(input) * uwidth
-    cd = _iconv_open(bytes(encoding, 'ASCII'), bytes(uencoding, 'ASCII'))
-    assert isinstance(cd, int)
-    if cd == ctypes.c_void_p(-1).value:
-        rc = ctypes.get_errno()
-        raise OSError(rc, os.strerror(rc))
-    try:
-        c_input = ctypes.c_char_p(binput)
-        output_len = len(input)
-        while True:
-            inbuf = ctypes.cast(c_input, ctypes.POINTER(ctypes.c_char))
-            inbytesleft = ctypes.c_size_t(len(binput))
-            assert inbytesleft.value == len(binput)  # no overflow
-            outbuf = ctypes.create_string_buffer(output_len)
-            outbytesleft = ctypes.c_size_t(output_len)
-            assert outbytesleft.value == output_len  # no overflow
-            rc = _iconv(cd, None, None, None, None)
-            if rc == ctypes.c_size_t(-1).value:
-                rc = ctypes.get_errno()
-                raise OSError(rc, os.strerror(rc))
-            inbufptr = ctypes.pointer(ctypes.cast(inbuf, ctypes.POINTER(ctypes.c_char)))
-            outbufptr = ctypes.pointer(ctypes.cast(outbuf, ctypes.POINTER(ctypes.c_char)))
+    cd = _get_descriptor(encoding, uencoding)
+    c_input = ctypes.c_char_p(binput)
+    size = len(input)
+    while True:
+        inbuf = ctypes.cast(c_input, ctypes.POINTER(ctypes.c_char))
+        inbytesleft = ctypes.c_size_t(len(binput))
+        assert inbytesleft.value == len(binput)  # no overflow
+        outbuf = _get_buffer(ctypes.create_string_buffer, size)
+        output_len = len(outbuf)
+        outbytesleft = ctypes.c_size_t(output_len)
+        assert outbytesleft.value == output_len  # no overflow
+        rc = _iconv(cd, None, None, None, None)
+        if rc == ctypes.c_size_t(-1).value:
+            rc = ctypes.get_errno()
+            raise OSError(rc, os.strerror(rc))
+        inbufptr = ctypes.pointer(ctypes.cast(inbuf, ctypes.POINTER(ctypes.c_char)))
+        outbufptr = ctypes.pointer(ctypes.cast(outbuf, ctypes.POINTER(ctypes.c_char)))
+        rc = _iconv(cd,
+            inbufptr, ctypes.byref(inbytesleft),
+            outbufptr, ctypes.byref(outbytesleft),
+        )
+        if rc != ctypes.c_size_t(-1).value:
             rc = _iconv(cd,
-                inbufptr, ctypes.byref(inbytesleft),
+                None, None,
                 outbufptr, ctypes.byref(outbytesleft),
             )
-            if rc != ctypes.c_size_t(-1).value:
-                rc = _iconv(cd,
-                    None, None,
-                    outbufptr, ctypes.byref(outbytesleft),
-                )
-            if rc == ctypes.c_size_t(-1).value:
-                rc = ctypes.get_errno()
-                if rc == errno.E2BIG:
-                    output_len *= 2
-                    continue
-                elif rc in {errno.EILSEQ, errno.EINVAL}:
-                    begin = len(input) - inbytesleft.value // uwidth
-                    raise UnicodeEncodeError(
-                        encoding,
-                        input,
-                        begin, begin + 1,
-                        os.strerror(errno.EILSEQ),
-                    )
-                raise OSError(rc, os.strerror(rc))
-            assert inbytesleft.value == 0, f'{inbytesleft.value} bytes left'
-            output_len -= outbytesleft.value
-            return outbuf[:output_len]
-    finally:
-        rc = _iconv_close(cd)
-        if rc != 0:
+        if rc == ctypes.c_size_t(-1).value:
             rc = ctypes.get_errno()
+            if rc == errno.E2BIG:
+                size = 2 * len(outbuf)
+                continue
+            elif rc in {errno.EILSEQ, errno.EINVAL}:
+                begin = len(input) - inbytesleft.value // uwidth
+                raise UnicodeEncodeError(
+                    encoding,
+                    input,
+                    begin, begin + 1,
+                    os.strerror(errno.EILSEQ),
+                )
             raise OSError(rc, os.strerror(rc))
+        assert inbytesleft.value == 0, f'{inbytesleft.value} bytes left'
+        output_len -= outbytesleft.value
+        return outbuf[:output_len]
 
 def _encode_cli(input, *, encoding):
-    child = _popen('iconv', '-f', 'UTF-8', '-t', encoding)
-    (stdout, stderr) = child.communicate(input.encode('UTF-8'))
-    if stderr != b'':
-        stderr = stderr.decode('ASCII', 'replace')
-        stderr = _boring_iconv_stderr.sub('', stderr)
+    (stdout, stderr) = _run_iconv(input.encode('UTF-8'), fromcode='UTF-8', tocode=encoding)
+    if stderr:
         raise UnicodeEncodeError(encoding,
             input,  # .object
             0,  # .begin
             len(input),  # .end
-            stderr.strip()  # .reason
+            stderr  # .reason
         )
     return stdout
 
 _encode = _encode_dl if _iconv is not None else _encode_cli
 
+def encode_many(inputs, encoding=default_encoding):
+    '''
+    encode every string in the iterable;
+    return list of bytes objects,
+    with UnicodeEncodeError objects in place of strings that cannot be encoded
+
+    If iconv(1) is used, the strings are converted together in a single process
+    (unless some of them cannot be encoded).
+    '''
+    inputs = list(inputs)
+    for input in inputs:
+        if not isinstance(input, str):
+            raise TypeError(f'input must be str, not {type(input).__name__}')
+    if not isinstance(encoding, str):
+        raise TypeError(f'encoding must be str, not {type(encoding).__name__}')
+    return _encode_many(inputs, encoding=encoding)
+
+def _encode_many_dl(inputs, *, encoding):
+    results = []
+    for input in inputs:
+        try:
+            output = encode(input, encoding)
+        except UnicodeEncodeError as exc:
+            output = exc
+        results += [output]
+    return results
+
+def _encode_many_cli(inputs, *, encoding):
+    binputs = [input.encode('UTF-8') for input in inputs]
+    return [
+        output if not error else UnicodeEncodeError(encoding, input, 0, len(input), error)
+        for input, (output, error) in zip(inputs, _run_iconv_many(binputs, fromcode='UTF-8', tocode=encoding))
+    ]
+
+_encode_many = _encode_many_dl if _iconv is not None else _encode_many_cli
+
 def decode(input: bytes, encoding=default_encoding, errors='strict'):
     if not isinstance(input, bytes):
         raise TypeError(f'input must be bytes, not {type(input).__name__}')
@@ -160,84 +287,254 @@ def decode(input: bytes, encoding=default_encoding, errors='strict'):
     return _decode(input, encoding=encoding)
 
 def _decode_dl(input: bytes, *, encoding):
-    cd = _iconv_open(b'WCHAR_T', bytes(encoding, 'ASCII'))
-    assert isinstance(cd, int)
-    if cd == ctypes.c_void_p(-1).value:
-        rc = ctypes.get_errno()
-        raise OSError(rc, os.strerror(rc))
-    try:
-        c_input = ctypes.c_char_p(input)
-        output_len = len(input)
-        while True:
-            inbuf = ctypes.cast(c_input, ctypes.POINTER(ctypes.c_char))
-            inbytesleft = ctypes.c_size_t(len(input))
-            assert inbytesleft.value == len(input)  # no overflow
-            outbuf = ctypes.create_unicode_buffer(output_len)
-            outbytesleft = ctypes.c_size_t(output_len)  # no overflow
-            assert outbytesleft.value == output_len
-            rc = _iconv(cd, None, None, None, None)
-            if rc == ctypes.c_size_t(-1).value:
-                rc = ctypes.get_errno()
-                raise OSError(rc, os.strerror(rc))
-            inbufptr = ctypes.pointer(ctypes.cast(inbuf, ctypes.POINTER(ctypes.c_char)))
-            outbufptr = ctypes.pointer(ctypes.cast(outbuf, ctypes.POINTER(ctypes.c_char)))
+    cd = _get_descriptor('WCHAR_T', encoding)
+    c_input = ctypes.c_char_p(input)
+    size = len(input)
+    while True:
+        inbuf = ctypes.cast(c_input, ctypes.POINTER(ctypes.c_char))
+        inbytesleft = ctypes.c_size_t(len(input))
+        assert inbytesleft.value == len(input)  # no overflow
+        outbuf = _get_buffer(ctypes.create_unicode_buffer, size)
+        output_len = ctypes.sizeof(outbuf)
+        outbytesleft = ctypes.c_size_t(output_len)  # no overflow
+        assert outbytesleft.value == output_len
+        rc = _iconv(cd, None, None, None, None)
+        if rc == ctypes.c_size_t(-1).value:
+            rc = ctypes.get_errno()
+            raise OSError(rc, os.strerror(rc))
+        inbufptr = ctypes.pointer(ctypes.cast(inbuf, ctypes.POINTER(ctypes.c_char)))
+        outbufptr = ctypes.pointer(ctypes.cast(outbuf, ctypes.POINTER(ctypes.c_char)))
+        rc = _iconv(cd,
+            inbufptr, ctypes.byref(inbytesleft),
+            outbufptr, ctypes.byref(outbytesleft),
+        )
+        if rc != ctypes.c_size_t(-1).value:
             rc = _iconv(cd,
-                inbufptr, ctypes.byref(inbytesleft),
+                None, None,
                 outbufptr, ctypes.byref(outbytesleft),
             )
-            if rc != ctypes.c_size_t(-1).value:
-                rc = _iconv(cd,
-                    None, None,
-                    outbufptr, ctypes.byref(outbytesleft),
-                )
-            if rc == ctypes.c_size_t(-1).value:
-                rc = ctypes.get_errno()
-                if rc == errno.E2BIG:
-                    output_len *= 2
-                    continue
-                elif rc in {errno.EILSEQ, errno.EINVAL}:
-                    begin = len(input) - inbytesleft.value
-                    for end in range(begin + 1, len(input)):
-                        # Assume that the encoding can be synchronized on ASCII characters.
-                        # That's not necessarily true for _every_ encoding, but oh well.
-                        if input[end] < 0x80:
-                            break
-                    else:
-                        end = len(input)
-                    raise UnicodeDecodeError(
-                        encoding,
-                        input,
-                        begin, end,
-                        os.strerror(errno.EILSEQ),
-                    )
-                raise OSError(rc, os.strerror(rc))
-            assert inbytesleft.value == 0, f'{inbytesleft.value} bytes left'
-            output_len -= outbytesleft.value
-            assert output_len % ctypes.sizeof(ctypes.c_wchar) == 0
-            unicode_output_len = output_len // ctypes.sizeof(ctypes.c_wchar)
-            return outbuf[:unicode_output_len]
-    finally:
-        rc = _iconv_close(cd)
-        if rc != 0:
+        if rc == ctypes.c_size_t(-1).value:
             rc = ctypes.get_errno()
+            if rc == errno.E2BIG:
+                size = 2 * len(outbuf)
+                continue
+            elif rc in {errno.EILSEQ, errno.EINVAL}:
+                begin = len(input) - inbytesleft.value
+                for end in range(begin + 1, len(input)):
+                    # Assume that the encoding can be synchronized on ASCII characters.
+                    # That's not necessarily true for _every_ encoding, but oh well.
+                    if input[end] < 0x80:
+                        break
+                else:
+                    end = len(input)
+                raise UnicodeDecodeError(
+                    encoding,
+                    input,
+                    begin, end,
+                    os.strerror(errno.EILSEQ),
+                )
             raise OSError(rc, os.strerror(rc))
+        assert inbytesleft.value == 0, f'{inbytesleft.value} bytes left'
+        output_len -= outbytesleft.value
+        assert output_len % ctypes.sizeof(ctypes.c_wchar) == 0
+        unicode_output_len = output_len // ctypes.sizeof(ctypes.c_wchar)
+        return outbuf[:unicode_output_len]
 
 def _decode_cli(input, *, encoding):
-    child = _popen('iconv', '-f', encoding, '-t', 'UTF-8')
-    (stdout, stderr) = child.communicate(input)
-    if stderr != b'':
-        stderr = stderr.decode('ASCII', 'replace')
-        stderr = _boring_iconv_stderr.sub('', stderr)
+    (stdout, stderr) = _run_iconv(input, fromcode=encoding, tocode='UTF-8')
+    if stderr:
         raise UnicodeDecodeError(encoding,
             input,  # .object
             0,  # .begin
             len(input),  # .end
-            stderr.strip()  # .reason
+            stderr  # .reason
         )
     return stdout.decode('UTF-8')
 
 _decode = _decode_dl if _iconv is not None else _decode_cli
 
-__all__ = ['encode', 'decode']
+def decode_many(inputs, encoding=default_encoding):
+    '''
+    decode every bytes object in the iterable;
+    return list of strings,
+    with UnicodeDecodeError objects in place of bytes that cannot be decoded
+
+    If iconv(1) is used, the bytes are converted together in a single process
+    (unless some of them cannot be decoded).
+    '''
+    inputs = list(inputs)
+    for input in inputs:
+        if not isinstance(input, bytes):
+            raise TypeError(f'input must be bytes, not {type(input).__name__}')
+    if not isinstance(encoding, str):
+        raise TypeError(f'encoding must be str, not {type(encoding).__name__}')
+    return _decode_many(inputs, encoding=encoding)
+
+def _decode_many_dl(inputs, *, encoding):
+    results = []
+    for input in inputs:
+        try:
+            output = decode(input, encoding)
+        except UnicodeDecodeError as exc:
+            output = exc
+        results += [output]
+    return results
+
+def _decode_many_cli(inputs, *, encoding):
+    return [
+        output.decode('UTF-8') if not error else UnicodeDecodeError(encoding, input, 0, len(input), error)
+        for input, (output, error) in zip(inputs, _run_iconv_many(inputs, fromcode=encoding, tocode='UTF-8'))
+    ]
+
+_decode_many = _decode_many_dl if _iconv is not None else _decode_many_cli
+
+def _convert(cd, input: bytes, create_buffer, *, flush=False):
+    # Convert the input with iconv(3), without resetting the conversion state.
+    # Return (output, n, rc), where n is the number of input bytes consumed,
+    # and rc is 0 or the errno value that stopped the conversion early.
+    output = []
+    c_input = ctypes.c_char_p(input)
+    inbuf = ctypes.cast(c_input, ctypes.POINTER(ctypes.c_char))
+    inbytesleft = ctypes.c_size_t(len(input))
+    assert inbytesleft.value == len(input)  # no overflow
+    inbufptr = ctypes.pointer(inbuf)
+    size = len(input) + 16
+    while True:
+        outbuf = _get_buffer(create_buffer, size)
+        item_size = ctypes.sizeof(outbuf) // len(outbuf)
+        outbytesleft = ctypes.c_size_t(ctypes.sizeof(outbuf))
+        outbufptr = ctypes.pointer(ctypes.cast(outbuf, ctypes.POINTER(ctypes.c_char)))
+        rc = _iconv(cd,
+            inbufptr, ctypes.byref(inbytesleft),
+            outbufptr, ctypes.byref(outbytesleft),
+        )
+        if rc != ctypes.c_size_t(-1).value and flush:
+            rc = _iconv(cd,
+                None, None,
+                outbufptr, ctypes.byref(outbytesleft),
+            )
+        rc = ctypes.get_errno() if rc == ctypes.c_size_t(-1).value else 0
+        output_len = (ctypes.sizeof(outbuf) - outbytesleft.value) // item_size
+        output += [outbuf[:output_len]]
+        if rc == errno.E2BIG:
+            size = 2 * len(outbuf)
+            continue
+        elif rc in {0, errno.EILSEQ, errno.EINVAL}:
+            return (output, len(input) - inbytesleft.value, rc)
+        raise OSError(rc, os.strerror(rc))
+
+class _IncrementalCodec:
+
+    _cd = None
+
+    def __init__(self, errors='strict', *, encoding=default_encoding):
+        if _iconv is None:
+            raise NotImplementedError
+        if errors != 'strict':
+            raise NotImplementedError(f'error handler {errors!r} is not implemented')
+        super().__init__(errors)
+        self.encoding = encoding
+        self._cd = _open(*self._codes)
+
+    @property
+    def _codes(self):
+        raise NotImplementedError
+
+    def reset(self):
+        rc = _iconv(self._cd, None, None, None, None)
+        if rc == ctypes.c_size_t(-1).value:
+            rc = ctypes.get_errno()
+            raise OSError(rc, os.strerror(rc))
+
+    def __del__(self):
+        if self._cd is not None:
+            _iconv_close(self._cd)
+            self._cd = None
+
+class IncrementalEncoder(_IncrementalCodec, codecs.IncrementalEncoder):
+
+    '''
+    iconv(3)-based incremental encoder,
+    which keeps the conversion state between calls
+    '''
+
+    _uencoding = 'UTF-32LE'
+    _uwidth = 4
+
+    @property
+    def _codes(self):
+        return (self.encoding, self._uencoding)
+
+    def encode(self, input: str, final=False):  # pylint: disable=redefined-builtin
+        binput = bytes(input, encoding=self._uencoding)
+        (output, n, rc) = _convert(self._cd, binput, ctypes.create_string_buffer, flush=final)
+        if rc != 0:
+            begin = n // self._uwidth
+            raise UnicodeEncodeError(
+                self.encoding,
+                input,
+                begin, begin + 1,
+                os.strerror(errno.EILSEQ),
+            )
+        return b''.join(output)
+
+class IncrementalDecoder(_IncrementalCodec, codecs.IncrementalDecoder):
+
+    '''
+    iconv(3)-based incremental decoder,
+    which keeps the conversion state between calls
+    '''
+
+    @property
+    def _codes(self):
+        return ('WCHAR_T', self.encoding)
+
+    def __init__(self, errors='strict', *, encoding=default_encoding):
+        super().__init__(errors, encoding=encoding)
+        self.buffer = b''
+
+    def decode(self, input, final=False):  # pylint: disable=redefined-builtin
+        # As for the standard incremental decoders,
+        # the exception object is the buffered data followed by the input.
+        data = self.buffer + bytes(input)
+        (output, n, rc) = _convert(self._cd, data, ctypes.create_unicode_buffer, flush=final)
+        if rc == errno.EILSEQ or (rc == errno.EINVAL and final):
+            for end in range(n + 1, len(data)):
+                # Assume that the encoding can be synchronized on ASCII characters,
+                # as _decode_dl() does.
+                if data[end] < 0x80:
+                    break
+            else:
+                end = len(data)
+            raise UnicodeDecodeError(
+                self.encoding,
+                data,
+                n, end,
+                os.strerror(errno.EILSEQ),
+            )
+        self.buffer = data[n:]
+        return ''.join(output)
+
+    def reset(self):
+        super().reset()
+        self.buffer = b''
+
+    def getstate(self):
+        # The conversion state is opaque,
+        # so only the buffered input can be reported.
+        return (self.buffer, 0)
+
+    def setstate(self, state):
+        self.reset()
+        (self.buffer, _) = state
+
+__all__ = [
+    'IncrementalDecoder',
+    'IncrementalEncoder',
+    'decode',
+    'decode_many',
+    'encode',
+    'encode_many',
+]
 
 # vim:ts=4 sts=4 sw=4 et
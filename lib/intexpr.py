@@ -23,137 +23,154 @@ C integer expressions
 '''
 
 import ast
-import functools
+import re
 import types
 
-import rply
-import rply.errors
+class LexingError(Exception):
+    pass
 
-LexingError = rply.errors.LexingError
-ParsingError = rply.errors.ParsingError
+class ParsingError(Exception):
+    pass
 
 # https://git.savannah.gnu.org/cgit/gettext.git/tree/gettext-runtime/intl/plural.y?id=v0.18.3#n132
 
-@functools.lru_cache(maxsize=None)
-def create_lexer():
-    lg = rply.LexerGenerator()
-    lg.add('IF', r'[?]')
-    lg.add('ELSE', r':')
-    lg.add('OR', r'[|][|]')
-    lg.add('AND', r'[&][&]')
-    lg.add('EQ', r'[!=]=')
-    lg.add('CMP', r'[<>]=?')
-    lg.add('ADDSUB', r'[+-]')
-    lg.add('MULDIV', r'[*/%]')
-    lg.add('NOT', r'!')
-    lg.add('LPAR', r'[(]')
-    lg.add('RPAR', r'[)]')
-    lg.add('VAR', r'n')
-    lg.add('INT', r'[0-9]+')
-    lg.ignore(r'[ \t]+')
-    return lg.build()
-
-@functools.lru_cache(maxsize=None)
-def create_parser(lexer):
-    pg = rply.ParserGenerator(
-        [rule.name for rule in lexer.rules],
-        precedence=[
-            ('right', ['IF', 'ELSE']),
-            ('left', ['OR']),
-            ('left', ['AND']),
-            ('left', ['EQ']),
-            ('left', ['CMP']),
-            ('left', ['ADDSUB']),
-            ('left', ['MULDIV']),
-            ('right', ['NOT']),
-        ],
-        cache_id='i18nspector-intexpr',
-    )
-    ast_bool = {
-        '&&': ast.And(),
-        '||': ast.Or(),
-    }
-    ast_cmp = {
-        '==': ast.Eq(),
-        '!=': ast.NotEq(),
-        '<': ast.Lt(),
-        '<=': ast.LtE(),
-        '>': ast.Gt(),
-        '>=': ast.GtE(),
-    }
-    ast_arithmetic = {
-        '+': ast.Add(),
-        '-': ast.Sub(),
-        '*': ast.Mult(),
-        '/': ast.Div(),
-        '%': ast.Mod(),
-    }
-    ast_not = ast.Not()
-    # pylint: disable=unused-variable
-    @pg.production('start : exp')
-    def eval_start(p):
-        [exp] = p
-        return ast.Expr(exp)
-    @pg.production('exp : exp IF exp ELSE exp')
-    def expr_ifelse(p):
-        [cond, _, body, _, orelse] = p
-        return ast.IfExp(cond, body, orelse)
-    @pg.production('exp : exp OR exp')
-    @pg.production('exp : exp AND exp')
-    def expr_bool(p):
-        [left, tok, right] = p
-        op = ast_bool[tok.getstr()]
-        return ast.BoolOp(op, [left, right])
-    @pg.production('exp : exp EQ exp')
-    @pg.production('exp : exp CMP exp')
-    def expr_cmp(p):
-        [left, tok, right] = p
-        op = ast_cmp[tok.getstr()]
-        return ast.Compare(left, [op], [right])
-    @pg.production('exp : exp ADDSUB exp')
-    @pg.production('exp : exp MULDIV exp')
-    def expr_arithmetic(p):
-        [left, tok, right] = p
-        op = ast_arithmetic[tok.getstr()]
-        return ast.BinOp(left, op, right)
-    @pg.production('exp : NOT exp')
-    def expr_not(p):
-        [_, value] = p
-        return ast.UnaryOp(ast_not, value)
-    @pg.production('exp : LPAR exp RPAR')
-    def expr_par(p):
-        [_, exp, _] = p
-        return exp
-    @pg.production('exp : VAR')
-    def expr_var(p):
-        [tok] = p
-        ident = tok.getstr()
-        assert ident == 'n'
-        return ast.Name(ident, ast.Load())
-    @pg.production('exp : INT')
-    def expr_int(p):
-        [tok] = p
-        n = int(tok.getstr())
-        return ast.Constant(n)
-    # pylint: enable=unused-variable
-    with misc.throwaway_tempdir('rply'):
-        # Use private temporary directory
-        # to mitigate RPLY's insecure use of /tmp:
-        # CVE-2014-1604, CVE-2014-1938
-        return pg.build()
+_token_types = [
+    ('SPACE', r'[ \t]+'),
+    ('IF', r'[?]'),
+    ('ELSE', r':'),
+    ('OR', r'[|][|]'),
+    ('AND', r'[&][&]'),
+    ('EQ', r'[!=]='),
+    ('CMP', r'[<>]=?'),
+    ('ADDSUB', r'[+-]'),
+    ('MULDIV', r'[*/%]'),
+    ('NOT', r'!'),
+    ('LPAR', r'[(]'),
+    ('RPAR', r'[)]'),
+    ('VAR', r'n'),
+    ('INT', r'[0-9]+'),
+]
+
+# The first matching alternative wins, not the longest one:
+_match_token = re.compile(
+    '|'.join(f'(?P<{tp}>{regex})' for tp, regex in _token_types)
+).match
+
+def lex(s):
+    '''
+    generate (type, string) pairs for tokens of the expression
+    '''
+    pos = 0
+    while pos < len(s):
+        match = _match_token(s, pos)
+        if match is None:
+            raise LexingError(f'unexpected character at position {pos}')
+        pos = match.end()
+        tp = match.lastgroup
+        if tp == 'SPACE':
+            continue
+        yield (tp, match.group())
+
+# binding power of binary operators;
+# all of them are left-associative, except for the conditional operator:
+_precedence = dict(
+    IF=1,
+    OR=2,
+    AND=3,
+    EQ=4,
+    CMP=5,
+    ADDSUB=6,
+    MULDIV=7,
+)
+
+_ast_binary = {
+    '||': ast.Or,
+    '&&': ast.And,
+    '==': ast.Eq,
+    '!=': ast.NotEq,
+    '<': ast.Lt,
+    '<=': ast.LtE,
+    '>': ast.Gt,
+    '>=': ast.GtE,
+    '+': ast.Add,
+    '-': ast.Sub,
+    '*': ast.Mult,
+    '/': ast.Div,
+    '%': ast.Mod,
+}
+
+class _Tokens:
+
+    def __init__(self, s):
+        self._iter = lex(s)
+        self.advance()
+
+    def advance(self):
+        (self.type, self.string) = next(self._iter, (None, None))
+
+    def error(self):
+        return ParsingError(f'unexpected {self.type or "end of input"}')
+
+    def pop(self, tp=None):
+        if self.type is None or (tp is not None and self.type != tp):
+            raise self.error()
+        token = (self.type, self.string)
+        self.advance()
+        return token
 
 class Parser:
 
-    def __init__(self):
-        self._lexer = create_lexer()
-        self._parser = create_parser(self._lexer)
+    '''
+    precedence climbing parser for C integer expressions
+    '''
 
     def parse(self, s):
-        tokens = self._lexer.lex(s)
-        node = self._parser.parse(tokens)
-        return Expression(node)
-
-from lib import misc  # pylint: disable=wrong-import-position
+        tokens = _Tokens(s)
+        node = self._parse_exp(tokens, 0)
+        if tokens.type is not None:
+            raise tokens.error()
+        return Expression(ast.Expr(node))
+
+    def _parse_exp(self, tokens, min_precedence):
+        left = self._parse_atom(tokens)
+        while True:
+            precedence = _precedence.get(tokens.type)
+            if precedence is None or precedence < min_precedence:
+                return left
+            (tp, op) = tokens.pop()
+            if tp == 'IF':
+                body = self._parse_exp(tokens, 0)
+                tokens.pop('ELSE')
+                orelse = self._parse_exp(tokens, precedence)
+                left = ast.IfExp(left, body, orelse)
+                continue
+            right = self._parse_exp(tokens, precedence + 1)
+            ast_op = _ast_binary[op]()
+            if tp in {'OR', 'AND'}:
+                left = ast.BoolOp(ast_op, [left, right])
+            elif tp in {'EQ', 'CMP'}:
+                left = ast.Compare(left, [ast_op], [right])
+            else:
+                left = ast.BinOp(left, ast_op, right)
+
+    def _parse_atom(self, tokens):
+        tp = tokens.type
+        if tp == 'NOT':
+            tokens.pop()
+            value = self._parse_atom(tokens)
+            return ast.UnaryOp(ast.Not(), value)
+        if tp == 'LPAR':
+            tokens.pop()
+            exp = self._parse_exp(tokens, 0)
+            tokens.pop('RPAR')
+            return exp
+        if tp == 'VAR':
+            (_, s) = tokens.pop()
+            return ast.Name(s, ast.Load())
+        if tp == 'INT':
+            (_, s) = tokens.pop()
+            return ast.Constant(int(s))
+        raise tokens.error()
 
 class BaseEvaluator:
 
@@ -222,19 +239,148 @@ class BaseEvaluator:
     def _visit_boolop(self, node):
         return self._visit(node.op, *node.values)
 
-class Evaluator(BaseEvaluator):
+class Compiler(BaseEvaluator):
+
+    # Turn the expression into a Python function of n,
+    # made of closures, so that the tree is walked only once,
+    # rather than every time the function is evaluated.
+    #
+    # All the intermediate values are in the [0, 2 ** bits) range,
+    # so for each operator only one side of the range needs to be checked.
 
-    def __init__(self, node, n, *, bits):
+    def __init__(self, node, *, bits):
         super().__init__(node)
-        self._ctxt.n = n
         self._ctxt.max = 1 << bits
 
-    def _check_overflow(self, n):
-        if n < 0:
-            raise OverflowError(n)
-        if n >= self._ctxt.max:
-            raise OverflowError(n)
-        return n
+    # pylint: disable=unused-argument
+
+    # binary operators
+    # ================
+
+    def _visit_add(self, node, x, y):
+        max_ = self._ctxt.max
+        def add(n):
+            r = x(n) + y(n)
+            if r >= max_:
+                raise OverflowError(r)
+            return r
+        return add
+
+    def _visit_sub(self, node, x, y):
+        def sub(n):
+            r = x(n) - y(n)
+            if r < 0:
+                raise OverflowError(r)
+            return r
+        return sub
+
+    def _visit_mult(self, node, x, y):
+        max_ = self._ctxt.max
+        def mult(n):
+            r = x(n) * y(n)
+            if r >= max_:
+                raise OverflowError(r)
+            return r
+        return mult
+
+    def _visit_div(self, node, x, y):
+        return lambda n: x(n) // y(n)
+
+    def _visit_mod(self, node, x, y):
+        return lambda n: x(n) % y(n)
+
+    # unary operators
+    # ===============
+
+    def _visit_not(self, node, x):
+        return lambda n: int(not x(n))
+
+    # comparison operators
+    # ====================
+
+    def _visit_gte(self, node, x, y):
+        return lambda n: int(x(n) >= y(n))
+
+    def _visit_gt(self, node, x, y):
+        return lambda n: int(x(n) > y(n))
+
+    def _visit_lte(self, node, x, y):
+        return lambda n: int(x(n) <= y(n))
+
+    def _visit_lt(self, node, x, y):
+        return lambda n: int(x(n) < y(n))
+
+    def _visit_eq(self, node, x, y):
+        return lambda n: int(x(n) == y(n))
+
+    def _visit_noteq(self, node, x, y):
+        return lambda n: int(x(n) != y(n))
+
+    # boolean operators
+    # =================
+
+    def _visit_and(self, node, *args):
+        args = [self._visit(arg) for arg in args]
+        def and_(n):
+            for arg in args:
+                if arg(n) == 0:
+                    return 0
+            return 1
+        return and_
+
+    def _visit_or(self, node, *args):
+        args = [self._visit(arg) for arg in args]
+        def or_(n):
+            for arg in args:
+                if arg(n) != 0:
+                    return 1
+            return 0
+        return or_
+
+    # if-then-else expression
+    # =======================
+
+    def _visit_ifexp(self, node):
+        test = self._visit(node.test)
+        body = self._visit(node.body)
+        orelse = self._visit(node.orelse)
+        return lambda n: body(n) if test(n) else orelse(n)
+
+    # constants, variables
+    # ====================
+
+    def _visit_constant(self, node):
+        value = node.value
+        if value >= self._ctxt.max:
+            # The error is raised only if the constant is evaluated.
+            def constant(n):
+                raise OverflowError(value)
+            return constant
+        return lambda n: value
+
+    def _visit_name(self, node):
+        max_ = self._ctxt.max
+        def name(n):
+            if n < 0:
+                raise OverflowError(n)
+            if n >= max_:
+                raise OverflowError(n)
+            return n
+        return name
+
+class VectorCompiler(BaseEvaluator):
+
+    # Like Compiler, but the function takes a list of arguments
+    # and returns the list of values,
+    # computing each node for all the arguments at once.
+    #
+    # The function raises OverflowError or ZeroDivisionError
+    # if evaluation fails for any of the arguments,
+    # but it doesn't tell which one.
+
+    def __init__(self, node, *, bits):
+        super().__init__(node)
+        self._ctxt.max = 1 << bits
 
     # pylint: disable=unused-argument
 
@@ -242,86 +388,152 @@ class Evaluator(BaseEvaluator):
     # ================
 
     def _visit_add(self, node, x, y):
-        return self._check_overflow(x + y)
+        max_ = self._ctxt.max
+        def add(ns):
+            rs = [a + b for a, b in zip(x(ns), y(ns))]
+            if rs and max(rs) >= max_:
+                raise OverflowError
+            return rs
+        return add
 
     def _visit_sub(self, node, x, y):
-        return self._check_overflow(x - y)
+        def sub(ns):
+            rs = [a - b for a, b in zip(x(ns), y(ns))]
+            if rs and min(rs) < 0:
+                raise OverflowError
+            return rs
+        return sub
 
     def _visit_mult(self, node, x, y):
-        return self._check_overflow(x * y)
+        max_ = self._ctxt.max
+        def mult(ns):
+            rs = [a * b for a, b in zip(x(ns), y(ns))]
+            if rs and max(rs) >= max_:
+                raise OverflowError
+            return rs
+        return mult
 
     def _visit_div(self, node, x, y):
-        return x // y
+        return lambda ns: [a // b for a, b in zip(x(ns), y(ns))]
 
     def _visit_mod(self, node, x, y):
-        return x % y
+        return lambda ns: [a % b for a, b in zip(x(ns), y(ns))]
 
     # unary operators
     # ===============
 
     def _visit_not(self, node, x):
-        return int(not x)
+        return lambda ns: [int(not a) for a in x(ns)]
 
     # comparison operators
     # ====================
 
     def _visit_gte(self, node, x, y):
-        return int(x >= y)
+        return lambda ns: [int(a >= b) for a, b in zip(x(ns), y(ns))]
 
     def _visit_gt(self, node, x, y):
-        return int(x > y)
+        return lambda ns: [int(a > b) for a, b in zip(x(ns), y(ns))]
 
     def _visit_lte(self, node, x, y):
-        return int(x <= y)
+        return lambda ns: [int(a <= b) for a, b in zip(x(ns), y(ns))]
 
     def _visit_lt(self, node, x, y):
-        return int(x < y)
+        return lambda ns: [int(a < b) for a, b in zip(x(ns), y(ns))]
 
     def _visit_eq(self, node, x, y):
-        return int(x == y)
+        return lambda ns: [int(a == b) for a, b in zip(x(ns), y(ns))]
 
     def _visit_noteq(self, node, x, y):
-        return int(x != y)
+        return lambda ns: [int(a != b) for a, b in zip(x(ns), y(ns))]
 
     # boolean operators
     # =================
 
+    # Only the operands that the scalar evaluation would reach
+    # are evaluated for each argument.
+
     def _visit_and(self, node, *args):
-        for arg in args:
-            if self._visit(arg) == 0:
-                return 0
-        return 1
+        args = [self._visit(arg) for arg in args]
+        def and_(ns):
+            rs = [1] * len(ns)
+            pending = range(len(ns))
+            for arg in args:
+                if not pending:
+                    break
+                vs = arg([ns[i] for i in pending])
+                for i, v in zip(pending, vs):
+                    if v == 0:
+                        rs[i] = 0
+                pending = [i for i, v in zip(pending, vs) if v != 0]
+            return rs
+        return and_
 
     def _visit_or(self, node, *args):
-        for arg in args:
-            if self._visit(arg) != 0:
-                return 1
-        return 0
+        args = [self._visit(arg) for arg in args]
+        def or_(ns):
+            rs = [0] * len(ns)
+            pending = range(len(ns))
+            for arg in args:
+                if not pending:
+                    break
+                vs = arg([ns[i] for i in pending])
+                for i, v in zip(pending, vs):
+                    if v != 0:
+                        rs[i] = 1
+                pending = [i for i, v in zip(pending, vs) if v == 0]
+            return rs
+        return or_
 
     # if-then-else expression
     # =======================
 
     def _visit_ifexp(self, node):
         test = self._visit(node.test)
-        if test:
-            return self._visit(node.body)
-        else:
-            return self._visit(node.orelse)
+        body = self._visit(node.body)
+        orelse = self._visit(node.orelse)
+        def ifexp(ns):
+            tests = test(ns)
+            rs = [None] * len(ns)
+            for branch, selected in [
+                (body, [i for i, t in enumerate(tests) if t]),
+                (orelse, [i for i, t in enumerate(tests) if not t]),
+            ]:
+                if not selected:
+                    continue
+                for i, v in zip(selected, branch([ns[i] for i in selected])):
+                    rs[i] = v
+            return rs
+        return ifexp
 
     # constants, variables
     # ====================
 
     def _visit_constant(self, node):
-        return self._check_overflow(node.value)
+        value = node.value
+        if value >= self._ctxt.max:
+            def constant(ns):
+                if ns:
+                    raise OverflowError(value)
+                return []
+            return constant
+        return lambda ns: [value] * len(ns)
 
     def _visit_name(self, node):
-        return self._check_overflow(self._ctxt.n)
+        max_ = self._ctxt.max
+        def name(ns):
+            if ns and (min(ns) < 0 or max(ns) >= max_):
+                raise OverflowError
+            return ns
+        return name
 
 class CodomainEvaluator(BaseEvaluator):
 
-    def __init__(self, node, *, bits):
+    def __init__(self, node, *, bits, domain=None):
         super().__init__(node)
         self._ctxt.max = 1 << bits
+        if domain is None:
+            domain = (0, self._ctxt.max - 1)
+        self._ctxt.domain = domain
 
     # pylint: disable=unused-argument
 
@@ -373,6 +585,9 @@ class CodomainEvaluator(BaseEvaluator):
         if x[1] < y[0]:
             # i % j == i  if  i < j
             return x
+        if y[0] == y[1] and x[1] - x[0] < y[0] and x[0] % y[0] <= x[1] % y[0]:
+            # no wrap-around
+            return (x[0] % y[0], x[1] % y[0])
         return (0, min(x[1], y[1] - 1))
 
     # unary operators
@@ -517,7 +732,7 @@ class CodomainEvaluator(BaseEvaluator):
         return (n, n)
 
     def _visit_name(self, node):
-        return (0, self._ctxt.max - 1)
+        return self._ctxt.domain
 
 def gcd(x, y):
     while y:
@@ -674,19 +889,58 @@ class PeriodEvaluator(BaseEvaluator):
     def _visit_name(self, node):  # pylint: disable=unused-argument
         pass
 
+_preimage_leaf_size = 16
+_preimage_budget = 10000
+
 class Expression:
 
     def __init__(self, node):
         if not isinstance(node, ast.Expr):
             raise TypeError  # no coverage
         self._node = node
+        self._functions = {}
+
+    def _compile(self, bits, *, vector=False):
+        key = (bits, vector)
+        try:
+            return self._functions[key]
+        except KeyError:
+            pass
+        compiler = VectorCompiler if vector else Compiler
+        c = compiler(self._node, bits=bits)
+        fn = self._functions[key] = c()
+        return fn
 
     def __call__(self, n, *, bits=32):
         '''
         return f(n)
         '''
-        e = Evaluator(self._node, n, bits=bits)
-        return e()
+        fn = self._compile(bits)
+        return fn(n)
+
+    def evaluate_many(self, ns, *, bits=32):
+        '''
+        return (values, exc), where:
+        * values is the list of f(n) for consecutive n from ns,
+          up to (but not including) the first n for which f(n) cannot be computed;
+        * exc is the OverflowError or ZeroDivisionError raised for that n,
+          or None
+        '''
+        ns = list(ns)
+        fn = self._compile(bits, vector=True)
+        try:
+            return (fn(ns), None)
+        except (OverflowError, ZeroDivisionError):
+            pass
+        # Find out which n is to blame:
+        fn = self._compile(bits)
+        values = []
+        for n in ns:
+            try:
+                values += [fn(n)]
+            except (OverflowError, ZeroDivisionError) as exc:
+                return (values, exc)
+        raise RuntimeError('vector and scalar evaluation disagree')  # no coverage
 
     def codomain(self, *, bits=32):
         '''
@@ -697,6 +951,56 @@ class Expression:
         e = CodomainEvaluator(self._node, bits=bits)
         return e()
 
+    def preimage(self, value, *, start=0, stop=None, limit=3, bits=32):
+        '''
+        return
+        * sorted list of the first limit numbers n in range(start, stop)
+          such that f(n) = value
+        * or None, if they couldn't be found quickly enough
+        '''
+        max_ = 1 << bits
+        if stop is None or stop > max_:
+            stop = max_
+        fn = self._compile(bits)
+        period = self.period(bits=bits)
+        period_end = None
+        if period is not None:
+            # If there are no solutions within a single period (past the offset),
+            # then there are no more solutions at all.
+            (offset, period_length) = period
+            period_begin = max(start, offset)
+            period_end = period_begin + period_length
+        budget = _preimage_budget
+        result = []
+        # Search the intervals depth-first, from left to right,
+        # discarding those in which f cannot take the value:
+        stack = [(start, stop - 1)]
+        while stack and len(result) < limit:
+            (a, b) = stack.pop()
+            if period_end is not None and a >= period_end and not any(n >= period_begin for n in result):
+                break
+            if b - a < _preimage_leaf_size:
+                for n in range(a, b + 1):
+                    try:
+                        fn_n = fn(n)
+                    except (OverflowError, ZeroDivisionError):
+                        continue
+                    if fn_n == value:
+                        result += [n]
+                        if len(result) >= limit:
+                            break
+                budget -= b + 1 - a
+            else:
+                e = CodomainEvaluator(self._node, bits=bits, domain=(a, b))
+                codomain = e()
+                budget -= 1
+                if codomain is not None and codomain[0] <= value <= codomain[1]:
+                    m = (a + b) // 2
+                    stack += [(m + 1, b), (a, m)]
+            if budget < 0:
+                return
+        return result
+
     def period(self, *, bits=32):
         '''
         return
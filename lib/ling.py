@@ -27,6 +27,7 @@ import os
 import re
 import unicodedata
 
+from lib import iconv
 from lib import misc
 from lib import paths
 
@@ -171,13 +172,19 @@ class Language:
             pass
         else:
             return result
-        for character in characters:
+        for i, character in enumerate(characters):
             try:
                 character.encode(encoding)
             except UnicodeEncodeError as exc:
                 result += [character]
                 if exc.reason.startswith('iconv:'):  # pylint: disable=no-member
-                    # Avoid further calls to iconv(1):
+                    # Avoid further calls to iconv(1);
+                    # encode the remaining characters in one go:
+                    rest = characters[i + 1:]
+                    result += [
+                        ch for ch, output in zip(rest, iconv.encode_many(rest, encoding))
+                        if isinstance(output, UnicodeEncodeError)
+                    ]
                     break
         return result
 
@@ -22,9 +22,7 @@
 miscellanea
 '''
 
-import contextlib
 import datetime
-import tempfile
 
 def unsorted(iterable):
     '''
@@ -79,14 +77,4 @@ def format_range(rng, *, max):  # pylint: disable=redefined-builtin
             break
     return str.join(', ', map(str, result))
 
-@contextlib.contextmanager
-def throwaway_tempdir(context):
-    with tempfile.TemporaryDirectory(prefix=f'i18nspector.{context}.') as new_tempdir:
-        original_tempdir = tempfile.tempdir
-        try:
-            tempfile.tempdir = new_tempdir
-            yield
-        finally:
-            tempfile.tempdir = original_tempdir
-
 # vim:ts=4 sts=4 sw=4 et
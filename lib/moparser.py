@@ -27,12 +27,18 @@ MO file parser
 # * https://git.savannah.gnu.org/cgit/gettext.git/tree/gettext-tools/src/read-mo.c?id=v0.18.3
 # * https://www.gnu.org/software/gettext/manual/html_node/MO-Files.html
 
+import array
+import codecs
+import mmap
+import operator
 import re
 import struct
+import sys
 
 import polib
 
 from lib import encodings
+from lib import iconv
 
 little_endian_magic = b'\xDE\x12\x04\x95'
 big_endian_magic = little_endian_magic[::-1]
@@ -40,19 +46,312 @@ big_endian_magic = little_endian_magic[::-1]
 class SyntaxError(Exception):  # pylint: disable=redefined-builtin
     pass
 
+def _get_array_typecode(size):
+    for typecode in 'ILQ':
+        if array.array(typecode).itemsize == size:
+            return typecode
+    assert False, size  # no coverage
+
+_uint32_typecode = _get_array_typecode(4)
+_uint64_typecode = _get_array_typecode(8)
+_native_endian = '<' if sys.byteorder == 'little' else '>'
+
+_charset_re = re.compile(b'charset=([^ \t\n]+)')
+_non_ascii_re = re.compile(b'[\x80-\xFF]')
+_utf8_continuation_re = re.compile(b'[\x80-\xBF]')
+
+_decode_chunk_size = 1 << 20
+
+_segments_end = 0xFFFFFFFF
+
+# Average number of probes per lookup
+# above which the hash table is considered broken;
+# msgfmt(1) tables need less than 2.
+_max_hash_probes = 16
+
+# Maximum number of messages whose hash table lookups are checked.
+# Hashing is done in pure Python,
+# so checking every message would slow down parsing of huge files a lot.
+_max_hash_lookups = 1000
+
+def _hash_string(s):
+    # Return the hashpjw hash of the bytes, as used in MO file hash tables.
+    # https://git.savannah.gnu.org/cgit/gettext.git/tree/gettext-runtime/intl/hash-string.c?id=v0.18.3
+    # Only the low 32 bits are significant, and bits 28-31 are folded into
+    # bits 4-7 after every byte; so the value never exceeds 28 bits:
+    h = 0
+    for c in s:
+        h = (h << 4) + c
+        h = (h ^ ((h >> 24) & 0xF0)) & 0x0FFFFFFF
+    return h
+
+def _map_file(file):
+    # Return read-only memory mapping of the file,
+    # or its contents if it cannot be mapped (e.g. because it's empty).
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        return file.read()
+
+class _Strings:
+
+    # Strings of the MO file, shared by its entries.
+
+    __slots__ = (
+        'data',
+        'view',
+        'encoding',
+        'msgid_begins',
+        'msgid_ends',
+        'msgstr_begins',
+        'msgstr_ends',
+        # Strings decoded in bulk, and the encoding they were decoded with:
+        'decoded',
+        'decoded_encoding',
+    )
+
+    def __init__(self, data):
+        self.data = data
+        self.view = memoryview(data)
+        self.encoding = None
+        self.msgid_begins = None
+        self.msgid_ends = None
+        self.msgstr_begins = None
+        self.msgstr_ends = None
+        self.decoded = {}
+        self.decoded_encoding = None
+
+    def decode(self, begin, end):
+        if self.decoded and self.decoded_encoding == self.encoding:
+            output = self.decoded.get((begin, end))
+            if isinstance(output, UnicodeDecodeError):
+                raise output
+            if output is not None:
+                return output
+        return str(self.view[begin:end], self.encoding)
+
+    def decode_many(self, n):
+        # Decode strings of the first n entries in one go.
+        # This is worth doing only for the encodings implemented with iconv,
+        # which might otherwise spawn an iconv(1) process for every string.
+        spans = [span for i in range(n) for span in self.get_spans(i)]
+        encoding = codecs.lookup(self.encoding).name
+        outputs = iconv.decode_many((bytes(self.view[begin:end]) for begin, end in spans), encoding)
+        self.decoded = dict(zip(spans, outputs))
+        self.decoded_encoding = self.encoding
+
+    def get_spans(self, i):
+        # Return list of (begin, end) of the strings of entry i,
+        # split the same way as Entry splits them.
+        [(begin, end), *plural] = self.split(self.msgid_begins[i], self.msgid_ends[i], 1)
+        j = self.data.find(b'\x04', begin, end)
+        if j < 0:
+            spans = [(begin, end)]
+        else:
+            spans = [(begin, j), (j + 1, end)]
+        return spans + plural + self.split(self.msgstr_begins[i], self.msgstr_ends[i])
+
+    def split(self, begin, end, maxsplit=-1):
+        # Return list of (begin, end) of the null-separated parts of the string.
+        data = self.data
+        parts = []
+        while maxsplit != 0:
+            i = data.find(b'\0', begin, end)
+            if i < 0:
+                break
+            parts += [(begin, i)]
+            begin = i + 1
+            maxsplit -= 1
+        parts += [(begin, end)]
+        return parts
+
+class Entry:
+
+    '''
+    MO file entry
+
+    It provides the same interface as polib.MOEntry with i18nspector's patches
+    applied, except that it can't be modified.
+    The strings are decoded from the file only when they are first accessed.
+    '''
+
+    # The decoded strings are set lazily:
+    # pylint: disable=attribute-defined-outside-init
+
+    __slots__ = (
+        '_strings',
+        '_index',
+        # Decoded strings;
+        # not set until first accessed:
+        '_msgid',
+        '_msgctxt',
+        '_msgid_plural',
+        '_msgstr',
+        '_msgstr_plural',
+    )
+
+    obsolete = False
+    comment = None
+    tcomment = ''
+    occurrences = ()
+    flags = ()  # https://bitbucket.org/izi/polib/issues/47
+    previous_msgctxt = None
+    previous_msgid = None
+    previous_msgid_plural = None
+
+    def __init__(self, strings, index):
+        self._strings = strings
+        self._index = index
+
+    def _reset(self, encoding):
+        # Forget the decoded strings,
+        # so that they are decoded again using the new encoding.
+        self._strings.encoding = encoding
+        for attr in self.__slots__[2:]:
+            try:
+                delattr(self, attr)
+            except AttributeError:
+                pass
+
+    def _decode_msgids(self):
+        strings = self._strings
+        i = self._index
+        [(begin, end), *plural] = strings.split(strings.msgid_begins[i], strings.msgid_ends[i], 1)
+        # Note that the order of decoding matters
+        # if the parser has to report decoding errors.
+        j = strings.data.find(b'\x04', begin, end)
+        if j < 0:
+            msgid = strings.decode(begin, end)
+            msgctxt = None
+        else:
+            msgid = strings.decode(begin, j)
+            msgctxt = strings.decode(j + 1, end)
+        msgid_plural = None
+        if plural:
+            [plural] = plural
+            msgid_plural = strings.decode(*plural)
+        (self._msgid, self._msgctxt, self._msgid_plural) = (msgid, msgctxt, msgid_plural)
+
+    def _decode_msgstrs(self):
+        strings = self._strings
+        i = self._index
+        msgstrs = strings.split(strings.msgstr_begins[i], strings.msgstr_ends[i])
+        if self.msgid_plural is None:
+            [msgstr] = msgstrs
+            self._msgstr = strings.decode(*msgstr)
+            self._msgstr_plural = {}
+        else:
+            self._msgstr = None
+            self._msgstr_plural = {
+                n: strings.decode(*msgstr)
+                for n, msgstr in enumerate(msgstrs)
+            }
+
+    @property
+    def msgid(self):
+        try:
+            return self._msgid
+        except AttributeError:
+            self._decode_msgids()
+            return self._msgid
+
+    @property
+    def msgctxt(self):
+        try:
+            return self._msgctxt
+        except AttributeError:
+            self._decode_msgids()
+            return self._msgctxt
+
+    @property
+    def msgid_plural(self):
+        try:
+            return self._msgid_plural
+        except AttributeError:
+            self._decode_msgids()
+            return self._msgid_plural
+
+    @property
+    def msgstr(self):
+        try:
+            return self._msgstr
+        except AttributeError:
+            self._decode_msgstrs()
+            return self._msgstr
+
+    @property
+    def msgstr_plural(self):
+        try:
+            return self._msgstr_plural
+        except AttributeError:
+            self._decode_msgstrs()
+            return self._msgstr_plural
+
+    def translated(self):
+        return True
+
+    def __str__(self):
+        kwargs = dict(msgid=self.msgid, msgctxt=self.msgctxt)
+        if self.msgid_plural is None:
+            kwargs.update(msgstr=self.msgstr)
+        else:
+            kwargs.update(msgid_plural=self.msgid_plural, msgstr_plural=self.msgstr_plural)
+        return str(polib.MOEntry(**kwargs))
+
 class Parser:
 
-    def __init__(self, path, *, encoding=None, check_for_duplicates=False, klass=None):
-        self._encoding = encoding
+    def __init__(self, path, *, encoding=None, check_for_duplicates=False, klass=None, on_decode_error=None):
+        '''
+        parse the MO file;
+        raise UnicodeDecodeError if it cannot be decoded,
+        or SyntaxError if it's malformed
+
+        If on_decode_error is not None, it's called with the UnicodeDecodeError
+        instead of raising it; it should return the encoding to use instead.
+        The entries decoded so far are then decoded again,
+        without parsing the file again.
+        '''
         if check_for_duplicates:
             raise NotImplementedError
+        # The file is mapped into memory, rather than read,
+        # so that the strings can be decoded straight from the page cache,
+        # which is shared between processes.
+        # The mapping is kept as long as there are entries that use it.
         with open(path, 'rb') as file:
-            contents = file.read()
-        view = memoryview(contents)
-        view = view.cast('c')
-        if len(view) > 0:
-            assert isinstance(view[0], bytes)
-        self._view = view
+            data = _map_file(file)
+        self._setup(path, data, encoding=encoding, klass=klass, on_decode_error=on_decode_error)
+
+    @classmethod
+    def from_bytes(cls, data, *, path=None, encoding=None, klass=None, on_decode_error=None):
+        '''
+        parse the MO file contents (bytes);
+        path is used only for the fpath attribute of the file
+        '''
+        if not isinstance(data, bytes):
+            raise TypeError(f'expected bytes, not {type(data).__name__}')
+        self = cls.__new__(cls)
+        self._setup(path, data, encoding=encoding, klass=klass, on_decode_error=on_decode_error)
+        return self
+
+    @classmethod
+    def from_buffer(cls, buffer, *, path=None, encoding=None, klass=None, on_decode_error=None):
+        '''
+        parse the MO file contents (bytes-like object, such as memoryview);
+        path is used only for the fpath attribute of the file
+        '''
+        if not isinstance(buffer, bytes):
+            # The entries keep referring to the data,
+            # so it must not change under their feet:
+            buffer = bytes(buffer)
+        return cls.from_bytes(buffer, path=path, encoding=encoding, klass=klass, on_decode_error=on_decode_error)
+
+    def _setup(self, path, data, *, encoding, klass, on_decode_error):
+        self._encoding = encoding
+        self._on_decode_error = on_decode_error
+        self._data = data
+        self._strings = _Strings(data)
+        self._endian = None
+        self._last_msgid = None
         if klass is None:
             klass = polib.MOFile
         try:
@@ -61,26 +360,26 @@ class Parser:
                 check_for_duplicates=False,
             )
             self._parse()
+        except BaseException:
+            self._strings.view.release()
+            if isinstance(data, mmap.mmap):
+                data.close()
+            raise
         finally:
-            del self._view
+            del self._data
+            del self._strings
 
     def parse(self):
         return self.instance
 
     def _read_ints(self, at, n=1):
-        begin = at
         end = at + 4 * n
-        view = self._view
-        if end > len(view):
+        if end > len(self._data):
             raise SyntaxError('truncated file')
-        return struct.unpack(
-            self._endian + 'I' * n,
-            view[begin:end],
-        )
+        return struct.unpack_from(self._endian + 'I' * n, self._data, at)
 
     def _parse(self):
-        view = self._view
-        magic = view[:4].tobytes()
+        magic = self._data[:4]
         if magic == little_endian_magic:
             self._endian = '<'
         elif magic == big_endian_magic:
@@ -93,89 +392,338 @@ class Parser:
             raise SyntaxError(f'unexpected major revision number: {major_revision}')
         [n_strings] = self._read_ints(at=8)
         possible_hidden_strings = False
+        n_sysdep_strings = 0
         if minor_revision > 1:
             # “an unexpected minor revision number means that the file can be
             # read but will not reveal its full contents”
             possible_hidden_strings = True
         elif minor_revision == 1:
             [n_sysdep_strings] = self._read_ints(at=36)
-            if n_sysdep_strings > 0:
-                possible_hidden_strings = True
         self.instance.possible_hidden_strings = possible_hidden_strings
         [msgid_offset, msgstr_offset] = self._read_ints(at=12, n=2)
+        # Decode the (length, offset) tables in bulk,
+        # and validate as many strings as possible in one go:
+        strings = self._strings
+        (msgid_begins, msgid_ends) = self._read_table(msgid_offset, n_strings)
+        (msgstr_begins, msgstr_ends) = self._read_table(msgstr_offset, n_strings)
+        n_valid = min(
+            self._count_valid_strings(msgid_ends),
+            self._count_valid_strings(msgstr_ends),
+        )
+        strings.msgid_begins = msgid_begins
+        strings.msgid_ends = msgid_ends
+        strings.msgstr_begins = msgstr_begins
+        strings.msgstr_ends = msgstr_ends
         self._last_msgid = None
+        decodable = False
         for i in range(n_strings):
-            entry = self._parse_entry(i, msgid_offset + 8 * i, msgstr_offset + 8 * i)
+            if i < n_valid:
+                msgids = self._split_msgid(msgid_begins[i], msgid_ends[i])
+                msgstr_span = (msgstr_begins[i], msgstr_ends[i])
+            else:
+                # The slow path, which reports the error (if any):
+                msgid_span = self._find_string(msgid_offset + 8 * i, 'msgid')
+                msgids = self._split_msgid(*msgid_span)
+                msgstr_span = self._find_string(msgstr_offset + 8 * i, 'msgstr')
+            entry = self._parse_entry(i, msgids, *msgstr_span)
+            if i == 0:
+                self._decode_strings(n_valid)
+            if not decodable:
+                # Decode the strings now, so that decoding errors are
+                # reported in the right order:
+                if self._decode_entry(entry):
+                    # The encoding has changed.
+                    self._decode_strings(n_valid)
+                    decodable = self._check_decodable(n_valid)
+            if i == 0:
+                decodable = self._check_decodable(n_valid)
             self.instance.append(entry)
+        if n_strings == 0:
+            self._set_encoding(self._encoding)
+        if n_sysdep_strings > 0:
+            self._parse_sysdep_strings(n_sysdep_strings)
+        hash_table_error = None
+        if minor_revision <= 1:
+            hash_table_error = self._check_hash_table(n_strings, n_sysdep_strings)
+        self.instance.hash_table_error = hash_table_error
 
-    def _parse_entry(self, i, msgid_offset, msgstr_offset):
-        view = self._view
-        [length, offset] = self._read_ints(at=msgid_offset, n=2)
-        msgid = view[offset:offset+length].tobytes()
+    def _parse_sysdep_strings(self, n):
+        # Parse the system-dependent strings (minor revision 1),
+        # which are built at run time from static pieces
+        # and system-dependent segments, such as PRIu64.
+        # The segments are shown the same way as msgunfmt(1) does (<PRIu64>).
+        # Only the expanded strings are copied (into a separate buffer);
+        # they are then decoded lazily, the same way as the regular strings.
+        [n_segments, segments_offset] = self._read_ints(at=28, n=2)
+        [orig_tab_offset, trans_tab_offset] = self._read_ints(at=40, n=2)
+        segments = [
+            self._read_sysdep_segment(segments_offset + 8 * i)
+            for i in range(n_segments)
+        ]
+        msgid_begins = array.array(_uint64_typecode)
+        msgid_ends = array.array(_uint64_typecode)
+        msgstr_begins = array.array(_uint64_typecode)
+        msgstr_ends = array.array(_uint64_typecode)
+        buffer = bytearray()
+        for i in range(n):
+            [at] = self._read_ints(at=orig_tab_offset + 4 * i)
+            (begin, end) = self._expand_sysdep_string(at, segments, buffer, 'msgid')
+            msgid_begins.append(begin)
+            msgid_ends.append(end)
+            msgids = buffer[begin:end].split(b'\0', 2)
+            if len(msgids) > 2:
+                raise SyntaxError('unexpected null byte in msgid')
+            [at] = self._read_ints(at=trans_tab_offset + 4 * i)
+            (begin, end) = self._expand_sysdep_string(at, segments, buffer, 'msgstr')
+            msgstr_begins.append(begin)
+            msgstr_ends.append(end)
+            if len(msgids) == 1 and buffer.find(b'\0', begin, end) >= 0:
+                raise SyntaxError('unexpected null byte in msgstr')
+        strings = _Strings(bytes(buffer))
+        strings.encoding = self._strings.encoding
+        strings.msgid_begins = msgid_begins
+        strings.msgid_ends = msgid_ends
+        strings.msgstr_begins = msgstr_begins
+        strings.msgstr_ends = msgstr_ends
+        for i in range(n):
+            entry = Entry(strings, i)
+            # There are few such strings, so decode them right away,
+            # so that decoding errors are reported while parsing:
+            self._decode_entry(entry)
+            self.instance.append(entry)
+
+    def _decode_entry(self, entry):
+        # Decode strings of the entry;
+        # return true if the encoding had to be changed.
         try:
-            if view[offset + length] != b'\0':
-                raise SyntaxError('msgid is not null-terminated')
-        except IndexError:
+            entry.msgstr  # pylint: disable=pointless-statement
+            return False
+        except UnicodeDecodeError as exc:
+            if self._on_decode_error is None:
+                raise
+            encoding = self._on_decode_error(exc)
+            self._on_decode_error = None
+            # Switch to the new encoding in place,
+            # and forget the strings decoded so far:
+            self._set_encoding(encoding)
+            for other_entry in [*self.instance, entry]:
+                other_entry._reset(self._encoding)  # pylint: disable=protected-access
+            entry.msgstr  # pylint: disable=pointless-statement
+            return True
+
+    def _decode_strings(self, n):
+        # Decode strings of the first n entries in bulk,
+        # if it's cheaper than decoding them one by one.
+        strings = self._strings
+        if encodings.is_iconv_encoding(strings.encoding):
+            strings.decode_many(n)
+
+    def _read_sysdep_segment(self, at):
+        # Return the name of the system-dependent segment described at the offset,
+        # formatted as in msgunfmt(1) output.
+        [length, offset] = self._read_ints(at=at, n=2)
+        end = offset + length
+        if end > len(self._data):
             raise SyntaxError('truncated file')
-        msgids = msgid.split(b'\0', 2)
-        msgid = msgids[0]
-        if len(msgids) > 2:
-            raise SyntaxError('unexpected null byte in msgid')
-        [length, offset] = self._read_ints(at=msgstr_offset, n=2)
-        msgstr = view[offset:offset+length].tobytes()
+        if length == 0 or self._data[end - 1] != 0:
+            raise SyntaxError('sysdep segment is not null-terminated')
+        name = self._data[offset:self._data.find(b'\0', offset)]
+        if len(name) > 1:
+            name = b'<' + name + b'>'
+        return name
+
+    def _expand_sysdep_string(self, at, segments, buffer, what):
+        # Append the system-dependent string described at the offset to the buffer;
+        # return (begin, end) of the string in the buffer.
+        [offset] = self._read_ints(at=at)
+        at += 4
+        begin = len(buffer)
+        while True:
+            [size, segment] = self._read_ints(at=at, n=2)
+            at += 8
+            if offset + size > len(self._data):
+                raise SyntaxError('truncated file')
+            buffer += self._strings.view[offset:offset + size]
+            offset += size
+            if segment == _segments_end:
+                break
+            if segment >= len(segments):
+                raise SyntaxError('sysdep segment number out of range')
+            buffer += segments[segment]
+        end = len(buffer) - 1
+        if end < begin or buffer[end] != 0:
+            raise SyntaxError(f'{what} is not null-terminated')
+        return (begin, end)
+
+    def _read_table(self, at, n):
+        # Return (begins, ends) of the strings described in the table at the offset,
+        # or in as much of the table as the file contains.
+        n = max(0, min(n, (len(self._data) - at) // 8))
+        table = array.array(_uint32_typecode)
+        table.frombytes(self._strings.view[at:at + 8 * n])
+        if self._endian != _native_endian:
+            table.byteswap()
+        begins = table[1::2]
+        ends = array.array(_uint64_typecode, map(operator.add, begins, table[0::2]))
+        return (begins, ends)
+
+    def _count_valid_strings(self, ends):
+        # Return the number of leading strings
+        # that are within the file bounds and null-terminated.
+        data = self._data
+        size = len(data)
+        if all(map(size.__gt__, ends)):
+            terminators = bytes(map(data.__getitem__, ends))
+            if not any(terminators):
+                return len(ends)
+        for i, end in enumerate(ends):
+            if end >= size or data[end] != 0:
+                return i
+        assert False  # no coverage
+
+    def _check_decodable(self, n):
+        # Return true if strings of the first n entries can be decoded without
+        # errors; or false if they can't, or if it's not cheap to tell.
+        strings = self._strings
+        data = strings.data
+        encoding = codecs.lookup(strings.encoding).name
+        begins = strings.msgid_begins[:n] + strings.msgstr_begins[:n]
+        ends = strings.msgid_ends[:n] + strings.msgstr_ends[:n]
+        if not begins:
+            return True
+        begin = min(begins)
+        end = max(ends)
+        if encoding == 'iso8859-1':
+            return True
+        if encoding == 'ascii':
+            return _non_ascii_re.search(data, begin, end) is None
+        if encoding == 'utf-8':
+            # Every string is followed by a null byte.
+            # So if the whole region can be decoded,
+            # then so can every string that doesn't begin
+            # in the middle of a character.
+            heads = bytes(map(data.__getitem__, begins))
+            if _utf8_continuation_re.search(heads):
+                return False
+            decoder = codecs.getincrementaldecoder(encoding)()
+            try:
+                for i in range(begin, end, _decode_chunk_size):
+                    decoder.decode(strings.view[i:min(i + _decode_chunk_size, end)])
+                decoder.decode(b'', True)
+            except UnicodeDecodeError:
+                return False
+            return True
+        return False
+
+    def _get_key(self, i):
+        # Return the string that libintl looks up entry i by,
+        # i.e. msgctxt + EOT + msgid.
+        data = self._data
+        begin = self._strings.msgid_begins[i]
+        end = self._strings.msgid_ends[i]
+        j = data.find(b'\0', begin, end)
+        if j >= 0:
+            end = j
+        return data[begin:end]
+
+    def _check_hash_table(self, n_strings, n_sysdep_strings):
+        # Return description of the first problem with the hash table,
+        # or None if there are no problems (or there's no hash table).
+        # https://git.savannah.gnu.org/cgit/gettext.git/tree/gettext-runtime/intl/dcigettext.c?id=v0.18.3#n900
         try:
-            if view[offset + length] != b'\0':
-                raise SyntaxError('msgstr is not null-terminated')
-        except IndexError:
+            [size, offset] = self._read_ints(at=20, n=2)
+        except SyntaxError:
+            return 'truncated hash table'
+        if size <= 2:
+            # libintl uses binary search instead.
+            return None
+        if offset + 4 * size > len(self._data):
+            return 'truncated hash table'
+        table = array.array(_uint32_typecode)
+        table.frombytes(self._strings.view[offset:offset + 4 * size])
+        if self._endian != _native_endian:
+            table.byteswap()
+        if 0 not in table:
+            # Lookups of strings that are not in the file would never end.
+            return 'no empty slots in hash table'
+        if max(table) > n_strings + n_sysdep_strings:
+            return 'hash table refers to nonexistent message'
+        if len(set(table)) < size - table.count(0) + 1:
+            return 'hash table refers to the same message more than once'
+        # Every message must be found by the same lookup as libintl does.
+        # Only a sample of messages, spread evenly across the file, is checked.
+        # If another message with the same key is found first,
+        # it's a duplicate, which is reported elsewhere.
+        step = max(1, -(-n_strings // _max_hash_lookups))
+        sample = range(0, n_strings, step)
+        n_probes = 0
+        max_probes = _max_hash_probes * len(sample) + size
+        for i in sample:
+            key = self._get_key(i)
+            h = _hash_string(key)
+            j = h % size
+            incr = 1 + h % (size - 2)
+            while True:
+                n_probes += 1
+                if n_probes > max_probes:
+                    return 'too many collisions in hash table'
+                k = table[j]
+                if k == 0:
+                    return f'message {i + 1} cannot be found via hash table'
+                k -= 1
+                if k == i:
+                    break
+                if k < n_strings and self._get_key(k) == key:
+                    break
+                j = (j + incr) % size
+        return None
+
+    def _find_string(self, at, what):
+        # Return (begin, end) of the string described at the offset,
+        # after checking that it's null-terminated.
+        [length, offset] = self._read_ints(at=at, n=2)
+        end = offset + length
+        if end >= len(self._data):
             raise SyntaxError('truncated file')
-        msgstrs = msgstr.split(b'\0')
-        if len(msgids) == 1 and len(msgstrs) > 1:
+        if self._data[end] != 0:
+            raise SyntaxError(f'{what} is not null-terminated')
+        return (offset, end)
+
+    def _split_msgid(self, begin, end):
+        # Raw msgid is needed for sorting checks anyway,
+        # so it's copied (but msgstr is not):
+        msgids = self._data[begin:end].split(b'\0', 2)
+        if len(msgids) > 2:
+            raise SyntaxError('unexpected null byte in msgid')
+        return msgids
+
+    def _parse_entry(self, i, msgids, begin, end):
+        msgid = msgids[0]
+        if len(msgids) == 1 and self._data.find(b'\0', begin, end) >= 0:
             raise SyntaxError('unexpected null byte in msgstr')
         encoding = self._encoding
         if i == 0:
             if encoding is None and msgid == b'':
                 # https://git.savannah.gnu.org/cgit/gettext.git/tree/gettext-runtime/intl/dcigettext.c?id=v0.18.3#n1106
-                match = re.search(b'charset=([^ \t\n]+)', msgstr)
+                match = _charset_re.search(self._data, begin, end)
                 if match is not None:
                     try:
                         encoding = match.group(1).decode('ASCII')
                     except UnicodeError:
                         pass
-            if encoding is None:
-                encoding = 'ASCII'
-            elif not encodings.is_ascii_compatible_encoding(encoding):
-                encoding = 'ASCII'
-            self._encoding = encoding
-        elif msgids == self._last_msgid:
-            raise SyntaxError('duplicate message definition')
+            self._set_encoding(encoding)
         elif msgid < self._last_msgid:
             raise SyntaxError('messages are not sorted')
-        self._last_msgid = msgid  # pylint: disable=attribute-defined-outside-init
-        assert encoding is not None
-        msgid, *msgctxt = msgid.split(b'\x04', 1)
-        kwargs = dict(msgid=msgid.decode(encoding))
-        if msgctxt:
-            [msgctxt] = msgctxt
-            kwargs.update(msgctxt=msgctxt.decode(encoding))
-        if len(msgids) == 1:
-            assert [msgstr] == msgstrs
-            kwargs.update(msgstr=msgstr.decode(encoding))
-        else:
-            assert len(msgids) == 2
-            assert len(msgstrs) >= 1
-            kwargs.update(msgid_plural=msgids[1].decode(encoding))
-            kwargs.update(msgstr_plural=
-                {i: s.decode(encoding) for i, s in enumerate(msgstrs)}
-            )
-        entry = polib.MOEntry(**kwargs)
-        entry.comment = None
-        entry.occurrences = ()
-        entry.flags = ()  # https://bitbucket.org/izi/polib/issues/47
-        entry.translated = lambda: True
-        entry.previous_msgctxt = None
-        entry.previous_msgid = None
-        entry.previous_msgid_plural = None
-        return entry
+        self._last_msgid = msgid
+        return Entry(self._strings, i)
+
+    def _set_encoding(self, encoding):
+        if encoding is None:
+            encoding = 'ASCII'
+        elif not encodings.is_ascii_compatible_encoding(encoding):
+            encoding = 'ASCII'
+        self._encoding = encoding
+        self._strings.encoding = encoding
 
 __all__ = ['Parser', 'SyntaxError']
 
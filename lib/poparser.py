@@ -0,0 +1,603 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''
+PO file parser
+'''
+
+# This parser accepts exactly the same language as polib's PO parser
+# (as of polib 1.2.0) with i18nspector's patches applied,
+# and produces equivalent entries.
+# Quirks of the original are preserved on purpose,
+# because the checks (and the tags they emit) rely on them.
+
+import ast
+import codecs
+import re
+
+from lib import encodings
+
+class SyntaxError(Exception):  # pylint: disable=redefined-builtin
+
+    def __init__(self, lineno, message=None):
+        super().__init__(lineno, message)
+        self.lineno = lineno
+        self.message = message
+
+    def __str__(self):
+        s = f'line {self.lineno}'
+        if self.message is not None:
+            s += ': ' + self.message
+        return s
+
+class Entry:
+
+    '''
+    PO file entry
+
+    It provides the same interface as polib.POEntry with i18nspector's patches
+    applied, except that it can't be serialized back.
+    '''
+
+    __slots__ = (
+        'msgid',
+        'msgid_plural',
+        'msgstr',
+        'msgstr_plural',
+        'msgctxt',
+        'obsolete',
+        'flags',
+        'comment',
+        'tcomment',
+        'occurrences',
+        'previous_msgctxt',
+        'previous_msgid',
+        'previous_msgid_plural',
+        'linenum',
+    )
+
+    def __init__(self, linenum):
+        self.msgid = ''
+        self.msgid_plural = None  # distinct from empty msgid_plural
+        self.msgstr = None  # distinct from empty msgstr
+        self.msgstr_plural = {}
+        self.msgctxt = None
+        self.obsolete = False
+        self.flags = []
+        self.comment = ''
+        self.tcomment = ''
+        self.occurrences = []
+        self.previous_msgctxt = None
+        self.previous_msgid = None
+        self.previous_msgid_plural = None
+        self.linenum = linenum
+
+    def translated(self):
+        '''
+        return true if the message is translated
+        (i.e. any msgstr or msgstr[N] is non-empty),
+        not fuzzy, and not obsolete
+        '''
+        if self.obsolete:
+            return False
+        if 'fuzzy' in self.flags:
+            return False
+        return (
+            self.msgstr or
+            any(self.msgstr_plural.values())
+        )
+
+class File(list):
+
+    '''
+    PO file: list of entries, including the header entries
+    '''
+
+    def __init__(self, path, *, encoding):
+        super().__init__()
+        self.fpath = path
+        self.encoding = encoding
+        self.header = ''
+        # For compatibility with polib.POFile.
+        # The header entry is not removed from the list,
+        # so the checks can parse it themselves.
+        self.metadata = {}
+        self.metadata_is_fuzzy = 0
+
+_escapes_re = re.compile(r''' ( \\
+(?: [ntbrfva]
+  | \\
+  | "
+  | [0-9]{1,3}
+  | x[0-9a-fA-F]{1,2}
+  ))+
+''', re.VERBOSE)
+
+_short_x_escape_re = re.compile(r'''
+    \\x ([0-9a-fA-F]) (?= \\ | $ )
+''', re.VERBOSE)
+
+def unescape(s, encoding):
+    '''
+    decode C-style escape sequences;
+    non-ASCII bytes are decoded using the encoding
+    '''
+    if '\\' not in s:
+        return s
+    def unescape_match(match):
+        s = match.group()
+        s = _short_x_escape_re.sub(r'\\x0\1', s)
+        result = ast.literal_eval(f"b'{s}'")
+        try:
+            return result.decode('ASCII')  # pylint: disable=no-member
+        except UnicodeDecodeError:
+            return result.decode(encoding)  # pylint: disable=no-member
+    return _escapes_re.sub(unescape_match, s)
+
+_charset_re = re.compile(br'"?Content-Type:.+? charset=([\w_\-:\.]+)')
+
+def detect_encoding(contents):
+    '''
+    return the encoding declared in the file contents (bytes),
+    or None if no known encoding is declared
+    '''
+    pos = 0
+    while True:
+        match = _charset_re.search(contents, pos)
+        if match is None:
+            return
+        encoding = match.group(1).strip().decode('ASCII')
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            pass
+        else:
+            return encoding
+        # polib looks only at the first match in each line:
+        pos = contents.find(b'\n', match.start()) + 1
+        if pos == 0:
+            return
+
+_unescaped_quote = re.compile(r'([^\\]|^)"').search
+
+_atypical_comment_chars = frozenset(' .:,|~')
+
+def _iter_lines(lines):
+    # Yield lines of the file, skipping trailing comments,
+    # and normalizing “atypical” comments (such as "#foo") to "# foo".
+    # The lines are the same as str.split('\n') would return.
+    pending_comments = []
+    empty = True
+    lines = iter(lines)
+    next_line = next(lines, None)
+    while next_line is not None:
+        line = next_line
+        next_line = next(lines, None)
+        if line[:1] == '#':
+            if len(line) > 1:
+                if line[1] not in _atypical_comment_chars:
+                    line = '# ' + line[1:]
+            elif next_line is not None:
+                # followed by newline:
+                line = '# '
+        if line[:2] == '# ' or not line or line.isspace():
+            pending_comments += [line]
+        else:
+            yield from pending_comments
+            pending_comments = []
+            yield line
+            empty = False
+    if empty:
+        yield '# '
+
+_keywords = {
+    'msgctxt': 'ct',
+    'msgid': 'mi',
+    'msgstr': 'ms',
+    'msgid_plural': 'mp',
+}
+
+_prev_keywords = {
+    'msgid_plural': 'pp',
+    'msgid': 'pm',
+    'msgctxt': 'pc',
+}
+
+# State machine transitions, as in polib.
+# Symbols (and states):
+# * st: beginning of the file (start)
+# * he: header comment
+# * tc: translator comment
+# * gc: generated (extracted) comment
+# * oc: file/line occurrence
+# * fl: flags
+# * ct: msgctxt
+# * pc: previous msgctxt
+# * pm: previous msgid
+# * pp: previous msgid_plural
+# * mi: msgid
+# * mp: msgid_plural
+# * ms: msgstr
+# * mx: msgstr[N]
+# * mc: continuation line (doesn't change the state)
+
+def _make_transitions():
+    every_state = ['st', 'he', 'gc', 'oc', 'fl', 'ct', 'pc', 'pm', 'pp', 'tc', 'ms', 'mp', 'mx', 'mi']
+    transitions = {}
+    def add(symbol, states, next_state):
+        for state in states:
+            transitions[symbol, state] = next_state
+    add('tc', ['st', 'he'], 'he')
+    add('tc', ['gc', 'oc', 'fl', 'tc', 'pc', 'pm', 'pp', 'ms', 'mp', 'mx', 'mi'], 'tc')
+    add('gc', every_state, 'gc')
+    add('oc', every_state, 'oc')
+    add('fl', every_state, 'fl')
+    add('pc', every_state, 'pc')
+    add('pm', every_state, 'pm')
+    add('pp', every_state, 'pp')
+    add('ct', ['st', 'he', 'gc', 'oc', 'fl', 'tc', 'pc', 'pm', 'pp', 'ms', 'mx'], 'ct')
+    add('mi', ['st', 'he', 'gc', 'oc', 'fl', 'ct', 'tc', 'pc', 'pm', 'pp', 'ms', 'mx'], 'mi')
+    add('mp', ['tc', 'gc', 'pc', 'pm', 'pp', 'mi'], 'mp')
+    add('ms', ['mi', 'mp', 'tc'], 'ms')
+    add('mx', ['mi', 'mx', 'mp', 'tc'], 'mx')
+    add('mc', ['ct', 'mi', 'mp', 'ms', 'mx', 'pm', 'pp', 'pc'], 'mc')
+    return transitions
+
+_transitions = _make_transitions()
+
+# Symbols that start a new entry if the current one has msgstr:
+_new_entry_symbols = frozenset({'tc', 'gc', 'oc', 'fl', 'pp', 'pm', 'pc', 'ct', 'mi'})
+
+# Attributes updated by continuation lines:
+_continued_attrs = dict(
+    ct='msgctxt',
+    mi='msgid',
+    mp='msgid_plural',
+    ms='msgstr',
+    pp='previous_msgid_plural',
+    pm='previous_msgid',
+    pc='previous_msgctxt',
+)
+
+def _parse(lines, instance):
+    # Yield entries of the file, and update its header.
+    # pylint: disable=too-many-branches,too-many-statements
+    encoding = instance.encoding
+    entry = Entry(0)
+    state = 'st'
+    msgstr_index = 0
+    tokens = []
+    lineno = 0
+    for line in _iter_lines(lines):
+        lineno += 1
+        if lineno == 1 and line.startswith('\uFEFF'):
+            line = line[1:]
+        line = line.strip()
+        if not line:
+            continue
+        tokens = line.split(None, 2)
+        if tokens[0] == '#~|':
+            continue
+        obsolete = False
+        if tokens[0] == '#~' and len(tokens) > 1:
+            line = line[3:].strip()
+            tokens = tokens[1:]
+            obsolete = True
+        if tokens[0] in _keywords and len(tokens) > 1:
+            symbol = _keywords[tokens[0]]
+            line = line[len(tokens[0]):].lstrip()
+            if '"' in line[1:-1] and _unescaped_quote(line[1:-1]):
+                raise SyntaxError(lineno, 'unescaped double quote found')
+        elif tokens[0] == '#:':
+            if len(tokens) <= 1:
+                continue
+            symbol = 'oc'
+        elif line[:1] == '"':
+            if '"' in line[1:-1] and _unescaped_quote(line[1:-1]):
+                raise SyntaxError(lineno, 'unescaped double quote found')
+            symbol = 'mc'
+        elif line[:7] == 'msgstr[':
+            symbol = 'mx'
+        elif tokens[0] == '#,':
+            if len(tokens) <= 1:
+                continue
+            symbol = 'fl'
+        elif tokens[0] == '#' or tokens[0].startswith('##'):
+            symbol = 'tc'
+        elif tokens[0] == '#.':
+            if len(tokens) <= 1:
+                continue
+            symbol = 'gc'
+        elif tokens[0] == '#|':
+            if len(tokens) <= 1:
+                raise SyntaxError(lineno)
+            line = line[2:].lstrip()
+            if tokens[1].startswith('"'):
+                symbol = 'mc'
+            elif len(tokens) == 2:
+                raise SyntaxError(lineno, 'invalid continuation line')
+            elif tokens[1] not in _prev_keywords:
+                raise SyntaxError(lineno, f'unknown keyword {tokens[1]}')
+            else:
+                symbol = _prev_keywords[tokens[1]]
+                line = line[len(tokens[1]):].lstrip()
+        else:
+            raise SyntaxError(lineno)
+        try:
+            next_state = _transitions[symbol, state]
+        except KeyError:
+            raise SyntaxError(lineno)
+        try:
+            if symbol == 'mc':
+                s = unescape(line[1:-1], encoding)
+                if state == 'mx':
+                    entry.msgstr_plural[msgstr_index] += s
+                else:
+                    attr = _continued_attrs[state]
+                    setattr(entry, attr, getattr(entry, attr) + s)
+                # continuation lines don't change the state
+                continue
+            if next_state == 'he':
+                if instance.header != '':
+                    instance.header += '\n'
+                instance.header += line[2:]
+                state = next_state
+                continue
+            if symbol in _new_entry_symbols and state in {'ms', 'mx'}:
+                yield entry
+                entry = Entry(lineno)
+            if symbol == 'tc':
+                if entry.tcomment != '':
+                    entry.tcomment += '\n'
+                tcomment = line.lstrip('#')
+                if tcomment.startswith(' '):
+                    tcomment = tcomment[1:]
+                entry.tcomment += tcomment
+            elif symbol == 'gc':
+                if entry.comment != '':
+                    entry.comment += '\n'
+                entry.comment += line[3:]
+            elif symbol == 'oc':
+                for occurrence in line[3:].split():
+                    (path, sep, lineno_s) = occurrence.rpartition(':')
+                    if sep and lineno_s.isdigit():
+                        entry.occurrences += [(path, lineno_s)]
+                    else:
+                        entry.occurrences += [(occurrence, '')]
+            elif symbol == 'fl':
+                entry.flags += [
+                    flag.strip()
+                    for flag in line[3:].split(',')
+                ]
+            elif symbol == 'pp':
+                entry.previous_msgid_plural = unescape(line[1:-1], encoding)
+            elif symbol == 'pm':
+                entry.previous_msgid = unescape(line[1:-1], encoding)
+            elif symbol == 'pc':
+                entry.previous_msgctxt = unescape(line[1:-1], encoding)
+            elif symbol == 'ct':
+                entry.msgctxt = unescape(line[1:-1], encoding)
+            elif symbol == 'mi':
+                entry.obsolete = obsolete
+                entry.msgid = unescape(line[1:-1], encoding)
+            elif symbol == 'mp':
+                entry.msgid_plural = unescape(line[1:-1], encoding)
+            elif symbol == 'ms':
+                entry.msgstr = unescape(line[1:-1], encoding)
+            elif symbol == 'mx':
+                # Only a single digit of the index is taken into account:
+                index = int(line[7])
+                value = line[line.find('"') + 1:-1]
+                entry.msgstr_plural[index] = unescape(value, encoding)
+                msgstr_index = index
+            else:
+                assert False, symbol  # no coverage
+        except Exception:  # pylint: disable=broad-except
+            raise SyntaxError(lineno)
+        state = next_state
+    if tokens and not tokens[0].startswith('#'):
+        # The last entry is added only if the file doesn't end with a comment.
+        yield entry
+
+def _get_text_encoding(encoding):
+    # Escape sequences are decoded using the declared encoding,
+    # even if it isn't ASCII-compatible.
+    # But the file itself is then decoded as ASCII.
+    if encodings.is_ascii_compatible_encoding(encoding):
+        return encoding
+    return 'ASCII'
+
+class Parser:
+
+    def __init__(self, path, *, encoding=None, on_decode_error=None):
+        '''
+        parse the PO file;
+        raise UnicodeDecodeError if it cannot be decoded,
+        or SyntaxError if it's malformed
+
+        If on_decode_error is not None, it's called with the UnicodeDecodeError
+        instead of raising it; it should return the encoding to use instead.
+        The file is then decoded again, without reading it again.
+        '''
+        with open(path, 'rb') as file:
+            contents = file.read()
+        self._setup(path, contents, encoding=encoding, on_decode_error=on_decode_error)
+
+    @classmethod
+    def from_bytes(cls, data, *, path=None, encoding=None, on_decode_error=None):
+        '''
+        parse the PO file contents (bytes);
+        path is used only for the fpath attribute of the file
+        '''
+        if not isinstance(data, bytes):
+            raise TypeError(f'expected bytes, not {type(data).__name__}')
+        self = cls.__new__(cls)
+        self._setup(path, data, encoding=encoding, on_decode_error=on_decode_error)
+        return self
+
+    @classmethod
+    def from_buffer(cls, buffer, *, path=None, encoding=None, on_decode_error=None):
+        '''
+        parse the PO file contents (bytes-like object, such as memoryview);
+        path is used only for the fpath attribute of the file
+        '''
+        return cls.from_bytes(bytes(buffer), path=path, encoding=encoding, on_decode_error=on_decode_error)
+
+    def _setup(self, path, contents, *, encoding, on_decode_error):
+        if encoding is None:
+            encoding = detect_encoding(contents) or 'ASCII'
+        try:
+            contents = contents.decode(_get_text_encoding(encoding))
+        except UnicodeDecodeError as exc:
+            if on_decode_error is None:
+                raise
+            encoding = on_decode_error(exc)
+            contents = contents.decode(_get_text_encoding(encoding))
+        self.instance = File(path, encoding=encoding)
+        self.instance += _parse(contents.split('\n'), self.instance)
+
+    def parse(self):
+        return self.instance
+
+def _detect_file_encoding(file):
+    # The same as detect_encoding(file.read()),
+    # but without reading the whole file into memory.
+    for line in file:
+        match = _charset_re.search(line)
+        if match is None:
+            continue
+        encoding = match.group(1).strip().decode('ASCII')
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            pass
+        else:
+            return encoding
+
+class _LineDecoder:
+
+    # Incremental decoder for ASCII-compatible encodings
+    # that don't provide one (such as those implemented with iconv):
+    # only complete lines are decoded.
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.buffer = b''
+
+    def decode(self, input, final=False):  # pylint: disable=redefined-builtin
+        data = self.buffer + input
+        if final:
+            n = len(data)
+        else:
+            n = data.rfind(b'\n') + 1
+        try:
+            s = data[:n].decode(self.encoding)
+        except UnicodeDecodeError as exc:
+            # As for the standard incremental decoders,
+            # the exception object is the buffered data followed by the input:
+            raise UnicodeDecodeError(exc.encoding, data, exc.start, exc.end, exc.reason) from None
+        self.buffer = data[n:]
+        return s
+
+_read_size = 1 << 20
+
+def _read_lines(file, encoding):
+    # Yield lines of the binary file, decoded using the encoding;
+    # the same lines as file.read().decode(encoding).split('\n') would return.
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)()
+    except NotImplementedError:
+        decoder = _LineDecoder(encoding)
+    offset = 0
+    pending = ''
+    while True:
+        chunk = file.read(_read_size)
+        try:
+            s = decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as exc:
+            # The exception object holds the data that was buffered by the
+            # decoder, followed by the current chunk.
+            start = offset + len(chunk) - len(exc.object) + exc.start
+            raise _relocate_decode_error(exc, file, start) from None
+        offset += len(chunk)
+        lines = (pending + s).split('\n')
+        pending = lines.pop()
+        yield from lines
+        if not chunk:
+            break
+    yield pending
+
+def _relocate_decode_error(exc, file, start):
+    # Return a copy of the UnicodeDecodeError,
+    # with the object being a fragment of the file around the offending bytes,
+    # rather than a fragment of the chunk being decoded.
+    margin = 1024
+    begin = max(start - margin, 0)
+    file.seek(begin)
+    data = file.read(start - begin + margin)
+    start -= begin
+    end = start + (exc.end - exc.start)
+    return UnicodeDecodeError(exc.encoding, data, start, end, exc.reason)
+
+class StreamedFile:
+
+    '''
+    PO file whose entries are parsed anew
+    each time the file is iterated over,
+    so that they don't have to be kept in memory all at once
+
+    Iterating over it raises the same exceptions as Parser would.
+    '''
+
+    def __init__(self, path, *, encoding=None):
+        if encoding is None:
+            with open(path, 'rb') as file:
+                encoding = _detect_file_encoding(file) or 'ASCII'
+        self.fpath = path
+        self.encoding = encoding
+        self.header = ''
+        # For compatibility with File:
+        self.metadata = {}
+        self.metadata_is_fuzzy = 0
+
+    def __iter__(self):
+        self.header = ''
+        with open(self.fpath, 'rb') as file:
+            lines = _read_lines(file, _get_text_encoding(self.encoding))
+            try:
+                yield from _parse(lines, self)
+            except SyntaxError:
+                # Parser decodes the whole file before parsing it,
+                # so decoding errors take precedence over syntax errors:
+                for _ in lines:
+                    pass
+                raise
+
+__all__ = [
+    'Entry',
+    'File',
+    'Parser',
+    'StreamedFile',
+    'SyntaxError',
+    'detect_encoding',
+    'unescape',
+]
+
+# vim:ts=4 sts=4 sw=4 et
@@ -1,4 +1,4 @@
-# Copyright © 2013-2021 Jakub Wilk <jwilk@jwilk.net>
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
 #
 # Permission is hereby granted, free of charge, to any person obtaining a copy
 # of this software and associated documentation files (the “Software”), to deal
@@ -18,51 +18,40 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import polib
-
-import lib.polib4us as M
-
-from .tools import (
-    assert_list_equal,
-    assert_true,
-)
-
-from . import tools
-
-minimal_header = r'''
-msgid ""
-msgstr "Content-Type: text/plain; charset=US-ASCII\n"
-'''
-
-class test_codecs:
-
-    @tools.fork_isolation
-    def test_trailing_obsolete_message(self):
-        s = minimal_header + '''
-msgid "a"
-msgstr "b"
-
-#~ msgid "b"
-#~ msgstr "c"
-'''
-        def t():
-            with tools.temporary_file(mode='wt', encoding='ASCII') as file:
-                file.write(s)
-                file.flush()
-                po = polib.pofile(file.name)
-                assert_true(po[-1].obsolete)
-        t()
-        M.install_patches()
-        t()
-
-@tools.fork_isolation
-def test_flag_splitting():
-    M.install_patches()
-    e = polib.POEntry()
-    e.flags = ['fuzzy,c-format']
-    assert_list_equal(
-        e.flags,
-        ['fuzzy', 'c-format']
-    )
+import encodings
+import importlib
+import os
+import pkgutil
+import sys
+
+import afl
+
+sys.path[0] += '/../../..'
+
+import lib.poparser as M
+
+def test(data):
+    try:
+        parser = M.Parser.from_bytes(data)
+    except M.SyntaxError:
+        return
+    except UnicodeDecodeError:
+        return
+    for entry in parser.parse():
+        entry.translated()
+
+def main():
+    for _, modname, _ in pkgutil.iter_modules(encodings.__path__, prefix='encodings.'):
+        try:
+            importlib.import_module(modname)
+        except (LookupError, ImportError):
+            pass
+    while afl.loop(max=1000):
+        data = sys.stdin.buffer.read()  # pylint: disable=no-member
+        test(data)
+    os._exit(0)  # pylint: disable=protected-access
+
+if __name__ == '__main__':
+    main()
 
 # vim:ts=4 sts=4 sw=4 et
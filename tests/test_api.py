@@ -0,0 +1,148 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import unittest.mock
+
+import lib.api as M
+import lib.check
+import lib.tags
+
+from .tools import (
+    assert_equal,
+    assert_raises,
+)
+
+from . import tools
+
+po_data = b'''\
+msgid ""
+msgstr ""
+"Project-Id-Version: Gizmo Enhancer 1.0\\n"
+"Report-Msgid-Bugs-To: gizmoenhancer@jwilk.net\\n"
+"POT-Creation-Date: 2012-11-01 14:42+0100\\n"
+"PO-Revision-Date: 2012-11-01 14:42+0100\\n"
+"Last-Translator: Jakub Wilk <jwilk@jwilk.net>\\n"
+"Language-Team: Latin <la@li.org>\\n"
+"Language: la\\n"
+"MIME-Version: 1.0\\n"
+"Content-Type: text/plain; charset=UTF-8\\n"
+"Content-Transfer-Encoding: 8bit\\n"
+
+msgid "A quick brown fox jumps over the lazy dog."
+msgstr "Sic fugiens, dux, zelotypos, quam Karus haberis."
+'''
+
+@tools.fork_isolation
+def test_check_bytes():
+    results = M.check_bytes(po_data, 'po', name='la.po')
+    assert_equal(results, [])
+    data = po_data.replace(b'"Language: la\\n"\n', b'')
+    [result] = M.check_bytes(data, 'po', name='la.po')
+    assert_equal(result.path, 'la.po')
+    assert_equal(result.tag, 'no-language-header-field')
+    assert_equal(result.severity, lib.tags.severities.pedantic)
+    assert_equal(result.certainty, lib.tags.certainties.certain)
+    assert_equal(result.args, ('Language:', 'la'))
+    assert_equal(str(result), 'P: la.po: no-language-header-field Language: la')
+
+@tools.fork_isolation
+def test_check_bytes_language():
+    [result] = M.check_bytes(po_data, 'po', name='po/de.po')
+    assert_equal(result.path, 'po/de.po')
+    assert_equal(result.tag, 'language-disparity')
+    assert_equal(result.args, ('de', '(pathname)', '!=', 'la', '(Language header field)'))
+    [result] = M.check_bytes(po_data, 'po', language='de')
+    assert_equal(result.path, 'messages.po')
+    assert_equal(result.args, ('de', '(command-line)', '!=', 'la', '(Language header field)'))
+
+def test_check_bytes_bad_name():
+    with assert_raises(ValueError):
+        M.check_bytes(po_data, 'po', name='/la.po')
+    with assert_raises(ValueError):
+        M.check_bytes(po_data, 'po', name='../la.po')
+
+def test_check_bytes_bad_file_type():
+    with assert_raises(ValueError):
+        M.check_bytes(po_data, 'txt')
+
+@tools.fork_isolation
+def test_check_bytes_plural_forms_cache():
+    data = po_data.replace(
+        b'"Content-Transfer-Encoding: 8bit\\n"\n',
+        b'"Content-Transfer-Encoding: 8bit\\n"\n"Plural-Forms: nplurals=2; plural=n != 1;\\n"\n'
+    )
+    assert_equal(M.check_bytes(data, 'po', name='la.po'), [])
+    cache_info = lib.check.analyze_plural_forms.cache_info()
+    assert_equal(M.check_bytes(data, 'po', name='la.po'), [])
+    new_cache_info = lib.check.analyze_plural_forms.cache_info()
+    assert_equal(new_cache_info.misses, cache_info.misses)
+    assert_equal(new_cache_info.hits, cache_info.hits + 1)
+
+@tools.fork_isolation
+def test_check_path():
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'la.po')
+        with open(path, 'wb') as file:
+            file.write(po_data)
+        assert_equal(M.check_path(path), [])
+        path = os.path.join(tmpdir, 'nonexistent.po')
+        [result] = M.check_path(path)
+        assert_equal(result.tag, 'os-error')
+
+@tools.fork_isolation
+def test_check_path_parallel():
+    messages = [
+        b'#, c-format, c-format\nmsgid "%d eggs"\nmsgstr "%s jaj"\n',
+        b'msgid "ham"\nmsgstr "szynka\x07"\n',
+        b'msgid "ham"\nmsgstr "szynka\x07\x01"\n',
+        b'#| msgid "spam"\nmsgid "spam\\n"\nmsgstr "mielonka"\n',
+    ]
+    data = po_data + b'\n' + b'\n'.join(messages * 5)
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'la.po')
+        with open(path, 'wb') as file:
+            file.write(data)
+        results = M.check_path(path)
+        assert_equal(len(results), 25)
+        with unittest.mock.patch('lib.check.parallel_chunk_size', 3):
+            parallel_results = M.check_path(path, jobs=2)
+        assert_equal(parallel_results, results)
+
+@tools.fork_isolation
+def test_check_path_stream():
+    messages = [
+        b'msgid "ham"\nmsgstr "szynka\x07"\n',
+        b'msgid ""\nmsgstr ""\n',
+        b'#~ msgid "ham"\n#~ msgstr "szynka"\n',
+    ]
+    data = po_data + b'\n' + b'\n'.join(messages * 2)
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'la.po')
+        with open(path, 'wb') as file:
+            file.write(data)
+        results = M.check_path(path)
+        assert_equal(
+            sorted(result.tag for result in results),
+            ['duplicate-header-entry', 'duplicate-message-definition', 'unusual-character-in-translation'],
+        )
+        assert_equal(M.check_path(path, stream=True), results)
+
+# vim:ts=4 sts=4 sw=4 et
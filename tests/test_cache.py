@@ -0,0 +1,140 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+
+import lib.cache as M
+import lib.tags
+
+from .tools import (
+    assert_equal,
+    assert_is_instance,
+    assert_is_none,
+)
+
+from . import tools
+
+def test_results_roundtrip():
+    results = [
+        ('spam', ()),
+        ('eggs', (lib.tags.safestr('ham'), b'\xBA\xCE\x00n', 'ham', 42)),
+    ]
+    s = M.encode_results(results)
+    [spam, eggs] = M.decode_results(s)
+    assert_equal(spam, ('spam', ()))
+    assert_equal(eggs, ('eggs', ('ham', b'\xBA\xCE\x00n', 'ham', '42')))
+    assert_is_instance(eggs[1][0], lib.tags.safestr)
+    assert_equal(type(eggs[1][2]), str)
+
+class test_cache:
+
+    def test_miss(self):
+        with tools.temporary_directory() as tmpdir:
+            cache = M.Cache(tmpdir)
+            assert_is_none(cache.get('0' * 64))
+
+    def test_hit(self):
+        with tools.temporary_directory() as tmpdir:
+            cache = M.Cache(tmpdir)
+            results = [('spam', ('eggs',))]
+            cache.put('0' * 64, results)
+            assert_equal(cache.get('0' * 64), results)
+
+    def test_corrupted(self):
+        with tools.temporary_directory() as tmpdir:
+            cache = M.Cache(tmpdir)
+            key = '0' * 64
+            cache.put(key, [])
+            path = os.path.join(tmpdir, key[:2], key)
+            with open(path, 'wt', encoding='ASCII') as file:
+                file.write('[[')
+            cache = M.Cache(tmpdir)
+            assert_is_none(cache.get(key))
+
+    def test_prune(self):
+        with tools.temporary_directory() as tmpdir:
+            results = [('spam', ('eggs',))]
+            size = len(M.encode_results(results))
+            cache = M.Cache(tmpdir, max_size=(2 * size))
+            keys = [str(i) * 64 for i in range(3)]
+            for i, key in enumerate(keys):
+                cache.put(key, results)
+                path = os.path.join(tmpdir, key[:2], key)
+                os.utime(path, (i, i))
+            cache = M.Cache(tmpdir, max_size=(2 * size))
+            assert_equal(cache.get(keys[0]), results)  # mark as recently used
+            cache.prune()
+            cache = M.Cache(tmpdir)
+            assert_equal(cache.get(keys[0]), results)
+            assert_is_none(cache.get(keys[1]))
+            assert_equal(cache.get(keys[2]), results)
+
+    def test_prune_interval(self):
+        with tools.temporary_directory() as tmpdir:
+            results = [('spam', ('eggs',))]
+            size = len(M.encode_results(results))
+            cache = M.Cache(tmpdir, max_size=size)
+            keys = [str(i) * 64 for i in range(3)]
+            cache.put(keys[0], results)
+            cache.prune()
+            cache.put(keys[1], results)
+            cache.prune()
+            cache = M.Cache(tmpdir)
+            assert_equal(cache.get(keys[0]), results)
+            assert_equal(cache.get(keys[1]), results)
+            os.utime(os.path.join(tmpdir, keys[0][:2], keys[0]), (0, 0))
+            cache = M.Cache(tmpdir, max_size=size)
+            cache.prune_interval = 0
+            cache.prune()
+            cache = M.Cache(tmpdir)
+            assert_is_none(cache.get(keys[0]))
+            assert_equal(cache.get(keys[1]), results)
+
+    def test_memory_only(self):
+        cache = M.Cache(None)
+        key = '0' * 64
+        assert_is_none(cache.get(key))
+        results = [('spam', ('eggs',))]
+        cache.put(key, results)
+        assert_equal(cache.get(key), results)
+        cache.prune()
+
+    def test_memory_eviction(self):
+        cache = M.Cache(None, max_memory_entries=2)
+        results = [('spam', ('eggs',))]
+        keys = [str(i) * 64 for i in range(3)]
+        cache.put(keys[0], results)
+        cache.put(keys[1], results)
+        assert_equal(cache.get(keys[0]), results)  # mark as recently used
+        cache.put(keys[2], results)
+        assert_equal(cache.get(keys[0]), results)
+        assert_is_none(cache.get(keys[1]))
+        assert_equal(cache.get(keys[2]), results)
+
+def test_hash_file():
+    with tools.temporary_file() as file:
+        file.write(b'spam')
+        file.flush()
+        assert_equal(
+            M.hash_file(file.name),
+            '4e388ab32b10dc8dbc7e28144f552830adc74787c1e2c0824032078a79f227fb'
+        )
+
+# vim:ts=4 sts=4 sw=4 et
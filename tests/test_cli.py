@@ -0,0 +1,145 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import argparse
+import concurrent.futures
+import os
+import unittest.mock
+
+import lib.cache
+import lib.cli as M
+
+from .tools import (
+    assert_equal,
+    assert_is_none,
+    assert_is_not_none,
+    assert_less_equal,
+)
+
+from . import tools
+
+def get_options(**kwargs):
+    options = argparse.Namespace(
+        language=None,
+        unpack_deb=False,
+        jobs=1,
+        ordered=False,
+        stream=False,
+        traceback=False,
+        file_type=None,
+        ignore_tags=set(),
+        fake_root=None,
+        cache=lib.cache.Cache(None),
+    )
+    return M.copy_options(options, **kwargs)
+
+po_data = b'msgid ""\nmsgstr "Content-Type: text/plain; charset=UTF-8\\n"\n'
+
+class test_parallel:
+
+    @tools.fork_isolation
+    def test_no_cache_dedup(self):
+        # -j2 --no-cache
+        M.Checker.patch_environment()
+        options = get_options()
+        with tools.temporary_directory() as tmpdir:
+            paths = [os.path.join(tmpdir, name) for name in ['eggs.po', 'ham.po']]
+            for path in paths:
+                with open(path, 'wb') as file:
+                    file.write(po_data)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                outputs = list(M.check_files_in_executor(executor, paths, options=options, window=8))
+        # identical files are checked only once:
+        outputs.sort(key=lambda output: output[1] is None)
+        [(i, s, results), (j, replay_s, replay_results)] = outputs
+        assert_equal({i, j}, {0, 1})
+        assert_is_not_none(s)
+        assert_is_none(replay_s)
+        assert_equal(replay_results, results)
+
+    @tools.fork_isolation
+    def test_ordered_window(self):
+        # A slow file at the head must not let the other files run far ahead.
+        M.Checker.patch_environment()
+        options = get_options()
+        window = 3
+        with tools.temporary_directory() as tmpdir:
+            paths = []
+            for i in range(12):
+                path = os.path.join(tmpdir, f'{i}.po')
+                data = po_data + b'\n#. %d\nmsgid "eggs"\nmsgstr "jajka"\n' % i
+                if i == 0:
+                    data += b''.join(b'\nmsgid "%d"\nmsgstr "%d"\n' % (j, j) for j in range(5000))
+                with open(path, 'wb') as file:
+                    file.write(data)
+                paths += [path]
+            submitted = []
+            with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+                def submit(fn, path, *args):
+                    if fn.func is M.get_cache_key:
+                        submitted.append(path)
+                    return executor.submit(fn, path, *args)
+                proxy = argparse.Namespace(submit=submit)
+                outputs = M.check_files_in_executor(proxy, paths, options=options, window=window, ordered=True)
+                head = 0
+                received = set()
+                for (i, s, results) in outputs:
+                    del s, results
+                    assert_less_equal(len(submitted), head + window)
+                    received.add(i)
+                    while head in received:
+                        head += 1
+        assert_equal(head, len(paths))
+        assert_equal(submitted, paths)
+
+class test_scheduling:
+
+    def t(self, *, ordered):
+        with tools.temporary_directory() as tmpdir:
+            paths = []
+            for name, size in [('eggs', 10), ('ham', 30), ('spam', 0), ('bacon', 20)]:
+                path = os.path.join(tmpdir, name + '.po')
+                with open(path, 'wb') as file:
+                    file.write(b'#' * size)
+                paths += [path]
+            paths += [os.path.join(tmpdir, 'nonexistent.po')]
+            scheduled = []
+            def check_files_in_executor(executor, paths, **kwargs):
+                del executor, kwargs
+                scheduled.extend(paths)
+                return iter([])
+            options = get_options(jobs=2, ordered=ordered)
+            with unittest.mock.patch.object(M, 'check_files_in_executor', check_files_in_executor):
+                M.check_all_in_parallel(paths, options=options)
+        return [os.path.basename(path) for path in scheduled]
+
+    def test_largest_first(self):
+        assert_equal(
+            self.t(ordered=False),
+            ['ham.po', 'bacon.po', 'eggs.po', 'spam.po', 'nonexistent.po']
+        )
+
+    def test_ordered(self):
+        assert_equal(
+            self.t(ordered=True),
+            ['eggs.po', 'ham.po', 'spam.po', 'bacon.po', 'nonexistent.po']
+        )
+
+# vim:ts=4 sts=4 sw=4 et
@@ -0,0 +1,133 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import io
+import os
+import socket
+import stat
+import sys
+import threading
+import unittest.mock
+
+import lib.daemon as M
+
+from .tools import (
+    assert_equal,
+    assert_is_none,
+)
+
+from . import tools
+
+def handler():
+    print(sys.argv[1:], os.getcwd(), os.environ.get('I18NSPECTOR_TEST'))
+    print('eggs', file=sys.stderr)
+    sys.exit(int(sys.argv[1]))
+
+def test_not_running():
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'socket')
+        assert_is_none(M.run_client(path))
+
+@tools.fork_isolation
+def test_request():
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'socket')
+        server = M.Server(path, handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            with tools.temporary_file(mode='w+t') as stdout, tools.temporary_file(mode='w+t') as stderr:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.dup2(stdout.fileno(), 1)
+                os.dup2(stderr.fileno(), 2)
+                os.chdir(tmpdir)
+                environ = dict(os.environ, I18NSPECTOR_TEST='ham')
+                with unittest.mock.patch.dict(os.environ, environ):
+                    with unittest.mock.patch.object(sys, 'argv', ['i18nspector', '42']):
+                        status = M.run_client(path)
+                assert_equal(status, 42)
+                stdout.seek(0)
+                assert_equal(stdout.read(), f"['42'] {os.getcwd()} ham\n")
+                stderr.seek(0)
+                assert_equal(stderr.read(), 'eggs\n')
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+@tools.fork_isolation
+def test_socket_mode():
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'socket')
+        server = M.Server(path, handler)
+        with server:
+            assert_equal(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+@tools.fork_isolation
+def test_foreign_user():
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'socket')
+        server = M.Server(path, handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            stderr = io.StringIO()
+            uid = os.getuid()
+            with unittest.mock.patch.object(os, 'getuid', lambda: uid + 1):
+                with unittest.mock.patch.object(sys, 'argv', ['i18nspector', '42']):
+                    with unittest.mock.patch.object(sys, 'stderr', stderr):
+                        status = M.run_client(path)
+            assert_equal(status, 1)
+            assert_equal(stderr.getvalue(), 'i18nspector: error: connection to the daemon was lost\n')
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+@tools.fork_isolation
+def test_early_reply():
+    # The daemon may reply and hang up before the whole request is sent.
+    with tools.temporary_directory() as tmpdir:
+        path = os.path.join(tmpdir, 'socket')
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        hung_up = threading.Event()
+        def serve():
+            (sock, _) = listener.accept()
+            with sock:
+                sock.sendall(b'{"status": 37}\n')
+            hung_up.set()
+        with listener:
+            listener.bind(path)
+            listener.listen()
+            thread = threading.Thread(target=serve)
+            thread.start()
+            try:
+                cwd = os.getcwd()
+                def getcwd():
+                    hung_up.wait()
+                    return cwd
+                with unittest.mock.patch.object(os, 'getcwd', getcwd):
+                    status = M.run_client(path)
+            finally:
+                thread.join()
+        assert_equal(status, 37)
+
+# vim:ts=4 sts=4 sw=4 et
@@ -18,7 +18,9 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import codecs
 import curses.ascii
+import io
 import sys
 import unittest
 
@@ -208,6 +210,14 @@ class test_extra_encoding:
         with assert_raises(LookupError):
             enc()
 
+    @tools.fork_isolation
+    def test_iconv(self):
+        assert_false(E.is_iconv_encoding('EUC-TW'))
+        E.install_extra_encodings()
+        assert_true(E.is_iconv_encoding('EUC-TW'))
+        assert_false(E.is_iconv_encoding('VISCII'))
+        assert_false(E.is_iconv_encoding('UTF-8'))
+
     _viscii_unicode = 'Ti\u1EBFng Vi\u1EC7t'
     _viscii_bytes = b'Ti\xAAng Vi\xAEt'
 
@@ -270,4 +280,46 @@ class test_extra_encoding:
         with assert_raises(UnicodeDecodeError):
             b.decode('EUC-TW')
 
+    @tools.fork_isolation
+    def test_8b_incremental(self):
+        E.install_extra_encodings()
+        b = self._viscii_bytes
+        decoder = codecs.getincrementaldecoder('VISCII')()
+        u = ''.join(decoder.decode(b[i:i + 1]) for i in range(len(b)))
+        assert_equal(u, self._viscii_unicode)
+        encoder = codecs.getincrementalencoder('VISCII')()
+        assert_equal(encoder.encode(u, final=True), b)
+
+    @tools.fork_isolation
+    def test_8b_stream(self):
+        E.install_extra_encodings()
+        file = io.BytesIO()
+        writer = codecs.getwriter('VISCII')(file)
+        writer.write(self._viscii_unicode)
+        assert_equal(file.getvalue(), self._viscii_bytes)
+        file.seek(0)
+        reader = codecs.getreader('VISCII')(file)
+        assert_equal(reader.read(), self._viscii_unicode)
+
+    @tools.fork_isolation
+    def test_mb_incremental(self):
+        E.install_extra_encodings()
+        b = self._euc_tw_bytes
+        decoder = codecs.getincrementaldecoder('EUC-TW')()
+        u = ''.join(decoder.decode(b[i:i + 1]) for i in range(len(b)))
+        u += decoder.decode(b'', final=True)
+        assert_equal(u, self._euc_tw_unicode)
+        encoder = codecs.getincrementalencoder('EUC-TW')()
+        assert_equal(encoder.encode(u, final=True), b)
+
+    @tools.fork_isolation
+    def test_mb_incremental_error(self):
+        E.install_extra_encodings()
+        b = self._euc_tw_bytes
+        decoder = codecs.getincrementaldecoder('EUC-TW')()
+        assert_equal(decoder.decode(b[:-1]), self._euc_tw_unicode[:-1])
+        with assert_raises(UnicodeDecodeError) as cm:
+            decoder.decode(b'', final=True)
+        assert_equal(cm.exception.object, b[-2:-1])
+
 # vim:ts=4 sts=4 sw=4 et
@@ -19,6 +19,7 @@
 # SOFTWARE.
 
 import datetime
+import unittest.mock
 
 import lib.gettext as M
 
@@ -126,6 +127,13 @@ class test_plural_exp:
             self.t('n + 42', m - 41, False)
             self.t('n + 42', m - 23, False)
 
+    def test_bits(self):
+        f = M.parse_plural_expression('n + 1')
+        assert_equal(f(254, bits=8), 255)
+        with assert_raises(OverflowError):
+            f(255, bits=8)
+        assert_equal(f(255), 256)
+
     def test_sub(self):
         self.t('n - 23', 37, 14)
 
@@ -226,6 +234,19 @@ class test_plural_exp:
 
     def test_nested_conditional(self):
         self.t('(2 ? 3 : 7) ? 23 : 37')
+        s = 'n == 1 ? 0 : n == 2 ? 1 : n ? 2 : 3'
+        self.t(s, 0, 3)
+        self.t(s, 1, 0)
+        self.t(s, 2, 1)
+        self.t(s, 3, 2)
+        self.t('n ? n - 1 ? 5 : 6 : 7', 2, 5)
+
+    def test_associativity(self):
+        self.t('n - 6 - 3', 12, 3)
+        self.t('n / 3 / 2', 12, 2)
+        self.t('n % 7 % 4', 13, 2)
+        self.t('n - 6 * 2 + 3', 12, 3)
+        self.t('n || 0 && 0', 1, 1)
 
     def test_badly_nested_conditional(self):
         with assert_raises(self.error):
@@ -338,6 +359,15 @@ class test_codomain:
     def test_mod_0(self):
         self.t('n % 0', None)
 
+    def test_mod_no_wraparound(self):
+        self.t('22 % 10', 2)
+        self.t('(20 + n%5) % 10', 0, 4)
+        self.t('(25 + n%5) % 10', 5, 9)
+
+    def test_mod_wraparound(self):
+        self.t('(25 + n%10) % 10', 0, 9)
+        self.t('(8 + n%5) % 10', 0, 9)
+
     def test_add(self):
         self.t(
             '(6 + n%37) + (7 + n%23)',
@@ -523,6 +553,78 @@ class test_codomain:
             6, 37 + 7 - 1
         )
 
+class test_evaluate_many:
+
+    def t(self, s, ns, values, exc=None):
+        f = M.parse_plural_expression(s)
+        (fvalues, fexc) = f.evaluate_many(ns)
+        assert_equal(fvalues, values)
+        if exc is None:
+            assert_is_none(fexc)
+        else:
+            assert_is_instance(fexc, exc)
+        assert_equal(fvalues, [f(n) for n in ns[:len(values)]])
+
+    def test_ok(self):
+        s = 'n % 10 == 1 && n % 100 != 11 ? 0 : n != 0 ? 1 : 2'
+        self.t(s, range(12), [2, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+        self.t(s, [], [])
+
+    def test_overflow(self):
+        self.t('n - 3', [5, 4, 2, 3], [2, 1], OverflowError)
+        m = (1 << 32) - 1
+        self.t('n * 2', [0, m], [0], OverflowError)
+        self.t(str(m + 1), [0], [], OverflowError)
+        self.t(str(m + 1), [], [])
+
+    def test_div_by_0(self):
+        self.t('42 / (n - 3)', [6, 5, 3, 0], [14, 21], ZeroDivisionError)
+
+    def test_first_error(self):
+        # The errors are reported in the order of n,
+        # even if they are detected in a different order:
+        self.t('6 / (n - 1) + (n - 2)', [3, 1, 0], [4], ZeroDivisionError)
+
+    def test_short_circuit(self):
+        self.t('n && (6 / n)', [0, 1, 2, 0], [0, 1, 1, 0])
+        self.t('!n || (6 / n)', [0, 1, 7, 0], [1, 1, 0, 1])
+        self.t('n ? 6 / n : 7', [0, 1, 2], [7, 6, 3])
+
+class test_preimage:
+
+    def t(self, s, i, expected, **kwargs):
+        f = M.parse_plural_expression(s)
+        assert_equal(f.preimage(i, **kwargs), expected)
+
+    pl = 'n==1 ? 0 : n%10>=2 && n%10<=4 && (n%100<10 || n%100>=20) ? 1 : 2'
+
+    def test_pl(self):
+        self.t(self.pl, 0, [1])
+        self.t(self.pl, 1, [2, 3, 4])
+        self.t(self.pl, 2, [0, 5, 6])
+        self.t(self.pl, 3, [])
+
+    def test_range(self):
+        self.t(self.pl, 1, [22, 23, 24], start=12)
+        self.t(self.pl, 1, [1002, 1003, 1004], start=1000, stop=1005, limit=5)
+        self.t(self.pl, 2, [1000, 1001, 1005, 1006], start=1000, stop=1007, limit=5)
+
+    def test_sparse(self):
+        s = '(n == 0 || n == 1) ? 0 : n != 0 && n % 1000000 == 0 ? 1 : 2'
+        self.t(s, 0, [0, 1])
+        self.t(s, 1, [1000000, 2000000, 3000000])
+        m = 1 << 32
+        self.t(s, 1, [4293000000, 4294000000], start=m - 2000000)
+
+    def test_errors(self):
+        self.t('6 / (n - 3)', 0, [10, 11, 12], start=4)
+        self.t('6 / (n % 3)', 6, [1, 4, 7])
+        self.t('n / 0', 0, [])
+
+    def test_budget(self):
+        with unittest.mock.patch.object(M.intexpr, '_preimage_budget', 0):
+            self.t(self.pl, 0, None)
+
 class test_period:
 
     def t(self, s, offset, period=None):
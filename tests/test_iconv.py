@@ -18,10 +18,13 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import unittest.mock
+
 import lib.iconv as M
 
 from .tools import (
     assert_equal,
+    assert_is_instance,
     assert_raises,
 )
 
@@ -48,6 +51,124 @@ class test_tcvn(_test):
     b = b'Do b\xB9ch kim r\xCAt qu\xFD, s\xCF \xAE\xD3 l\xBEp v\xAB x\xAD\xACng'
     e = 'TCVN-5712'
 
+class test_stateful:
+
+    # The conversion state must be reset between calls,
+    # even after errors.
+
+    u = '亀 and 亀'
+    b = b'\x1B$B55\x1B(B and \x1B$B55\x1B(B'
+    e = 'ISO-2022-JP'
+
+    def test_encode(self):
+        assert_equal(M.encode(self.u, self.e), self.b)
+        with assert_raises(UnicodeEncodeError):
+            M.encode('亀 and Żółw', self.e)
+        assert_equal(M.encode(self.u, self.e), self.b)
+
+    def test_decode(self):
+        assert_equal(M.decode(self.b, self.e), self.u)
+        with assert_raises(UnicodeDecodeError):
+            M.decode(self.b[:-4] + b'\x80', self.e)
+        assert_equal(M.decode(self.b, self.e), self.u)
+
+class test_incremental:
+
+    u = '亀 and 亀 and 亀'
+    e = 'ISO-2022-JP'
+
+    def test_decode(self):
+        b = self.u.encode(self.e)
+        decoder = M.IncrementalDecoder(encoding=self.e)
+        u = ''.join(decoder.decode(b[i:i + 1]) for i in range(len(b)))
+        u += decoder.decode(b'', final=True)
+        assert_equal(u, self.u)
+
+    def test_encode(self):
+        encoder = M.IncrementalEncoder(encoding=self.e)
+        b = b''.join(encoder.encode(ch) for ch in self.u)
+        b += encoder.encode('', final=True)
+        assert_equal(b, self.u.encode(self.e))
+
+    def test_reset(self):
+        decoder = M.IncrementalDecoder(encoding=self.e)
+        assert_equal(decoder.decode(b'\x1B$B5'), '')
+        decoder.reset()
+        assert_equal(decoder.decode(b'55', final=True), '55')
+
+    def test_decode_error(self):
+        decoder = M.IncrementalDecoder(encoding='UTF-8')
+        assert_equal(decoder.decode(b'a\xC4'), 'a')
+        with assert_raises(UnicodeDecodeError) as cm:
+            decoder.decode(b'\xFFb')
+        exc = cm.exception
+        assert_equal(exc.object, b'\xC4\xFFb')
+        assert_equal((exc.start, exc.end), (0, 2))
+
+    def test_encode_error(self):
+        encoder = M.IncrementalEncoder(encoding='ISO-8859-2')
+        with assert_raises(UnicodeEncodeError) as cm:
+            encoder.encode('Żółw 亀')
+        assert_equal(cm.exception.start, 5)
+
+class test_many:
+
+    # pylint: disable=protected-access
+
+    u = ['Żółw', '亀', 'żółw\n', '', 'zolw\0']
+    e = 'ISO-8859-2'
+
+    def t(self, encode_many, decode_many):
+        encoded = encode_many(self.u, encoding=self.e)
+        assert_equal(len(encoded), len(self.u))
+        for u, b in zip(self.u, encoded):
+            if u == '亀':
+                assert_is_instance(b, UnicodeEncodeError)
+                assert_equal(b.object, u)
+            else:
+                assert_equal(b, u.encode(self.e))
+        inputs = [u.encode('UTF-8') for u in self.u]
+        inputs[1:1] = [b'\xFF']
+        decoded = decode_many(inputs, encoding='UTF-8')
+        assert_equal(len(decoded), len(inputs))
+        assert_is_instance(decoded[1], UnicodeDecodeError)
+        assert_equal(decoded[1].object, b'\xFF')
+        assert_equal(decoded[2:], [b.decode('UTF-8') for b in inputs[2:]])
+
+    def test_dl(self):
+        self.t(M._encode_many_dl, M._decode_many_dl)
+
+    def test_cli(self):
+        popen = unittest.mock.Mock(wraps=M._popen)
+        with unittest.mock.patch.object(M, '_popen', popen):
+            self.t(M._encode_many_cli, M._decode_many_cli)
+        # for each call, one process per error, plus one per batch:
+        assert_equal(popen.call_count, 6)
+
+    def test_cli_no_separator(self):
+        u = ['a\n\0\x1F\x1E\x1D\x1C', 'b']
+        assert_equal(M._encode_many_cli(u, encoding=self.e), [s.encode(self.e) for s in u])
+
+    def test_cli_not_ascii_compatible(self):
+        u = ['a', 'b', 'Ż']
+        b = M._encode_many_cli(u, encoding='UTF-16')
+        assert_equal(b, [s.encode('UTF-16') for s in u])
+
+    def test_type_error(self):
+        with assert_raises(TypeError):
+            M.encode_many([b''])
+        with assert_raises(TypeError):
+            M.decode_many([''])
+
+def test_growing_buffer():
+    u = 'Ż' * 3
+    b = M.encode(u, 'UTF-16LE')
+    assert_equal(b, u.encode('UTF-16LE'))
+    for n in [1, 3, 1000, 100000]:
+        u = 'Ż' * n
+        assert_equal(M.encode(u, 'UTF-8'), u.encode('UTF-8'))
+        assert_equal(M.decode(u.encode('UTF-16LE'), 'UTF-16LE'), u)
+
 def test_incomplete_char():
     b = 'Ę'.encode('UTF-8')[:1]
     with assert_raises(UnicodeDecodeError):
@@ -19,8 +19,10 @@
 # SOFTWARE.
 
 import unittest
+import unittest.mock
 
 import lib.encodings
+import lib.iconv
 import lib.ling
 
 from . import tools
@@ -414,6 +416,24 @@ class test_unrepresentable_characters:
         result = lang.get_unrepresentable_characters(encoding)
         assert_not_equal(result, [])
 
+    @tools.fork_isolation
+    def test_iconv_cli(self):
+        encoding = 'KOI8-T'
+        lang = L.parse_language('pl')
+        E.install_extra_encodings()
+        result = lang.get_unrepresentable_characters(encoding)
+        assert_not_equal(result, [])
+        # pylint: disable=protected-access
+        popen = unittest.mock.Mock(wraps=lib.iconv._popen)
+        with unittest.mock.patch.multiple(lib.iconv,
+            _encode=lib.iconv._encode_cli,
+            _encode_many=lib.iconv._encode_many_cli,
+            _popen=popen,
+        ):
+            cli_result = lang.get_unrepresentable_characters(encoding)
+        assert_equal(cli_result, result)
+        assert_true(popen.call_count < len(result) + 4)
+
 @collect_yielded
 def test_glibc_supported():
     def t(l):
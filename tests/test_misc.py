@@ -20,8 +20,6 @@
 
 import datetime
 import os
-import stat
-import tempfile
 import time
 
 import lib.misc as M
@@ -32,7 +30,6 @@ from .tools import (
     assert_is_instance,
     assert_is_not_none,
     assert_raises,
-    assert_true,
 )
 
 from . import tools
@@ -135,11 +132,4 @@ class test_format_range:
     def test_huge(self):
         self.t(5, 42 ** 17, 5, '5, 6, 7, ..., 3937657486715347520027492351')
 
-def test_throwaway_tempdir():
-    with M.throwaway_tempdir('test'):
-        d = tempfile.gettempdir()
-        st = os.stat(d)
-        assert_equal(stat.S_IMODE(st.st_mode), 0o700)
-        assert_true(stat.S_ISDIR(st.st_mode))
-
 # vim:ts=4 sts=4 sw=4 et
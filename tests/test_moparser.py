@@ -19,17 +19,27 @@
 # SOFTWARE.
 
 import random
+import struct
+import unittest.mock
 
+import lib.encodings
+import lib.iconv
 import lib.moparser as M
 
 from .tools import (
     assert_equal,
+    assert_false,
+    assert_is_none,
     assert_raises,
+    assert_true,
 )
 
 from . import tools
 
 def parser_for_bytes(data):
+    return M.Parser.from_buffer(data)
+
+def parser_for_file(data):
     with tools.temporary_file(suffix='.mo') as file:
         file.write(data)
         file.flush()
@@ -66,4 +76,451 @@ class test_magic:
             parser_for_bytes(random_magic)
         assert_equal(str(cm.exception), 'unexpected magic')
 
+def build_mo(messages, *, terminator=b'\0', endian='<', hash_table=(), sysdep_messages=()):
+    # Build MO file of the (msgid, msgstr) pairs.
+    n = len(messages)
+    header_size = 48 if sysdep_messages else 28
+    hash_size = len(hash_table)
+    hash_offset = header_size + 16 * n
+    sysdep_offset = hash_offset + 4 * hash_size
+    sysdep_header = b''
+    sysdep_data = b''
+    if sysdep_messages:
+        (sysdep_header, sysdep_data) = build_sysdep_tables(sysdep_messages, offset=sysdep_offset, endian=endian)
+    strings = b''
+    offsets = []
+    data_offset = sysdep_offset + len(sysdep_data)
+    for msgid, msgstr in messages:
+        for s in (msgid, msgstr):
+            offsets += [(len(s), data_offset + len(strings))]
+            strings += s + terminator
+    msgid_offsets = offsets[0::2]
+    msgstr_offsets = offsets[1::2]
+    revision = 1 if sysdep_messages else 0
+    data = M.little_endian_magic if endian == '<' else M.big_endian_magic
+    data += struct.pack(endian + 'IIIIII', revision, n, header_size, header_size + 8 * n, hash_size, hash_offset)
+    data += sysdep_header
+    for length, offset in msgid_offsets + msgstr_offsets:
+        data += struct.pack(endian + 'II', length, offset)
+    data += struct.pack(endian + 'I' * hash_size, *hash_table)
+    return data + sysdep_data + strings
+
+def build_sysdep_tables(messages, *, offset, endian):
+    # Build tables of system-dependent strings, to be placed at the offset.
+    # Return the extra header fields and the tables.
+    # The strings are lists of static pieces (bytes)
+    # alternating with names of system-dependent segments (str).
+    n = len(messages)
+    names = sorted({
+        name
+        for message in messages
+        for s in message
+        for name in s[1::2]
+    })
+    orig_tab_offset = offset + 8 * len(names)
+    trans_tab_offset = orig_tab_offset + 4 * n
+    data_offset = trans_tab_offset + 4 * n
+    data = b''
+    def put(s):
+        nonlocal data
+        at = data_offset + len(data)
+        data += s
+        return at
+    segments_tab = b''
+    for name in names:
+        s = name.encode('ASCII') + b'\0'
+        segments_tab += struct.pack(endian + 'II', len(s), put(s))
+    string_offsets = []
+    for message in messages:
+        for s in message:
+            pieces = s[0::2]
+            at = put(b''.join(pieces) + b'\0')
+            descriptor = struct.pack(endian + 'I', at)
+            for piece, name in zip(pieces, s[1::2]):
+                descriptor += struct.pack(endian + 'II', len(piece), names.index(name))
+            descriptor += struct.pack(endian + 'II', len(pieces[-1]) + 1, 0xFFFFFFFF)
+            string_offsets += [put(descriptor)]
+    header = struct.pack(endian + 'IIIII', len(names), offset, n, orig_tab_offset, trans_tab_offset)
+    tables = segments_tab
+    tables += struct.pack(endian + 'I' * n, *string_offsets[0::2])
+    tables += struct.pack(endian + 'I' * n, *string_offsets[1::2])
+    return (header, tables + data)
+
+def hash_string(s):
+    # hashpjw, as in gettext-runtime/intl/hash-string.c
+    h = 0
+    for c in s:
+        h = (h << 4) + c
+        g = h & 0xF0000000
+        if g:
+            h ^= g >> 24
+            h ^= g
+    return h
+
+def build_hash_table(messages, size, *, hash_function=hash_string):
+    # Build hash table the same way as msgfmt(1) does.
+    table = [0] * size
+    for i, (msgid, msgstr) in enumerate(messages):
+        del msgstr
+        h = hash_function(msgid.split(b'\0')[0])
+        j = h % size
+        incr = 1 + h % (size - 2)
+        while table[j] != 0:
+            j = (j + incr) % size
+        table[j] = i + 1
+    return table
+
+class test_parse:
+
+    header = b'Content-Type: text/plain; charset=UTF-8\n'
+
+    def test_ok(self):
+        for endian in '<>':
+            self._test_ok(endian)
+
+    def _test_ok(self, endian):
+        data = build_mo(endian=endian, messages=[
+            (b'', self.header),
+            (b'%d egg\0%d eggs', b'%d jajko\0%d jajka\0%d jajek'),
+            (b'eggs', 'jajk\N{LATIN SMALL LETTER E WITH OGONEK}'.encode('UTF-8')),
+            (b'ham', b'szynka'),
+        ])
+        parser = parser_for_bytes(data)
+        file = parser.parse()
+        assert_equal(file.possible_hidden_strings, False)
+        [header, n_eggs, eggs, ham] = file
+        assert_equal(header.msgstr, self.header.decode('ASCII'))
+        assert_equal(eggs.msgstr, 'jajk\N{LATIN SMALL LETTER E WITH OGONEK}')
+        assert_equal(ham.msgid, 'ham')
+        assert_equal(ham.msgstr, 'szynka')
+        assert_equal(n_eggs.msgid_plural, '%d eggs')
+        assert_equal(n_eggs.msgstr_plural, {0: '%d jajko', 1: '%d jajka', 2: '%d jajek'})
+        assert_is_none(n_eggs.msgstr)
+        assert_equal(eggs.msgstr_plural, {})
+        assert_is_none(eggs.msgid_plural)
+        assert_is_none(eggs.msgctxt)
+        assert_false(eggs.obsolete)
+        assert_equal(eggs.flags, ())
+        assert_true(eggs.translated())
+        assert_equal(str(ham), 'msgid "ham"\nmsgstr "szynka"\n')
+
+    def test_not_null_terminated(self):
+        data = build_mo([(b'', self.header)], terminator=b'\n')
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'msgid is not null-terminated')
+        data = build_mo([(b'', self.header)])[:-1] + b'\n'
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'msgstr is not null-terminated')
+
+    def test_truncated(self):
+        data = build_mo([(b'', self.header)])
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data[:-1])
+        assert_equal(str(cm.exception), 'truncated file')
+
+    def test_truncated_table(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jajka')])
+        data = data[:28 + 8 + 4]
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'truncated file')
+
+    def test_error_order(self):
+        # Errors in earlier messages take precedence:
+        data = build_mo([(b'', self.header), (b'spam', b'mielonka'), (b'eggs', b'jajka'), (b'ham', b'szynka')])
+        data = data[:-1] + b'\n'
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'messages are not sorted')
+
+    def test_unexpected_null(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jaj\0ka')])
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'unexpected null byte in msgstr')
+
+    def test_from_bytes(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jajka')])
+        for parser in [
+            M.Parser.from_bytes(data, path='eggs.mo'),
+            M.Parser.from_buffer(memoryview(data)),
+            M.Parser.from_buffer(bytearray(data)),
+        ]:
+            file = parser.parse()
+            assert_equal(file[1].msgstr, 'jajka')
+        assert_equal(M.Parser.from_bytes(data, path='eggs.mo').parse().fpath, 'eggs.mo')
+        with assert_raises(TypeError):
+            M.Parser.from_bytes(bytearray(data))
+        with assert_raises(M.SyntaxError) as cm:
+            M.Parser.from_bytes(data[:-1])
+        assert_equal(str(cm.exception), 'truncated file')
+
+    def test_from_file(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jajka')])
+        file = parser_for_file(data).parse()
+        assert_equal(file[1].msgstr, 'jajka')
+        # Empty files cannot be mapped into memory:
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_file(b'')
+        assert_equal(str(cm.exception), 'unexpected magic')
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_file(data[:-1])
+        assert_equal(str(cm.exception), 'truncated file')
+
+    def test_broken_encoding(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jajk\xEA'), (b'ham', b'szynka')])
+        with assert_raises(UnicodeDecodeError):
+            parser_for_bytes(data)
+        header = self.header.replace(b'UTF-8', b'ASCII')
+        data = build_mo([(b'', header), (b'eggs', b'jajka'), (b'ham', b'szynka\xEA')])
+        with assert_raises(UnicodeDecodeError):
+            parser_for_bytes(data)
+
+    def test_decode_error_handler(self):
+        data = build_mo([(b'', self.header), (b'eggs', b'jajk\xC4\x99'), (b'ham', b'szynka\xEA')])
+        errors = []
+        def on_decode_error(exc):
+            errors.append(exc)
+            return 'ISO-8859-1'
+        file = M.Parser.from_bytes(data, on_decode_error=on_decode_error).parse()
+        assert_equal(len(errors), 1)
+        exc = errors[0]
+        assert_equal(exc.object[exc.start:exc.end], b'\xEA')
+        [header, eggs, ham] = file
+        del header
+        # The strings decoded before the error are decoded again:
+        assert_equal(eggs.msgstr, 'jajk\xC4\x99')
+        assert_equal(ham.msgstr, 'szynka\xEA')
+
+class test_iconv_encoding:
+
+    # EUC-TW is not supported by Python, so it's decoded using iconv.
+
+    header = b'Content-Type: text/plain; charset=EUC-TW\n'
+    msgstr = b'\xC4\xE3\xC5\xC6'  # '\u4E2D\u6587'
+
+    def _build_mo(self, n, *, broken=None):
+        messages = []
+        for i in range(n):
+            msgstr = self.msgstr if i != broken else b'\xFF' * len(self.msgstr)
+            messages += [
+                (b'ctxt%03d\x04eggs' % i, msgstr),
+                (b'egg%03d\0eggs' % i, self.msgstr + b'\0' + self.msgstr),
+            ]
+        return build_mo([(b'', self.header), *sorted(messages)])
+
+    def _parse_cli(self, data, **kwargs):
+        # pylint: disable=protected-access
+        popen = unittest.mock.Mock(wraps=lib.iconv._popen)
+        with unittest.mock.patch.multiple(lib.iconv,
+            _decode=lib.iconv._decode_cli,
+            _decode_many=lib.iconv._decode_many_cli,
+            _popen=popen,
+        ):
+            file = M.Parser.from_bytes(data, **kwargs).parse()
+            for entry in file:
+                str(entry)
+        return (file, popen.call_count)
+
+    @tools.fork_isolation
+    def test_cli(self):
+        lib.encodings.install_extra_encodings()
+        data = self._build_mo(100)
+        file = M.Parser.from_bytes(data).parse()
+        (cli_file, n_processes) = self._parse_cli(data)
+        assert_equal(list(map(str, cli_file)), list(map(str, file)))
+        assert_equal(cli_file[1].msgstr, '\u4E2D\u6587')
+        assert_equal(cli_file[101].msgstr_plural, {0: '\u4E2D\u6587', 1: '\u4E2D\u6587'})
+        # one process for the ASCII compatibility check, plus one for all the strings:
+        assert_equal(n_processes, 2)
+
+    @tools.fork_isolation
+    def test_cli_decode_error(self):
+        lib.encodings.install_extra_encodings()
+        data = self._build_mo(100, broken=50)
+        with assert_raises(UnicodeDecodeError):
+            self._parse_cli(data)
+        errors = []
+        def on_decode_error(exc):
+            errors.append(exc)
+            return 'ISO-8859-1'
+        (file, n_processes) = self._parse_cli(data, on_decode_error=on_decode_error)
+        assert_equal(len(errors), 1)
+        assert_equal(errors[0].object, b'\xFF' * len(self.msgstr))
+        assert_equal(file[51].msgstr, '\xFF' * len(self.msgstr))
+        assert_equal(file[101].msgstr_plural[0], self.msgstr.decode('ISO-8859-1'))
+        assert_true(n_processes < 5)
+
+class test_sysdep:
+
+    header = test_parse.header
+    messages = [(b'', header), (b'eggs', b'jajka')]
+    sysdep_messages = [
+        (
+            [b'%', 'PRIu64', b' egg\0%', 'PRIu64', b' eggs'],
+            [b'%', 'PRIu64', b' jajko\0%', 'PRIu64', b' jajek'],
+        ),
+        ([b'%', 'I', b'd ham'], [b'%', 'I', b'd szynek']),
+    ]
+
+    def test_ok(self):
+        for endian in '<>':
+            self._test_ok(endian)
+
+    def _test_ok(self, endian):
+        data = build_mo(self.messages, sysdep_messages=self.sysdep_messages, endian=endian)
+        file = parser_for_bytes(data).parse()
+        assert_equal(file.possible_hidden_strings, False)
+        [header, eggs, n_eggs, ham] = file
+        del header, eggs
+        assert_equal(n_eggs.msgid, '%<PRIu64> egg')
+        assert_equal(n_eggs.msgid_plural, '%<PRIu64> eggs')
+        assert_equal(n_eggs.msgstr_plural, {0: '%<PRIu64> jajko', 1: '%<PRIu64> jajek'})
+        assert_equal(ham.msgid, '%Id ham')
+        assert_equal(ham.msgstr, '%Id szynek')
+        assert_is_none(ham.msgctxt)
+
+    def test_no_regular_strings(self):
+        data = build_mo([], sysdep_messages=self.sysdep_messages[1:])
+        [ham] = parser_for_bytes(data).parse()
+        assert_equal(ham.msgstr, '%Id szynek')
+
+    def test_broken_encoding(self):
+        sysdep_messages = [([b'%', 'I', b'd ham'], [b'%', 'I', b'd szynek\xEA'])]
+        data = build_mo(self.messages, sysdep_messages=sysdep_messages)
+        with assert_raises(UnicodeDecodeError):
+            parser_for_bytes(data)
+
+    def test_unexpected_null(self):
+        sysdep_messages = [([b'%', 'I', b'd ham'], [b'%', 'I', b'd\0szynek'])]
+        data = build_mo(self.messages, sysdep_messages=sysdep_messages)
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'unexpected null byte in msgstr')
+
+    def test_segment_out_of_range(self):
+        data = bytearray(build_mo(self.messages, sysdep_messages=self.sysdep_messages))
+        [orig_tab_offset] = struct.unpack_from('<I', data, 40)
+        [at] = struct.unpack_from('<I', data, orig_tab_offset)
+        struct.pack_into('<I', data, at + 8, 2)
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'sysdep segment number out of range')
+
+    def test_not_null_terminated(self):
+        data = bytearray(build_mo(self.messages, sysdep_messages=self.sysdep_messages))
+        [orig_tab_offset] = struct.unpack_from('<I', data, 40)
+        [at] = struct.unpack_from('<I', data, orig_tab_offset)
+        # Cut off the null byte from the last static piece:
+        [size] = struct.unpack_from('<I', data, at + 20)
+        struct.pack_into('<I', data, at + 20, size - 1)
+        with assert_raises(M.SyntaxError) as cm:
+            parser_for_bytes(data)
+        assert_equal(str(cm.exception), 'msgid is not null-terminated')
+
+class test_hash_table:
+
+    messages = [
+        (b'', test_parse.header),
+        (b'%d egg\0%d eggs', b'%d jajko\0%d jajka\0%d jajek'),
+        (b'eggs', b'jajka'),
+        (b'ham', b'szynka'),
+        (b'sausage\x04ham', b'kie\xC5\x82basa'),
+        (b'spam', b'mielonka'),
+    ]
+
+    def t(self, hash_table, error, *, messages=None, endian='<'):
+        if messages is None:
+            messages = self.messages
+        data = build_mo(messages, hash_table=hash_table, endian=endian)
+        file = parser_for_bytes(data).parse()
+        assert_equal(file.hash_table_error, error)
+
+    def test_ok(self):
+        for size in [7, 11, 13]:
+            for endian in '<>':
+                table = build_hash_table(self.messages, size)
+                self.t(table, None, endian=endian)
+
+    def test_hash_values(self):
+        hashes = {
+            b'': 0,
+            b'A quick brown fox jumps over the lazy dog.': 0x4C0C63E,
+            b'eggs': 0x6BDE3,
+            b'\xFF' * 20: 0x10EF,
+        }
+        messages = [(msgid, b'') for msgid in sorted(hashes)]
+        messages[0] = (b'', b'Content-Type: text/plain; charset=ISO-8859-1\n')
+        for size in [5, 7, 11, 13]:
+            table = build_hash_table(messages, size, hash_function=hashes.__getitem__)
+            self.t(table, None, messages=messages)
+
+    def test_no_hash_table(self):
+        self.t([], None)
+        self.t([1, 2], None)
+
+    def test_collision(self):
+        # “%d egg” and “eggs” hash to the same slot:
+        assert_equal(hash_string(b'%d egg') % 7, 1)
+        assert_equal(hash_string(b'eggs') % 7, 1)
+        table = build_hash_table(self.messages, 7)
+        assert_equal(table[1], 2)
+        assert_equal(table[4], 3)
+        self.t(table, None)
+
+    def test_truncated(self):
+        data = bytearray(build_mo(self.messages, hash_table=build_hash_table(self.messages, 7)))
+        struct.pack_into('<I', data, 24, len(data) - 24)
+        file = parser_for_bytes(data).parse()
+        assert_equal(file.hash_table_error, 'truncated hash table')
+        data = build_mo([])[:20]
+        file = parser_for_bytes(data).parse()
+        assert_equal(file.hash_table_error, 'truncated hash table')
+
+    def test_full(self):
+        self.t([1, 2, 3, 4, 5, 6], 'no empty slots in hash table')
+
+    def test_nonexistent_message(self):
+        table = build_hash_table(self.messages, 11)
+        table[table.index(0)] = 7
+        self.t(table, 'hash table refers to nonexistent message')
+
+    def test_repeated_message(self):
+        table = build_hash_table(self.messages, 11)
+        table[table.index(0)] = 1
+        self.t(table, 'hash table refers to the same message more than once')
+
+    def test_missing_message(self):
+        table = build_hash_table(self.messages, 7)
+        table[table.index(4)] = 0
+        self.t(table, 'message 4 cannot be found via hash table')
+
+    def test_missing_message_sampled(self):
+        table = build_hash_table(self.messages, 7)
+        table[table.index(4)] = 0
+        with unittest.mock.patch.object(M, '_max_hash_lookups', 2):
+            # Only messages 1 and 4 are looked up:
+            self.t(table, 'message 4 cannot be found via hash table')
+        table = build_hash_table(self.messages, 7)
+        table[table.index(3)] = 0
+        with unittest.mock.patch.object(M, '_max_hash_lookups', 2):
+            self.t(table, None)
+
+    def test_duplicate_message(self):
+        # The lookup finds the first of the duplicates, which is fine here;
+        # duplicates are reported by the checker.
+        messages = self.messages + [(b'spam', b'konserwa')]
+        table = build_hash_table(messages, 11)
+        self.t(table, None, messages=messages)
+
+    def test_endless_lookup(self):
+        # When the table size is not a prime number,
+        # the lookup may go round in circles.
+        # Here, “i” starts at slot 1, and then visits only slot 5:
+        messages = [(b'', test_parse.header), (b'i', b'ja'), (b'j', b'j'), (b'k', b'k')]
+        table = [1, 3, 2, 0, 0, 4, 0, 0]
+        self.t(table, 'too many collisions in hash table', messages=messages)
+
 # vim:ts=4 sts=4 sw=4 et
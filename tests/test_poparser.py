@@ -0,0 +1,276 @@
+# Copyright © 2026 Jakub Wilk <jwilk@jwilk.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import unittest.mock
+
+import lib.encodings
+import lib.iconv
+import lib.poparser as M
+
+from .tools import (
+    assert_equal,
+    assert_false,
+    assert_is_none,
+    assert_raises,
+    assert_true,
+)
+
+from . import tools
+
+minimal_header = r'''
+msgid ""
+msgstr "Content-Type: text/plain; charset=US-ASCII\n"
+'''
+
+def parse(s, *, encoding='ASCII'):
+    if isinstance(s, str):
+        s = s.encode(encoding)
+    with tools.temporary_file(suffix='.po') as file:
+        file.write(s)
+        file.flush()
+        parser = M.Parser(file.name)
+        return parser.parse()
+
+def test_trailing_obsolete_message():
+    s = minimal_header + '''
+msgid "a"
+msgstr "b"
+
+#~ msgid "b"
+#~ msgstr "c"
+'''
+    po = parse(s)
+    assert_equal(len(po), 3)
+    assert_true(po[-1].obsolete)
+    assert_equal(po[-1].msgstr, 'c')
+
+def test_trailing_comment():
+    s = minimal_header + '''
+msgid "a"
+msgstr "b"
+
+# eggs
+'''
+    po = parse(s)
+    assert_equal(len(po), 2)
+    assert_equal(po[-1].tcomment, '')
+
+def test_empty_file():
+    po = parse('')
+    assert_equal(len(po), 0)
+    assert_equal(po.header, '')
+
+def test_header_comment():
+    po = parse('# spam\n#eggs\n' + minimal_header)
+    assert_equal(po.header, 'spam\neggs')
+
+def test_missing_msgstr():
+    po = parse(minimal_header + '\nmsgid "a"\n')
+    assert_equal(len(po), 2)
+    assert_is_none(po[1].msgid_plural)
+    assert_is_none(po[1].msgstr)
+    assert_false(po[1].translated())
+
+def test_empty_msgstr():
+    po = parse(minimal_header + '\nmsgid "a"\nmsgid_plural ""\nmsgstr[0] ""\n')
+    assert_equal(po[1].msgid_plural, '')
+    assert_is_none(po[1].msgstr)
+    assert_equal(po[1].msgstr_plural, {0: ''})
+    assert_false(po[1].translated())
+
+def test_flags():
+    po = parse(minimal_header + '\n#, fuzzy,c-format\nmsgid "a"\nmsgstr "b"\n')
+    assert_equal(po[1].flags, ['fuzzy', 'c-format'])
+    assert_false(po[1].translated())
+
+def test_occurrences():
+    po = parse(minimal_header + '\n#: a.c:1 b.c c:d\nmsgid "a"\nmsgstr "b"\n')
+    assert_equal(po[1].occurrences, [('a.c', '1'), ('b.c', ''), ('c:d', '')])
+
+def test_continuation():
+    po = parse(minimal_header + '\nmsgctxt "c"\n"t"\nmsgid "a"\n"b"\nmsgstr "c"\n"d"\n')
+    assert_equal(po[1].msgctxt, 'ct')
+    assert_equal(po[1].msgid, 'ab')
+    assert_equal(po[1].msgstr, 'cd')
+
+def test_escapes():
+    po = parse(minimal_header.replace('US-ASCII', 'ISO-8859-2') + r'''
+msgid "\t\"\\\x41\101\q"
+msgstr "\261"
+''')
+    assert_equal(po.encoding, 'ISO-8859-2')
+    assert_equal(po[1].msgid, '\t"\\AA\\q')
+    assert_equal(po[1].msgstr, '\N{LATIN SMALL LETTER A WITH OGONEK}')
+
+def test_from_bytes():
+    s = (minimal_header + '\nmsgid "a"\nmsgstr "b"\n').encode('ASCII')
+    for parser in [
+        M.Parser.from_bytes(s, path='a.po'),
+        M.Parser.from_buffer(memoryview(s)),
+        M.Parser.from_buffer(bytearray(s)),
+    ]:
+        po = parser.parse()
+        assert_equal(po[1].msgstr, 'b')
+    assert_equal(M.Parser.from_bytes(s, path='a.po').parse().fpath, 'a.po')
+    with assert_raises(TypeError):
+        M.Parser.from_bytes(bytearray(s))
+    with assert_raises(M.SyntaxError):
+        M.Parser.from_bytes(s + b'spam\n')
+
+class test_syntax_error:
+
+    def t(self, s, lineno, message=None):
+        with assert_raises(M.SyntaxError) as cm:
+            parse(minimal_header + s)
+        exc = cm.exception
+        assert_equal(exc.lineno, lineno)
+        assert_equal(exc.message, message)
+
+    def test_unexpected_line(self):
+        self.t('\nspam\n', 5)
+
+    def test_unexpected_msgstr(self):
+        self.t('\n#, fuzzy\nmsgstr "a"\n', 6)
+
+    def test_unescaped_quote(self):
+        self.t('\nmsgid "a"b"\n', 5, 'unescaped double quote found')
+
+    def test_invalid_continuation_line(self):
+        self.t('\n#| msgid\n', 5, 'invalid continuation line')
+
+    def test_unknown_keyword(self):
+        self.t('\n#| msgstr "a"\n', 5, 'unknown keyword msgstr')
+
+    def test_str(self):
+        assert_equal(str(M.SyntaxError(42)), 'line 42')
+        assert_equal(str(M.SyntaxError(42, 'eggs')), 'line 42: eggs')
+
+def test_broken_encoding():
+    s = minimal_header.replace('US-ASCII', 'UTF-8') + '\nmsgid "a"\nmsgstr "\xBA"\n'
+    with assert_raises(UnicodeDecodeError):
+        parse(s, encoding='ISO-8859-1')
+
+def test_decode_error_handler():
+    s = minimal_header.replace('US-ASCII', 'UTF-8') + '\nmsgid "a"\nmsgstr "\xBA"\n'
+    s = s.encode('ISO-8859-1')
+    errors = []
+    def on_decode_error(exc):
+        errors.append(exc)
+        return 'ISO-8859-1'
+    po = M.Parser.from_bytes(s, on_decode_error=on_decode_error).parse()
+    assert_equal(len(errors), 1)
+    exc = errors[0]
+    assert_equal(exc.object[exc.start:exc.end], b'\xBA')
+    assert_equal(po.encoding, 'ISO-8859-1')
+    assert_equal(po[1].msgstr, '\xBA')
+
+def parse_streamed(s, *, encoding='ASCII'):
+    if isinstance(s, str):
+        s = s.encode(encoding)
+    with tools.temporary_file(suffix='.po') as file:
+        file.write(s)
+        file.flush()
+        po = M.StreamedFile(file.name)
+        with unittest.mock.patch.object(M, '_read_size', 3):
+            return (po, list(po))
+
+class test_streamed_file:
+
+    def test_entries(self):
+        s = '# spam\n' + minimal_header.replace('US-ASCII', 'UTF-8') + '''
+#, fuzzy
+msgid "a"
+msgid_plural "\\x61"
+msgstr[0] "ą"
+msgstr[1] ""
+
+#~ msgid "b"
+#~ msgstr "c"
+'''
+        po = parse(s, encoding='UTF-8')
+        (spo, entries) = parse_streamed(s, encoding='UTF-8')
+        assert_equal(spo.encoding, 'UTF-8')
+        assert_equal(spo.header, po.header)
+        assert_equal(len(entries), len(po))
+        for entry, sentry in zip(po, entries):
+            for attr in M.Entry.__slots__:
+                assert_equal(getattr(sentry, attr), getattr(entry, attr))
+
+    def test_syntax_error(self):
+        s = minimal_header + '\nspam\n'
+        with assert_raises(M.SyntaxError) as cm:
+            parse_streamed(s)
+        assert_equal(cm.exception.lineno, 5)
+
+    def test_broken_encoding(self):
+        s = minimal_header.replace('US-ASCII', 'UTF-8') + '\nspam\n' + ('#' * 50 + '\n') * 2 + 'msgid "\xBA"\n'
+        s = s.encode('ISO-8859-1')
+        # Decoding errors take precedence over syntax errors:
+        with assert_raises(UnicodeDecodeError) as cm:
+            parse(s)
+        exc = cm.exception
+        with assert_raises(UnicodeDecodeError) as cm:
+            parse_streamed(s)
+        sexc = cm.exception
+        assert_equal(
+            sexc.object[sexc.start - 40:sexc.end + 40],
+            exc.object[exc.start - 40:exc.end + 40],
+        )
+        assert_equal(sexc.reason, exc.reason)
+
+    @tools.fork_isolation
+    def test_iconv_encoding(self):
+        lib.encodings.install_extra_encodings()
+        s = minimal_header.replace('US-ASCII', 'KOI8-T') + '\nmsgid "a"\nmsgstr "\xF0\xDA"\n'
+        s = s.encode('ISO-8859-1')
+        (spo, [_, entry]) = parse_streamed(s)
+        assert_equal(spo.encoding, 'KOI8-T')
+        assert_equal(entry.msgstr, parse(s)[1].msgstr)
+
+    @tools.fork_isolation
+    def test_no_incremental_decoder(self):
+        lib.encodings.install_extra_encodings()
+        s = minimal_header.replace('US-ASCII', 'KOI8-T') + '\nmsgid "a"\nmsgstr "\xF0\xDA"\n'
+        s = s.encode('ISO-8859-1')
+        with unittest.mock.patch.object(lib.iconv, '_iconv', None):
+            (spo, [_, entry]) = parse_streamed(s)
+        assert_equal(spo.encoding, 'KOI8-T')
+        assert_equal(entry.msgstr, parse(s)[1].msgstr)
+
+class test_detect_encoding:
+
+    def test_none(self):
+        assert_is_none(M.detect_encoding(b''))
+
+    def test_declared(self):
+        s = minimal_header.encode('ASCII')
+        assert_equal(M.detect_encoding(s), 'US-ASCII')
+
+    def test_unknown(self):
+        s = b'"Content-Type: text/plain; charset=CHARSET\\n"\n' + minimal_header.encode('ASCII')
+        assert_equal(M.detect_encoding(s), 'US-ASCII')
+
+    @tools.fork_isolation
+    def test_extra(self):
+        s = b'"Content-Type: text/plain; charset=KOI8-T\\n"\n'
+        lib.encodings.install_extra_encodings()
+        assert_equal(M.detect_encoding(s), 'KOI8-T')
+
+# vim:ts=4 sts=4 sw=4 et
@@ -19,6 +19,8 @@
 # SOFTWARE.
 
 import os
+import subprocess as ipc
+import sys
 
 from lib.cli import __version__
 
@@ -28,6 +30,7 @@ from .tools import (
 
 here = os.path.dirname(__file__)
 docdir = os.path.join(here, os.pardir, 'doc')
+script = os.path.join(here, os.pardir, 'i18nspector')
 
 def test_changelog():
     path = os.path.join(docdir, 'changelog')
@@ -46,4 +49,10 @@ def test_manpage():
                 break
     assert_equal(manpage_version, __version__)
 
+def test_option():
+    output = ipc.check_output([sys.executable, script, '--version'])
+    lines = output.decode('ASCII').splitlines()
+    assert_equal(lines[0], f'i18nspector {__version__}')
+    assert_equal(lines[2].split()[:2], ['+', 'polib'])
+
 # vim:ts=4 sts=4 sw=4 et
@@ -37,6 +37,7 @@ assert_is_instance = tc.assertIsInstance
 assert_is_none = tc.assertIsNone
 assert_is_not_none = tc.assertIsNotNone
 assert_less = tc.assertLess
+assert_less_equal = tc.assertLessEqual
 assert_list_equal = tc.assertListEqual
 assert_not_equal = tc.assertNotEqual
 assert_not_in = tc.assertNotIn